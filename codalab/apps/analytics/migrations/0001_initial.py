@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user_count', models.PositiveIntegerField(default=0)),
+                ('organizer_count', models.PositiveIntegerField(default=0)),
+                ('competition_count', models.PositiveIntegerField(default=0)),
+                ('competitions_published_count', models.PositiveIntegerField(default=0)),
+                ('participant_count', models.PositiveIntegerField(default=0)),
+                ('approved_participant_count', models.PositiveIntegerField(default=0)),
+                ('submission_count', models.PositiveIntegerField(default=0)),
+                ('dataset_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+                'get_latest_by': 'created_at',
+            },
+        ),
+        migrations.CreateModel(
+            name='MonthlyAnalytics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(unique=True)),
+                ('users_joined', models.PositiveIntegerField(default=0)),
+                ('competitions_started', models.PositiveIntegerField(default=0)),
+                ('submissions_made', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ('month',),
+            },
+        ),
+    ]
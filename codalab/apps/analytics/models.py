@@ -0,0 +1,133 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import models, transaction
+from django.db.models import Case, Count, DateField, When
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from guardian.conf import settings as guardian_settings
+
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             CompetitionSubmission,
+                             OrganizerDataSet,
+                             ParticipantStatus)
+
+# Readers rebuild the rollup themselves when the nightly task hasn't run for this long
+ANALYTICS_MAX_AGE = datetime.timedelta(days=2)
+
+
+class MonthlyAnalytics(models.Model):
+    """Amount of users, competitions and submissions added in a month, written by `rollup_analytics`."""
+    month = models.DateField(unique=True)
+    users_joined = models.PositiveIntegerField(default=0)
+    competitions_started = models.PositiveIntegerField(default=0)
+    submissions_made = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('month',)
+
+
+class AnalyticsSnapshot(models.Model):
+    """Site wide totals, written by `rollup_analytics`."""
+    created_at = models.DateTimeField(auto_now_add=True)
+    user_count = models.PositiveIntegerField(default=0)
+    organizer_count = models.PositiveIntegerField(default=0)
+    competition_count = models.PositiveIntegerField(default=0)
+    competitions_published_count = models.PositiveIntegerField(default=0)
+    participant_count = models.PositiveIntegerField(default=0)
+    approved_participant_count = models.PositiveIntegerField(default=0)
+    submission_count = models.PositiveIntegerField(default=0)
+    dataset_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ('-created_at',)
+        get_latest_by = 'created_at'
+
+
+def _count_per_month(queryset, field_name, since=None):
+    """
+    Counts the rows of `queryset` per month of `field_name` with a single GROUP BY.
+
+    :param since: Only count rows from this date on.
+    :return: Dictionary mapping the first day of each month to its count.
+    """
+    if since is not None:
+        queryset = queryset.filter(**{'{}__gte'.format(field_name): since})
+    rows = queryset.filter(**{'{}__isnull'.format(field_name): False}).order_by().annotate(
+        month=TruncMonth(field_name, output_field=DateField())
+    ).values('month').annotate(count=Count('pk')).values_list('month', 'count')
+    return dict(rows)
+
+
+def _get_users():
+    # django-guardian creates its AnonymousUser on migrate, with an auto pk, it is not a user of the site
+    return get_user_model().objects.exclude(username=guardian_settings.ANONYMOUS_USER_NAME)
+
+
+def compute_analytics_totals():
+    """
+    :return: Dictionary of `AnalyticsSnapshot` field values.
+    """
+    competitions = Competition.objects.order_by().aggregate(
+        count=Count('pk'),
+        published_count=Count(Case(When(published=True, then=1))),
+    )
+    participants = CompetitionParticipant.objects.order_by().aggregate(
+        count=Count('pk'),
+        approved_count=Count(Case(When(status__codename=ParticipantStatus.APPROVED, then=1))),
+    )
+    return {
+        'user_count': _get_users().count(),
+        'organizer_count': Competition.objects.order_by().values('creator').distinct().count(),
+        'competition_count': competitions['count'],
+        'competitions_published_count': competitions['published_count'],
+        'participant_count': participants['count'],
+        'approved_participant_count': participants['approved_count'],
+        'submission_count': CompetitionSubmission.objects.count(),
+        'dataset_count': OrganizerDataSet.objects.count(),
+    }
+
+
+def rollup_analytics():
+    """
+    Takes a new `AnalyticsSnapshot` and refreshes `MonthlyAnalytics`. Only the previous month and the
+    ones after it are counted again, the first run counts everything.
+
+    :return: The new `AnalyticsSnapshot`.
+    """
+    since_month = None
+    if MonthlyAnalytics.objects.exists():
+        current_month = timezone.localtime(timezone.now()).date().replace(day=1)
+        since_month = (current_month - datetime.timedelta(days=1)).replace(day=1)
+    since = None
+    if since_month is not None:
+        since = timezone.make_aware(datetime.datetime.combine(since_month, datetime.time.min))
+
+    users = _count_per_month(_get_users(), 'date_joined', since)
+    competitions = _count_per_month(Competition.objects.all(), 'start_date', since)
+    submissions = _count_per_month(CompetitionSubmission.objects.all(), 'submitted_at', since)
+
+    with transaction.atomic():
+        if since_month is not None:
+            MonthlyAnalytics.objects.filter(month__gte=since_month).delete()
+        MonthlyAnalytics.objects.bulk_create([
+            MonthlyAnalytics(
+                month=month,
+                users_joined=users.get(month, 0),
+                competitions_started=competitions.get(month, 0),
+                submissions_made=submissions.get(month, 0),
+            )
+            for month in sorted(set(users) | set(competitions) | set(submissions))
+        ])
+        return AnalyticsSnapshot.objects.create(**compute_analytics_totals())
+
+
+def get_analytics_snapshot():
+    """
+    Returns the latest `AnalyticsSnapshot`, rebuilding the rollup if the nightly task fell behind.
+    """
+    snapshot = AnalyticsSnapshot.objects.first()
+    if snapshot is None or snapshot.created_at < timezone.now() - ANALYTICS_MAX_AGE:
+        snapshot = rollup_analytics()
+    return snapshot
@@ -0,0 +1,13 @@
+import logging
+
+from celery import task
+
+from apps.analytics.models import rollup_analytics
+
+logger = logging.getLogger(__name__)
+
+
+@task(queue='site-worker', soft_time_limit=60 * 60)
+def rollup_analytics_task():
+    snapshot = rollup_analytics()
+    logger.info("Stored analytics snapshot {}".format(snapshot.pk))
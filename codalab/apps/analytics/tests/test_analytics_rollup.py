@@ -0,0 +1,74 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.analytics.models import AnalyticsSnapshot, MonthlyAnalytics, get_analytics_snapshot, rollup_analytics
+from apps.web.models import Competition, CompetitionParticipant, ParticipantStatus
+
+User = get_user_model()
+
+
+class AnalyticsRollupTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.participant = User.objects.create_user(username="participant", password="pass")
+        User.objects.filter(pk=self.participant.pk).update(
+            date_joined=timezone.now() - datetime.timedelta(days=400)
+        )
+        self.competition = Competition.objects.create(
+            title="Test Competition",
+            creator=self.organizer,
+            modified_by=self.organizer,
+            published=True,
+            start_date=timezone.now(),
+        )
+        Competition.objects.create(title="Second Competition", creator=self.organizer, modified_by=self.organizer)
+        CompetitionParticipant.objects.create(
+            user=self.participant,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0],
+        )
+
+    def test_rollup_counts_totals(self):
+        snapshot = rollup_analytics()
+
+        assert snapshot.user_count == 2
+        assert snapshot.organizer_count == 1
+        assert snapshot.competition_count == 2
+        assert snapshot.competitions_published_count == 1
+        assert snapshot.participant_count == 1
+        assert snapshot.approved_participant_count == 1
+
+    def test_rollup_counts_per_month(self):
+        rollup_analytics()
+
+        current_month = timezone.localtime(timezone.now()).date().replace(day=1)
+        months = list(MonthlyAnalytics.objects.all())
+        assert len(months) == 2
+        assert months[0].users_joined == 1
+        assert months[1].month == current_month
+        assert months[1].users_joined == 1
+        assert months[1].competitions_started == 1
+
+    def test_rollup_only_recounts_recent_months(self):
+        rollup_analytics()
+        User.objects.create_user(username="newcomer", password="pass")
+        rollup_analytics()
+
+        assert MonthlyAnalytics.objects.count() == 2
+        assert MonthlyAnalytics.objects.last().users_joined == 2
+        assert MonthlyAnalytics.objects.first().users_joined == 1
+
+    def test_get_analytics_snapshot_reads_a_recent_snapshot(self):
+        snapshot = rollup_analytics()
+
+        with self.assertNumQueries(1):
+            assert get_analytics_snapshot().pk == snapshot.pk
+
+    def test_get_analytics_snapshot_rebuilds_an_old_snapshot(self):
+        snapshot = rollup_analytics()
+        AnalyticsSnapshot.objects.filter(pk=snapshot.pk).update(created_at=timezone.now() - datetime.timedelta(days=3))
+
+        assert get_analytics_snapshot().pk != snapshot.pk
@@ -1,13 +1,8 @@
-from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count
 from django.http import HttpResponse
 from django.shortcuts import render
 
-from apps.web.models import Competition
-
-
-User = get_user_model()
+from apps.analytics.models import MonthlyAnalytics, get_analytics_snapshot
 
 
 @login_required
@@ -15,17 +10,16 @@ def analytics_detail(request):
     if not request.user.is_staff:
         return HttpResponse(status=404)
 
-    monthly_total_users_joined = {}
-    for date in User.objects.all().datetimes('date_joined', 'month'):
-        if date.year not in monthly_total_users_joined:
-            monthly_total_users_joined[date.year] = {}
-        users_joined_this_month = User.objects.filter(date_joined__month=date.month,
-                                                      date_joined__year=date.year).aggregate(Count('pk'))
-        monthly_total_users_joined[date.year][date.strftime("%B")] = users_joined_this_month['pk__count']
+    snapshot = get_analytics_snapshot()
+
+    monthly_analytics = {}
+    for month in MonthlyAnalytics.objects.all():
+        monthly_analytics.setdefault(month.month.year, []).append(month)
 
     return render(request, "analytics/analytics.html", {
-        'registered_user_count': User.objects.all().count(),
-        'competition_count': Competition.objects.all().count(),
-        'competitions_published_count': Competition.objects.filter(published=True).count(),
-        'monthly_total_users_joined': monthly_total_users_joined,
+        'snapshot': snapshot,
+        'registered_user_count': snapshot.user_count,
+        'competition_count': snapshot.competition_count,
+        'competitions_published_count': snapshot.competitions_published_count,
+        'monthly_analytics': monthly_analytics,
     })
@@ -25,6 +25,7 @@ urlpatterns += (
     url(r'^competition/(?P<competition_id>\d+)/submission$', views.competition_submission_create, name='api_competition_submission_post'),
     url(r'^competition/(?P<competition_id>\d+)/submission/sas$', views.CompetitionSubmissionSasApi.as_view(), name='api_competition_submission_sas'),
     url(r'^competition/(?P<competition_id>\d+)/submission/(?P<pk>\d+)$', views.competition_submission_retrieve, name='api_competition_submission_get'),
+    url(r'^competition/(?P<competition_id>\d+)/submission/(?P<pk>\d+)/status$', views.CompetitionSubmissionStatusApi.as_view(), name='api_competition_submission_status'),
     url(r'^competition/(?P<competition_id>\d+)/submission/(?P<pk>\d+)/leaderboard$', views.competition_submission_leaderboard, name='api_competition_submission_leaderboard'),
     url(r'^competition/(?P<competition_id>\d+)/submissions/?$', views.CompetitionSubmissionListViewSet.as_view({'get': 'list'}), name='api_competition_submission_list'),
 
@@ -48,6 +49,7 @@ urlpatterns += (
     url(r'^admin/competitions/list', admin_views.GetCompetitions.as_view(), name="competitions"),
     url(r'^admin/competitions/update', admin_views.UpdateCompetitions.as_view(), name="update_competitions"),
     url(r'^admin/competition/(?P<competition_id>\d+)/apply_upper_bound_limit', admin_views.ApplyUpperBoundLimit.as_view(), name="apply_upper_bound_limit"),
+    url(r'^admin/competitions/apply_upper_bound_limit', admin_views.ApplyUpperBoundLimits.as_view(), name="apply_upper_bound_limits"),
     url(r'^admin/competitions/default_upper_bound_limit', admin_views.GetDefaultUpperBoundLimit.as_view(), name="get_default_upper_bound_limit"),
     # API Docs
     url(r'^docs/', include_docs_urls(title='Codalab API Reference', public=False))
@@ -0,0 +1,146 @@
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.web.models import Competition, CompetitionPhase
+
+User = get_user_model()
+
+
+class AdminCompetitionsTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username="admin", password="pass", is_staff=True)
+        self.organizer = User.objects.create_user(username="organizer", email="organizer@example.com", password="pass")
+        self.client.login(username="admin", password="pass")
+
+    def create_competitions(self, count, creator=None, **kwargs):
+        competitions = []
+        for number in range(count):
+            competition = Competition.objects.create(
+                title="Competition {}".format(number),
+                creator=creator or self.organizer,
+                modified_by=creator or self.organizer,
+                **kwargs
+            )
+            for phasenumber, max_submission_size in ((2, 20), (1, 10)):
+                CompetitionPhase.objects.create(
+                    competition=competition,
+                    phasenumber=phasenumber,
+                    start_date=datetime.datetime.now() + datetime.timedelta(days=phasenumber),
+                    max_submission_size=max_submission_size,
+                )
+            competitions.append(competition)
+        return competitions
+
+    def get_list(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.get(reverse('competitions'), params)
+        assert resp.status_code == 200
+        return resp.json(), len(queries)
+
+    def test_list_is_admin_only(self):
+        self.client.login(username="organizer", password="pass")
+        assert self.client.get(reverse('competitions')).status_code == 403
+
+    def test_list_runs_the_same_queries_for_any_number_of_competitions(self):
+        self.create_competitions(2)
+        _, few_queries = self.get_list()
+        self.create_competitions(8)
+        data, many_queries = self.get_list()
+
+        assert few_queries == many_queries
+        assert len(data['results']) == 10
+        assert data['results'][0]['creator'] == "organizer (organizer@example.com)"
+        assert data['results'][0]['max_submission_sizes'] == [10, 20]
+
+    def test_list_is_paginated_with_a_cursor(self):
+        competitions = self.create_competitions(5)
+
+        data, _ = self.get_list(page_size=2)
+        ids = [competition['id'] for competition in data['results']]
+        while data['next']:
+            data = self.client.get(data['next']).json()
+            ids += [competition['id'] for competition in data['results']]
+
+        assert ids == [competition.pk for competition in competitions]
+
+    def test_list_filters(self):
+        self.create_competitions(2)
+        other = User.objects.create_user(username="other", email="someone@example.com", password="pass")
+        other_competition = self.create_competitions(1, creator=other, published=True)[0]
+
+        for params in ({'creator': 'other'}, {'search': 'someone@'}, {'published': 'true'}):
+            data, _ = self.get_list(**params)
+            assert [competition['id'] for competition in data['results']] == [other_competition.pk]
+        data, _ = self.get_list(search='Competition')
+        assert len(data['results']) == 3
+
+    def post_update(self, competitions):
+        return self.client.post(
+            reverse('update_competitions'),
+            json.dumps({'competitions': competitions}),
+            content_type='application/json',
+        )
+
+    def test_update_changes_many_competitions_at_once(self):
+        first, second, untouched = self.create_competitions(3)
+
+        resp = self.post_update([
+            {'id': first.pk, 'upper_bound_max_submission_size': 50},
+            {'id': second.pk, 'upper_bound_max_submission_size': '60'},
+        ])
+
+        assert resp.status_code == 200
+        assert [(c['id'], c['upper_bound_max_submission_size']) for c in resp.json()] == [
+            (first.pk, 50),
+            (second.pk, 60),
+        ]
+        sizes = dict(Competition.objects.values_list('pk', 'upper_bound_max_submission_size'))
+        assert sizes == {first.pk: 50, second.pk: 60, untouched.pk: untouched.upper_bound_max_submission_size}
+
+    def test_update_only_accepts_whitelisted_fields_and_valid_values(self):
+        competition = self.create_competitions(1)[0]
+
+        assert self.post_update([{'id': competition.pk, 'title': 'Changed'}]).status_code == 400
+        assert self.post_update([{'id': competition.pk, 'upper_bound_max_submission_size': -1}]).status_code == 400
+        assert self.post_update([{'id': 0, 'upper_bound_max_submission_size': 1}]).status_code == 404
+        assert Competition.objects.get(pk=competition.pk).title == "Competition 0"
+
+    def test_apply_upper_bound_limit_updates_the_phases_of_the_competition(self):
+        competition, other = self.create_competitions(2, upper_bound_max_submission_size=10)
+        url = reverse('apply_upper_bound_limit', kwargs={'competition_id': competition.pk})
+
+        with CaptureQueriesContext(connection) as queries:
+            resp = self.client.patch(url)
+
+        assert resp.status_code == 200
+        assert len([query for query in queries if query['sql'].startswith('UPDATE')]) == 1
+        # Only the phase of 20MB changed
+        assert resp.json()['phases_updated'] == 1
+        assert resp.json()['max_submission_sizes'] == [10, 10]
+        assert list(other.phases.order_by('start_date').values_list('max_submission_size', flat=True)) == [10, 20]
+
+    def test_apply_upper_bound_limits_caps_every_phase_over_the_threshold(self):
+        self.create_competitions(3)
+        url = reverse('apply_upper_bound_limits')
+
+        resp = self.client.patch(url, json.dumps({'threshold': 15}), content_type='application/json')
+
+        assert resp.json() == {'phases_updated': 3}
+        assert set(CompetitionPhase.objects.values_list('max_submission_size', flat=True)) == {10, 15}
+        assert self.client.patch(url, json.dumps({'threshold': -1}), content_type='application/json').status_code == 400
+
+    def test_apply_upper_bound_limits_caps_phases_to_their_competition_upper_bound(self):
+        low = self.create_competitions(1, upper_bound_max_submission_size=5)[0]
+        high = self.create_competitions(1, upper_bound_max_submission_size=15)[0]
+
+        resp = self.client.patch(reverse('apply_upper_bound_limits'))
+
+        assert resp.json() == {'phases_updated': 3}
+        assert sorted(low.phases.values_list('max_submission_size', flat=True)) == [5, 5]
+        assert sorted(high.phases.values_list('max_submission_size', flat=True)) == [10, 15]
@@ -0,0 +1,97 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+
+from apps.emails.models import QueuedEmail
+from apps.web.models import Competition, CompetitionParticipant, ParticipantStatus
+
+User = get_user_model()
+
+
+class BulkParticipationStatusTests(TestCase):
+
+    def setUp(self):
+        self.statuses = dict(
+            (codename, ParticipantStatus.objects.get_or_create(name=codename, codename=codename)[0])
+            for codename in (ParticipantStatus.PENDING, ParticipantStatus.APPROVED, ParticipantStatus.DENIED)
+        )
+        self.organizer = User.objects.create_user(username="organizer", password="pass",
+                                                  email="organizer@example.com")
+        self.competition = Competition.objects.create(creator=self.organizer, modified_by=self.organizer)
+        self.participants = [
+            CompetitionParticipant.objects.create(
+                user=User.objects.create_user(
+                    username="participant_{}".format(number),
+                    email="participant_{}@example.com".format(number),
+                    participation_status_updates=number != 0,
+                ),
+                competition=self.competition,
+                status=self.statuses[ParticipantStatus.PENDING],
+            )
+            for number in range(4)
+        ]
+        self.url = reverse('competition-bulk-participation-status', kwargs={'pk': self.competition.pk})
+        self.client.login(username="organizer", password="pass")
+
+    def post(self, **data):
+        return self.client.post(self.url, json.dumps(data), content_type='application/json')
+
+    def get_status(self, participant):
+        return CompetitionParticipant.objects.get(pk=participant.pk).status.codename
+
+    def test_listed_participants_are_approved(self):
+        resp = self.post(
+            status=ParticipantStatus.APPROVED,
+            participant_ids=[participant.pk for participant in self.participants[:3]] + [0],
+        )
+
+        assert resp.status_code == 200
+        assert resp.json() == {
+            'status': ParticipantStatus.APPROVED,
+            'updated': 3,
+            'unchanged': 0,
+            'notified': 2,
+            'not_found': [0],
+        }
+        assert [self.get_status(participant) for participant in self.participants] == ['approved'] * 3 + ['pending']
+
+        participant_email = QueuedEmail.objects.get(subject__startswith='Accepted into')
+        assert sorted(json.loads(participant_email.bcc)) == ['participant_1@example.com', 'participant_2@example.com']
+        organizer_email = QueuedEmail.objects.get(to=json.dumps(['organizer@example.com']))
+        assert organizer_email.subject == '3 participants accepted into your competition!'
+
+    def test_all_pending_participants_matching_the_search_are_denied(self):
+        self.participants[0].status = self.statuses[ParticipantStatus.APPROVED]
+        self.participants[0].save()
+
+        resp = self.post(status=ParticipantStatus.DENIED, reason='Spam', all_pending=True, search='participant_')
+
+        assert resp.json()['updated'] == 3
+        assert [self.get_status(participant) for participant in self.participants] == ['approved'] + ['denied'] * 3
+        assert set(CompetitionParticipant.objects.filter(status__codename='denied').values_list('reason', flat=True)) \
+            == {'Spam'}
+
+        resp = self.post(status=ParticipantStatus.DENIED, all_pending=True, search='nobody')
+        assert resp.json()['updated'] == 0
+
+    def test_unchanged_participants_are_not_notified(self):
+        ids = [participant.pk for participant in self.participants]
+        self.post(status=ParticipantStatus.APPROVED, participant_ids=ids)
+        emails = QueuedEmail.objects.count()
+
+        resp = self.post(status=ParticipantStatus.APPROVED, participant_ids=ids)
+
+        assert resp.json()['unchanged'] == 4
+        assert QueuedEmail.objects.count() == emails
+
+    def test_bad_requests(self):
+        assert self.post(status='unknown', participant_ids=[self.participants[0].pk]).status_code == 400
+        assert self.post(status=ParticipantStatus.APPROVED).status_code == 400
+        assert self.post(status=ParticipantStatus.APPROVED, participant_ids=['x']).status_code == 400
+
+        User.objects.create_user(username="other", password="pass")
+        self.client.login(username="other", password="pass")
+        assert self.post(status=ParticipantStatus.APPROVED, all_pending=True).status_code == 403
+        assert self.get_status(self.participants[0]) == ParticipantStatus.PENDING
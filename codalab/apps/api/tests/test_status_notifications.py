@@ -0,0 +1,129 @@
+import datetime
+import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from apps.customizer.models import Configuration
+from apps.jobs.models import Job, update_job_status_task
+from apps.jobs.notifications import get_status, job_channel, publish_status, submission_channel, wait_for_status
+from apps.web.models import Competition, CompetitionParticipant, CompetitionPhase, CompetitionSubmission, \
+    CompetitionSubmissionStatus, ParticipantStatus
+from apps.web.tasks import _set_submission_status
+
+User = get_user_model()
+
+
+def _run_on_commit_immediately():
+    # TestCase never commits, so run the callbacks right away
+    return mock.patch('apps.jobs.notifications.transaction.on_commit', side_effect=lambda func: func())
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'status-tests'}},
+    STATUS_WAIT_TIMEOUT=0,
+)
+class StatusNotificationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+        Configuration.objects.create(disable_all_submissions=False)
+        self.user = User.objects.create_user(username="participant", password="pass")
+        self.other_user = User.objects.create_user(username="other", password="pass")
+        self.competition = Competition.objects.create(
+            title="Test Competition",
+            creator=self.other_user,
+            modified_by=self.other_user,
+        )
+        self.participant = CompetitionParticipant.objects.create(
+            user=self.user,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0],
+        )
+        self.phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+        )
+        for codename in (CompetitionSubmissionStatus.SUBMITTING, CompetitionSubmissionStatus.RUNNING):
+            CompetitionSubmissionStatus.objects.get_or_create(name=codename, codename=codename)
+        self.submission = CompetitionSubmission.objects.create(phase=self.phase, participant=self.participant)
+        self.submission_status_url = reverse('api_competition_submission_status', kwargs={
+            'competition_id': self.competition.pk,
+            'pk': self.submission.pk,
+        })
+
+    def test_wait_returns_messages_newer_than_since(self):
+        version = publish_status('test', {'status': 'running'})
+
+        assert wait_for_status('test', since=0)['status'] == 'running'
+        assert wait_for_status('test', since=version, timeout=0) is None
+        publish_status('test', {'status': 'finished'})
+        assert wait_for_status('test', since=version) == {'status': 'finished', 'version': version + 1}
+
+    def test_job_status_update_is_published(self):
+        job = Job.objects.create_job('create_competition', {})
+
+        with _run_on_commit_immediately():
+            update_job_status_task(job.pk, {'status': 'finished', 'info': {'competition_id': 42}})
+
+        assert get_status(job_channel(job.pk)) == {
+            'status': 'finished',
+            'info': {'competition_id': 42},
+            'version': 1,
+        }
+
+    def test_creation_status_answers_waiting_client_with_new_status(self):
+        job = Job.objects.create_job('create_competition', {})
+        self.client.login(username="participant", password="pass")
+        url = reverse('api_competition_creation_status', kwargs={'token': job.pk})
+        assert self.client.get(url).json() == {'status': 'pending', 'version': 0}
+
+        with _run_on_commit_immediately():
+            update_job_status_task(job.pk, {'status': 'finished', 'info': {'competition_id': 42}})
+
+        assert self.client.get(url, {'since': 0}).json() == {'status': 'finished', 'id': 42, 'version': 1}
+
+    def test_submission_status_update_is_published(self):
+        with _run_on_commit_immediately():
+            _set_submission_status(self.submission.pk, CompetitionSubmissionStatus.RUNNING)
+
+        assert get_status(submission_channel(self.submission.pk))['status'] == CompetitionSubmissionStatus.RUNNING
+
+        self.client.login(username="participant", password="pass")
+        resp = self.client.get(self.submission_status_url, {'since': 0})
+        assert resp.status_code == 200
+        assert resp.json()['status'] == CompetitionSubmissionStatus.RUNNING
+        assert resp.json()['version'] == 1
+
+    def test_submission_status_is_only_shown_to_participant_and_admins(self):
+        User.objects.create_user(username="stranger", password="pass")
+        self.client.login(username="stranger", password="pass")
+        assert self.client.get(self.submission_status_url).status_code == 403
+
+        self.client.login(username="other", password="pass")
+        assert self.client.get(self.submission_status_url).status_code == 200
+
+    def test_only_allowed_callers_wait_for_the_submission_status(self):
+        User.objects.create_user(username="stranger", password="pass")
+        self.client.login(username="stranger", password="pass")
+        missing_url = reverse('api_competition_submission_status', kwargs={
+            'competition_id': self.competition.pk,
+            'pk': self.submission.pk + 1,
+        })
+
+        with mock.patch('apps.api.views.competition_views.wait_for_status') as wait:
+            assert self.client.get(self.submission_status_url, {'since': 0}).status_code == 403
+            assert self.client.get(missing_url, {'since': 0}).status_code == 404
+            assert not wait.called
+
+            self.client.login(username="participant", password="pass")
+            assert self.client.get(self.submission_status_url, {'since': 0}).status_code == 200
+            wait.assert_called_once_with(submission_channel(self.submission.pk), 0)
+
+    def test_invalid_since_is_rejected(self):
+        self.client.login(username="participant", password="pass")
+        assert self.client.get(self.submission_status_url, {'since': 'abc'}).status_code == 400
@@ -1,40 +1,88 @@
 from rest_framework import (permissions, status, views)
 from rest_framework.decorators import permission_classes
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 
 import logging
 
+from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.db.models import Case, F, Prefetch, Q, When
 from django.conf import settings
 
 from apps.web.models import Competition, CompetitionPhase
 
 logger = logging.getLogger(__name__)
 
+# Fields admins can change on many competitions at once with UpdateCompetitions. They are written with a single
+# UPDATE, so fields Competition.save() or ChaHub depend on don't belong here.
+ADMIN_UPDATABLE_COMPETITION_FIELDS = ('upper_bound_max_submission_size',)
+# Competitions changed per UPDATE query
+ADMIN_UPDATE_BATCH_SIZE = 500
+
+
+class AdminCompetitionPagination(CursorPagination):
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+def get_admin_competitions():
+    """:return: Competitions with their creator and their phases, ordered by start date, loaded along."""
+    return Competition.objects.select_related('creator').prefetch_related(Prefetch(
+        'phases',
+        queryset=CompetitionPhase.objects.order_by('start_date').only(
+            'id', 'competition_id', 'start_date', 'max_submission_size',
+        ),
+    ))
+
+
+def get_admin_competition_data(competition):
+    return {
+        'id': competition.id,
+        'title': competition.title,
+        'creator': competition.creator.username + " (" + competition.creator.email + ")",
+        'start_date': competition.start_date,
+        'end_date': competition.end_date,
+        'upper_bound_max_submission_size': competition.upper_bound_max_submission_size,
+        'max_submission_sizes': [phase.max_submission_size for phase in competition.phases.all()]
+    }
+
 
 @permission_classes((permissions.IsAuthenticated,))
 class GetCompetitions(views.APIView):
     """
-    Gets the competitions
+    Gets the competitions, a page at a time:
+        { next: <url of the next page>, previous: <url of the previous page>, results: [<competition>, ...] }
+
+    Query parameters:
+        page_size: Competitions per page, 100 by default and at most 1000.
+        search: Only the competitions with this in their title, or in their creator's username or email.
+        creator: Only the competitions of the creator with this username.
+        published: 'true' or 'false', only the published or unpublished competitions.
     """
     def get(self, request, *args, **kwargs):
         if not self.request.user.is_staff:
             raise PermissionDenied(detail="Admin only")
 
-        competitions = []
-        for competition in list(Competition.objects.order_by('id').all()):
-            competitions.append({
-                'id': competition.id,
-                'title': competition.title,
-                'creator': competition.creator.username + " (" + competition.creator.email + ")",
-                'start_date': competition.start_date,
-                'end_date': competition.end_date,
-                'upper_bound_max_submission_size': competition.upper_bound_max_submission_size,
-                'max_submission_sizes': [phase.max_submission_size for phase in competition.phases.all().order_by('start_date')]
-            })
+        competitions = get_admin_competitions()
+        search = request.query_params.get('search')
+        if search:
+            competitions = competitions.filter(
+                Q(title__icontains=search) | Q(creator__username__icontains=search) | Q(creator__email__icontains=search)
+            )
+        creator = request.query_params.get('creator')
+        if creator:
+            competitions = competitions.filter(creator__username=creator)
+        published = request.query_params.get('published')
+        if published in ('true', 'false'):
+            competitions = competitions.filter(published=published == 'true')
 
-        return Response(competitions, status=status.HTTP_200_OK)
+        paginator = AdminCompetitionPagination()
+        page = paginator.paginate_queryset(competitions, request, view=self)
+        return paginator.get_paginated_response([get_admin_competition_data(competition) for competition in page])
 
 
 @permission_classes((permissions.IsAuthenticated,))
@@ -50,47 +98,64 @@ class UpdateCompetitions(views.APIView):
             }
         ]
     }
+    Only the attributes of ADMIN_UPDATABLE_COMPETITION_FIELDS can be updated.
     """
     def post(self, request, *args, **kwargs):
         if not self.request.user.is_staff:
             raise PermissionDenied(detail="Admin only")
-        
+
         competitions_to_update = request.data['competitions']
         if not competitions_to_update:
             return Response("No competitions to update", status=status.HTTP_204_NO_CONTENT)
 
-        with transaction.atomic():
-            for competition in competitions_to_update:
+        # Values by field and competition id, validated like the model fields would
+        values = {}
+        for competition in competitions_to_update:
+            for attribute, value in competition.items():
+                if attribute == 'id':
+                    continue
+                if attribute not in ADMIN_UPDATABLE_COMPETITION_FIELDS:
+                    return Response("'{}' can't be updated".format(attribute), status=status.HTTP_400_BAD_REQUEST)
+                field = Competition._meta.get_field(attribute)
                 try:
-                    competition_in_db = Competition.objects.select_for_update().get(pk=competition['id'])
-                    for attribute, value in competition.items():
-                        if attribute != 'id':
-                            logger.debug("Updating competition %d", competition_in_db.id)
-                            setattr(competition_in_db, attribute, value)
-                    competition_in_db.save()
-                except Competition.DoesNotExist:
-                    return Response(status=status.HTTP_404_NOT_FOUND)
+                    values.setdefault(attribute, {})[competition['id']] = field.clean(value, None)
+                except ValidationError as e:
+                    return Response({attribute: e.messages}, status=status.HTTP_400_BAD_REQUEST)
 
         ids = [comp['id'] for comp in competitions_to_update]
-        competitions_updated = []
-        for comp_id, competition in Competition.objects.in_bulk(ids).items():
-            competitions_updated.append({
-                'id': comp_id,
-                'title': competition.title,
-                'creator': competition.creator.username,
-                'start_date': competition.start_date,
-                'end_date': competition.end_date,
-                'upper_bound_max_submission_size': competition.upper_bound_max_submission_size,
-                'max_submission_sizes': [phase.max_submission_size for phase in competition.phases.all().order_by('start_date')]
-            })
-
+        with transaction.atomic():
+            found_ids = set(Competition.objects.select_for_update().filter(pk__in=ids).values_list('pk', flat=True))
+            if len(found_ids) != len(set(ids)):
+                return Response(status=status.HTTP_404_NOT_FOUND)
+
+            for start in range(0, len(ids), ADMIN_UPDATE_BATCH_SIZE):
+                batch_ids = ids[start:start + ADMIN_UPDATE_BATCH_SIZE]
+                # Django 1.11 has no bulk_update, so each field gets a CASE over the competition ids
+                updates = {}
+                for attribute, values_by_id in values.items():
+                    whens = [When(pk=pk, then=values_by_id[pk]) for pk in batch_ids if pk in values_by_id]
+                    if whens:
+                        updates[attribute] = Case(
+                            *whens,
+                            default=F(attribute),
+                            output_field=Competition._meta.get_field(attribute)
+                        )
+                if updates:
+                    logger.debug("Updating competitions %s", batch_ids)
+                    Competition.objects.filter(pk__in=batch_ids).update(**updates)
+
+        competitions_updated = [
+            get_admin_competition_data(competition)
+            for competition in get_admin_competitions().filter(pk__in=ids).order_by('id')
+        ]
         return Response(competitions_updated, status=status.HTTP_200_OK)
 
 
 @permission_classes((permissions.IsAuthenticated,))
 class ApplyUpperBoundLimit(views.APIView):
     """
-    Update the max submission size for all phases of the tompetition
+    Update the max submission size for all phases of the competition, the response has the number of
+    'phases_updated' next to the competition
     """
     def patch(self, request, *args, **kwargs):
         if not self.request.user.is_staff:
@@ -98,32 +163,62 @@ class ApplyUpperBoundLimit(views.APIView):
 
         competition_id = self.kwargs.get('competition_id')
         try:
-            competition = Competition.objects.get(pk=competition_id)
+            competition = get_admin_competitions().get(pk=competition_id)
         except Competition.DoesNotExist:
             return Response("Competition not found or is not accessible", status=status.HTTP_404_NOT_FOUND)
-        
-        with transaction.atomic():
-            for phase in competition.phases.all().order_by('start_date'):
-                try:
-                    phase_in_db = CompetitionPhase.objects.select_for_update().get(pk=phase.id)
-                    phase_in_db.max_submission_size = competition.upper_bound_max_submission_size
-                    phase_in_db.save()
-                except CompetitionPhase.DoesNotExist:
-                    return Response(status=status.HTTP_404_NOT_FOUND)
-        
-        competition_updated_in_db = Competition.objects.get(pk=competition_id)
-        competition_updated = {
-            'id': competition_updated_in_db.id,
-            'title': competition_updated_in_db.title,
-            'creator': competition_updated_in_db.creator.username,
-            'start_date': competition_updated_in_db.start_date,
-            'end_date': competition_updated_in_db.end_date,
-            'upper_bound_max_submission_size': competition_updated_in_db.upper_bound_max_submission_size,
-            'max_submission_sizes': [phase.max_submission_size for phase in competition_updated_in_db.phases.all().order_by('start_date')]
-        }
+
+        upper_bound = competition.upper_bound_max_submission_size
+        phases_updated = CompetitionPhase.objects.filter(competition=competition).exclude(
+            max_submission_size=upper_bound,
+        ).update(max_submission_size=upper_bound)
+        logger.info("Applied the upper bound limit of competition %s to %s phases", competition.pk, phases_updated)
+
+        competition_updated = get_admin_competition_data(get_admin_competitions().get(pk=competition_id))
+        competition_updated['phases_updated'] = phases_updated
         return Response(competition_updated, status=status.HTTP_200_OK)
 
 
+@permission_classes((permissions.IsAuthenticated,))
+class ApplyUpperBoundLimits(views.APIView):
+    """
+    Caps the max submission size of the phases of every competition
+    body template:
+    {
+        threshold: <size in MB>
+    }
+    Phases over the threshold are set to it. Without a threshold, phases over the upper bound of their
+    competition are set to that upper bound, with one UPDATE per distinct upper bound. The response has the
+    number of 'phases_updated'.
+    """
+    def patch(self, request, *args, **kwargs):
+        if not self.request.user.is_staff:
+            raise PermissionDenied(detail="Admin only")
+
+        threshold = request.data.get('threshold')
+        phases = CompetitionPhase.objects.all()
+        if threshold is not None:
+            try:
+                threshold = CompetitionPhase._meta.get_field('max_submission_size').clean(threshold, None)
+            except ValidationError as e:
+                return Response({'threshold': e.messages}, status=status.HTTP_400_BAD_REQUEST)
+            phases_updated = phases.filter(max_submission_size__gt=threshold).update(max_submission_size=threshold)
+        else:
+            # One UPDATE per distinct upper bound, there are only a handful of them
+            upper_bounds = Competition.objects.order_by().values_list(
+                'upper_bound_max_submission_size', flat=True,
+            ).distinct()
+            phases_updated = 0
+            with transaction.atomic():
+                for upper_bound in upper_bounds:
+                    phases_updated += phases.filter(
+                        competition__upper_bound_max_submission_size=upper_bound,
+                        max_submission_size__gt=upper_bound,
+                    ).update(max_submission_size=upper_bound)
+        logger.info("Capped the max submission size of %s phases", phases_updated)
+
+        return Response({'phases_updated': phases_updated}, status=status.HTTP_200_OK)
+
+
 @permission_classes((permissions.IsAuthenticated,))
 class GetDefaultUpperBoundLimit(views.APIView):
     """
@@ -7,6 +7,7 @@ import re
 from apps.api import serializers
 from apps.authenz.models import ClUser
 from apps.jobs.models import Job
+from apps.jobs.notifications import get_status_version, job_channel, submission_channel, wait_for_status
 from apps.teams import models as teammodels
 from apps.web import models as webmodels
 from apps.web.models import CompetitionSubmission, Competition, CompetitionParticipant, ParticipantStatus, \
@@ -118,6 +119,19 @@ class CompetitionCreationApi(views.APIView):
         return Response({'token': job.pk}, status=status.HTTP_201_CREATED)
 
 
+def _get_since_param(request):
+    """
+    :return: The status version the client has last seen, from the 'since' query parameter, or None.
+    """
+    since = request.query_params.get('since')
+    if since is None:
+        return None
+    try:
+        return int(since)
+    except ValueError:
+        raise ParseError("'since' must be a status version.")
+
+
 @permission_classes((permissions.IsAuthenticated,))
 class CompetitionCreationStatusApi(views.APIView):
     """
@@ -126,17 +140,25 @@ class CompetitionCreationStatusApi(views.APIView):
     def get(self, request, token):
         """
         Returns the operation status:
-           { 'status': <value> }
+           { 'status': <value>, 'version': <version> }
         where <value> is status of the job as defined by the 'code_name' in apps.jobs.models.Job.STATUS_BY_CODE.
+
+        Instead of polling, pass the last 'version' received as the 'since' query parameter: the response is
+        held until the status changes or `settings.STATUS_WAIT_TIMEOUT` seconds passed.
         """
         user_id = self.request.user.id
         logger.debug("CompetitionCreationStatus: requestor=%s; token=%s.", user_id, token)
+        since = _get_since_param(request)
+        channel = job_channel(token)
+        if since is not None:
+            wait_for_status(channel, since)
+        version = get_status_version(channel)
         try:
             job = Job.objects.get(pk=token)
         except Job.DoesNotExist:
             return Response(status=status.HTTP_404_NOT_FOUND)
         logger.debug("CompetitionCreationStatus: requestor=%s; job=%s; job.status:%s.", user_id, job.pk, job.status)
-        data = {'status' : job.get_status_code_name()}
+        data = {'status': job.get_status_code_name(), 'version': version}
         info = job.get_task_info()
         logger.debug("CompetitionCreationStatus: info=%s", info)
         if 'competition_id' in info:
@@ -145,6 +167,50 @@ class CompetitionCreationStatusApi(views.APIView):
             data['error'] = info['error']
         return Response(data)
 
+
+@permission_classes((permissions.IsAuthenticated,))
+class CompetitionSubmissionStatusApi(views.APIView):
+    """
+    Provides a web API to track the status of a submission, for its participant and the competition admins.
+    """
+    def get(self, request, competition_id, pk):
+        """
+        Returns the submission status:
+           { 'id': <pk>, 'status': <codename>, 'exception_details': <value>, 'version': <version> }
+
+        Pass the last 'version' received as the 'since' query parameter to wait for the next status change,
+        like CompetitionCreationStatusApi.
+        """
+        since = _get_since_param(request)
+        # Check the access first, waiting holds a worker for up to STATUS_WAIT_TIMEOUT seconds
+        try:
+            submission = webmodels.CompetitionSubmission.objects.select_related(
+                'participant',
+                'phase__competition',
+            ).get(pk=pk, phase__competition_id=competition_id)
+        except webmodels.CompetitionSubmission.DoesNotExist:
+            raise Http404()
+        if submission.participant.user_id != request.user.id:
+            competition = submission.phase.competition
+            if competition.creator_id != request.user.id and not competition.admins.filter(pk=request.user.pk).exists():
+                raise PermissionDenied()
+
+        channel = submission_channel(submission.pk)
+        if since is not None:
+            wait_for_status(channel, since)
+        version = get_status_version(channel)
+        # Read after the version, so a change in between is sent again instead of being missed
+        status, exception_details = webmodels.CompetitionSubmission.objects.filter(pk=submission.pk).values_list(
+            'status__codename',
+            'exception_details',
+        ).get()
+        return Response({
+            'id': submission.pk,
+            'status': status,
+            'exception_details': exception_details,
+            'version': version,
+        })
+
 class CompetitionAPIViewSet(viewsets.ModelViewSet):
     serializer_class = serializers.CompetitionSerial
     queryset = webmodels.Competition.objects.all()
@@ -234,9 +300,9 @@ class CompetitionAPIViewSet(viewsets.ModelViewSet):
         # If there is no registration required we just check to make sure they have agreed to the terms and conditions
         # which is done by the javascript before the ajax call, during form validation.
         if comp.has_registration:
-            status = webmodels.ParticipantStatus.objects.get(codename=webmodels.ParticipantStatus.PENDING)
+            status = webmodels.ParticipantStatus.objects.get_cached(webmodels.ParticipantStatus.PENDING)
         else:
-            status = webmodels.ParticipantStatus.objects.get(codename=webmodels.ParticipantStatus.APPROVED)
+            status = webmodels.ParticipantStatus.objects.get_cached(webmodels.ParticipantStatus.APPROVED)
 
         p, cr = webmodels.CompetitionParticipant.objects.get_or_create(
             user=self.request.user,
@@ -335,7 +401,7 @@ class CompetitionAPIViewSet(viewsets.ModelViewSet):
 
         try:
             participant = webmodels.CompetitionParticipant.objects.get(competition=comp, pk=participant_id)
-            participant.status = webmodels.ParticipantStatus.objects.get(codename=status)
+            participant.status = webmodels.ParticipantStatus.objects.get_cached(status)
             participant.reason = reason
             participant.save()
             resp = {
@@ -404,6 +470,57 @@ class CompetitionAPIViewSet(viewsets.ModelViewSet):
 
         return Response(json.dumps(resp), content_type="application/json")
 
+    @action(detail=True, methods=['POST'], permission_classes=[permissions.IsAuthenticated])
+    def bulk_participation_status(self, request, pk=None):
+        """
+        Changes the status of many participants at once, see `change_participants_status`.
+
+        Body:
+            status: Codename of the new status, like 'approved' or 'denied'.
+            reason: Optional reason shown to the participants.
+            participant_ids: List of the participants to change.
+            all_pending: Instead of `participant_ids`, true to change every pending participant.
+            search: With `all_pending`, only the participants with this in their username or email.
+
+        Returns the number of participants 'updated', 'unchanged' and 'notified', and the 'not_found' ids.
+        """
+        comp = self.get_object()
+        if comp.creator != request.user and request.user not in comp.admins.all():
+            raise PermissionDenied()
+
+        participants = webmodels.CompetitionParticipant.objects.filter(competition=comp)
+        participant_ids = request.data.get('participant_ids')
+        not_found = []
+        if request.data.get('all_pending'):
+            participants = participants.filter(status__codename=webmodels.ParticipantStatus.PENDING)
+            search = request.data.get('search')
+            if search:
+                participants = participants.filter(
+                    Q(user__username__icontains=search) | Q(user__email__icontains=search)
+                )
+        elif isinstance(participant_ids, list):
+            try:
+                participant_ids = set(int(participant_id) for participant_id in participant_ids)
+            except (TypeError, ValueError):
+                raise ValidationError({'participant_ids': 'Expected a list of participant ids.'})
+            participants = participants.filter(pk__in=participant_ids)
+            not_found = sorted(participant_ids - set(participants.values_list('pk', flat=True)))
+        else:
+            raise ValidationError({'participant_ids': 'Expected a list of participant ids, or all_pending.'})
+
+        try:
+            summary = webmodels.change_participants_status(
+                comp,
+                participants,
+                request.data.get('status'),
+                reason=request.data.get('reason'),
+            )
+        except webmodels.ParticipantStatus.DoesNotExist:
+            raise ValidationError({'status': 'Unknown participant status.'})
+        summary['status'] = request.data.get('status')
+        summary['not_found'] = not_found
+        return Response(summary)
+
     @action(detail=True, methods=['POST', 'PUT'], permission_classes=[permissions.IsAuthenticated])
     def team_status(self, request, pk=None):
         comp = self.get_object()
@@ -417,7 +534,7 @@ class CompetitionAPIViewSet(viewsets.ModelViewSet):
 
         try:
             team = teammodels.Team.objects.get(competition=comp, pk=teamID)
-            team.status = teammodels.TeamStatus.objects.get(codename=status)
+            team.status = teammodels.TeamStatus.objects.get_cached(status)
             team.reason = reason
             team.save()
             resp = {
@@ -884,7 +1001,7 @@ class AddChagradeBotView(views.APIView):
             raise Http404("Chagrade bot user not found or is not accessible!")
         exists = CompetitionParticipant.objects.filter(user=bot_user, competition=comp)
         if not exists:
-            approved_status = ParticipantStatus.objects.get(codename=ParticipantStatus.APPROVED)
+            approved_status = ParticipantStatus.objects.get_cached(ParticipantStatus.APPROVED)
             CompetitionParticipant.objects.create(
                 user=bot_user,
                 competition=comp,
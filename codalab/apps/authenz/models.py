@@ -59,14 +59,16 @@ class ClUser(ChaHubSaveMixin, auth_models.AbstractUser):
         return True
 
     def save(self, *args, **kwargs):
+        # Only recorded here, Mailchimp is updated in bulk by apps.newsletter.tasks.sync_mailing_list
         if self.newsletter_opt_in and self.email and self.is_active:
             subscription, created = NewsletterSubscription.objects.get_or_create(email=self.email)
-            if not subscription.subscription_active or subscription.needs_retry:
+            if not subscription.subscription_active:
                 subscription.subscribe()
 
         elif not self.newsletter_opt_in and self.email:
             subscription = NewsletterSubscription.objects.filter(email=self.email).first()
-            if subscription:
+            # Inactive subscriptions still pending are already waiting to be removed from Mailchimp
+            if subscription and (subscription.subscription_active or not subscription.needs_retry):
                 subscription.unsubscribe()
 
         super(ClUser, self).save(*args, **kwargs)
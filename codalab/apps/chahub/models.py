@@ -2,15 +2,53 @@ import hashlib
 import json
 import logging
 import os
+from collections import OrderedDict
+from datetime import timedelta
 
 from django.conf import settings
-from django.db import models, IntegrityError
+from django.contrib.contenttypes.models import ContentType
+from django.db import models, transaction, IntegrityError
 from django.utils import timezone
 
 from apps.chahub.utils import send_to_chahub
 
 logger = logging.getLogger(__name__)
 
+# Maximum amount of outbox entries sent to an endpoint in one request
+CHAHUB_OUTBOX_BATCH_SIZE = 100
+# How long a worker may take to deliver the entries it claimed before another worker picks them up
+CHAHUB_OUTBOX_LEASE = timedelta(minutes=5)
+# Delay before each retry of an entry that failed to send. Once they are exhausted the entry is dropped and its
+# object marked with `chahub_needs_retry` for `do_chahub_retries` to queue again
+CHAHUB_OUTBOX_BACKOFF = [
+    timedelta(minutes=1),
+    timedelta(minutes=5),
+    timedelta(minutes=30),
+    timedelta(hours=2),
+    timedelta(hours=12),
+]
+CHAHUB_OUTBOX_RETENTION = timedelta(days=1)
+
+
+class ChaHubOutboxEntry(models.Model):
+    """Data waiting to be sent to ChaHub, written in the same transaction as the object it belongs to."""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    endpoint = models.CharField(max_length=255)
+    data = models.TextField()
+    data_hash = models.CharField(max_length=32)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        index_together = (('sent_at', 'endpoint', 'next_attempt_at'),)
+
+    def __str__(self):
+        return "{} {}={}".format(self.endpoint, self.content_type_id, self.object_id)
+
 
 class ChaHubSaveMixin(models.Model):
     """Helper mixin for saving model data to ChaHub.
@@ -19,13 +57,14 @@ class ChaHubSaveMixin(models.Model):
     1) Override `get_chahub_endpoint()` to return the endpoint on ChaHub API for this model
     2) Override `get_chahub_data()` to return a dictionary to send to ChaHub
     3) Override `get_chahub_is_valid()` to return True/False on whether or not the object is ready to send to ChaHub
-    4) Data is sent on `save()` and `chahub_timestamp` timestamp is set
+    4) Data is queued in the ChaHub outbox on `save()`, `apps.chahub.tasks.deliver_chahub_outbox` sends it and
+       sets the `chahub_timestamp` timestamp
 
-    To update remove the `chahub_timestamp` timestamp and call `save()`"""
+    To update remove the `chahub_data_hash` hash and call `save()`"""
     # Timestamp set whenever a successful update happens
     chahub_timestamp = models.DateTimeField(null=True, blank=True)
 
-    # A hash of the last json information that was sent to avoid sending duplicate information
+    # A hash of the last json information that was queued to avoid sending duplicate information
     chahub_data_hash = models.TextField(null=True, blank=True)
 
     # If sending to chahub fails, we may need a retry. Signal that by setting this attribute to True
@@ -67,19 +106,31 @@ class ChaHubSaveMixin(models.Model):
     # Regular methods
     # -------------------------------------------------------------------------
     def save(self, force_to_chahub=False, *args, **kwargs):
-        # We do a save here to give us an ID for generating URLs and such
-        try:
-            super(ChaHubSaveMixin, self).save(*args, **kwargs)
-        except IntegrityError:
-            logger.info("Object already has ID skipping save in Chahub mixin.")
+        with transaction.atomic():
+            # We do a save here to give us an ID for generating URLs and such
+            try:
+                with transaction.atomic():
+                    super(ChaHubSaveMixin, self).save(*args, **kwargs)
+            except IntegrityError:
+                logger.info("Object already has ID skipping save in Chahub mixin.")
+
+            self.queue_chahub_update(force_to_chahub=force_to_chahub)
 
+    def _update_chahub_fields(self, **fields):
+        for name, value in fields.items():
+            setattr(self, name, value)
+        # Bypasses save() so we don't queue again, the base manager includes deleted competitions
+        type(self)._base_manager.filter(pk=self.pk).update(**fields)
+
+    def queue_chahub_update(self, force_to_chahub=False):
+        """Adds the ChaHub data of this object to the outbox, unless the same data was queued before."""
         if os.environ.get('PYTEST') and not settings.PYTEST_FORCE_CHAHUB:
             # For tests let's just assume Chahub isn't available
             # We can mock proper responses
             return None
 
         # Make sure we're not sending these in tests
-        if settings.CHAHUB_API_URL:
+        if settings.CHAHUB_API_URL and self.pk is not None:
             is_valid = self.get_chahub_is_valid()
 
             logger.info("ChaHub :: {}={} is_valid = {}".format(self.__class__.__name__, self.pk, is_valid))
@@ -87,29 +138,121 @@ class ChaHubSaveMixin(models.Model):
             if is_valid and self.chahub_needs_retry and not force_to_chahub:
                 logger.info("ChaHub :: This has already been tried, waiting for do_retries to force resending")
             elif is_valid:
+                data = json.dumps(self.get_chahub_data())
                 # Encoded to utf-8 so we can hash it. (Py3)
-                data = json.dumps(self.get_chahub_data()).encode('utf-8')
-                data_hash = hashlib.md5(data).hexdigest()
-
-                # Send to chahub if we haven't yet, we have new data
-                if not self.chahub_timestamp or self.chahub_data_hash != data_hash:
-                    resp = send_to_chahub(self.get_chahub_endpoint(), data)
-
-                    if resp and resp.status_code in (200, 201):
-                        logger.info("ChaHub :: Received response {} {}".format(resp.status_code, resp.content))
-                        self.chahub_timestamp = timezone.now()
-                        self.chahub_data_hash = data_hash
-                        self.chahub_needs_retry = False
-                    else:
-                        status = resp.status_code if hasattr(resp, 'status_code') else 'N/A'
-                        body = resp.content if hasattr(resp, 'content') else 'N/A'
-                        logger.info("ChaHub :: Error sending to chahub, status={}, body={}".format(status, body))
-                        self.chahub_needs_retry = True
-
-                    # We save at the beginning, but then again at the end to save our new chahub timestamp and such
-                    super(ChaHubSaveMixin, self).save(force_update=True)
+                data_hash = hashlib.md5(data.encode('utf-8')).hexdigest()
+
+                # Queue for chahub if we haven't yet, we have new data
+                if self.chahub_data_hash != data_hash:
+                    ChaHubOutboxEntry.objects.create(
+                        content_type=ContentType.objects.get_for_model(self),
+                        object_id=self.pk,
+                        endpoint=self.get_chahub_endpoint(),
+                        data=data,
+                        data_hash=data_hash,
+                    )
+                    self._update_chahub_fields(chahub_data_hash=data_hash, chahub_needs_retry=False)
             elif not is_valid and self.chahub_needs_retry:
                 # This is NOT valid but also marked as need retry, unmark need retry until this is
                 # valid again
-                self.chahub_needs_retry = False
-                super(ChaHubSaveMixin, self).save(force_update=True)
+                self._update_chahub_fields(chahub_needs_retry=False)
+
+
+def _update_chahub_objects(entries, **fields):
+    """Updates the objects the given outbox entries belong to, with one query per model."""
+    object_ids_by_content_type = {}
+    for entry in entries:
+        object_ids_by_content_type.setdefault(entry.content_type_id, []).append(entry.object_id)
+    for content_type_id, object_ids in object_ids_by_content_type.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        model._base_manager.filter(pk__in=object_ids).update(**fields)
+
+
+def claim_chahub_outbox_entries(endpoint, batch_size=CHAHUB_OUTBOX_BATCH_SIZE):
+    """
+    Takes the oldest entries due for `endpoint` and leases them to this worker for `CHAHUB_OUTBOX_LEASE`.
+
+    :return: List of ChaHubOutboxEntry, oldest first.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        entries = list(ChaHubOutboxEntry.objects.select_for_update(skip_locked=True).filter(
+            endpoint=endpoint,
+            sent_at__isnull=True,
+            next_attempt_at__lte=now,
+        ).order_by('pk')[:batch_size])
+        ChaHubOutboxEntry.objects.filter(pk__in=[entry.pk for entry in entries]).update(
+            next_attempt_at=now + CHAHUB_OUTBOX_LEASE
+        )
+    return entries
+
+
+def send_chahub_outbox_entries(endpoint, entries):
+    """
+    Sends the given outbox entries to `endpoint` in a single request. Only the newest entry of each object is
+    sent, older ones are dropped. Failed entries are retried following `CHAHUB_OUTBOX_BACKOFF`.
+
+    :return: True if ChaHub accepted the entries.
+    """
+    latest_entries = OrderedDict()
+    for entry in entries:
+        latest_entries[(entry.content_type_id, entry.object_id)] = entry
+    latest_entry_ids = set(entry.pk for entry in latest_entries.values())
+    ChaHubOutboxEntry.objects.filter(
+        pk__in=[entry.pk for entry in entries if entry.pk not in latest_entry_ids]
+    ).delete()
+    entries = list(latest_entries.values())
+
+    payload = []
+    for entry in entries:
+        data = json.loads(entry.data)
+        payload.extend(data if isinstance(data, list) else [data])
+
+    resp = send_to_chahub(endpoint, json.dumps(payload).encode('utf-8'))
+    now = timezone.now()
+
+    if resp is not None and resp.status_code in (200, 201):
+        logger.info("ChaHub :: Sent {} objects to {}".format(len(entries), endpoint))
+        with transaction.atomic():
+            ChaHubOutboxEntry.objects.filter(pk__in=latest_entry_ids).update(sent_at=now)
+            _update_chahub_objects(entries, chahub_timestamp=now, chahub_needs_retry=False)
+        return True
+
+    status = resp.status_code if hasattr(resp, 'status_code') else 'N/A'
+    body = resp.content if hasattr(resp, 'content') else 'N/A'
+    error = "status={}, body={}".format(status, body)
+    logger.info("ChaHub :: Error sending {} objects to {}, {}".format(len(entries), endpoint, error))
+
+    entries_by_attempts = {}
+    for entry in entries:
+        entries_by_attempts.setdefault(entry.attempts + 1, []).append(entry)
+    with transaction.atomic():
+        for attempts, attempted_entries in entries_by_attempts.items():
+            attempted_ids = [entry.pk for entry in attempted_entries]
+            if attempts > len(CHAHUB_OUTBOX_BACKOFF):
+                ChaHubOutboxEntry.objects.filter(pk__in=attempted_ids).delete()
+                _update_chahub_objects(attempted_entries, chahub_needs_retry=True, chahub_data_hash=None)
+            else:
+                ChaHubOutboxEntry.objects.filter(pk__in=attempted_ids).update(
+                    attempts=attempts,
+                    next_attempt_at=now + CHAHUB_OUTBOX_BACKOFF[attempts - 1],
+                    last_error=error,
+                )
+    return False
+
+
+def send_chahub_outbox(batch_size=CHAHUB_OUTBOX_BATCH_SIZE):
+    """Sends every due outbox entry, in batches of `batch_size` per endpoint."""
+    ChaHubOutboxEntry.objects.filter(sent_at__lt=timezone.now() - CHAHUB_OUTBOX_RETENTION).delete()
+    endpoints = ChaHubOutboxEntry.objects.filter(
+        sent_at__isnull=True,
+        next_attempt_at__lte=timezone.now(),
+    ).order_by().values_list('endpoint', flat=True).distinct()
+    for endpoint in list(endpoints):
+        while True:
+            entries = claim_chahub_outbox_entries(endpoint, batch_size)
+            if not entries:
+                break
+            if not send_chahub_outbox_entries(endpoint, entries):
+                # ChaHub is refusing this endpoint, leave the rest for the next run
+                break
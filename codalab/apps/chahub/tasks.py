@@ -0,0 +1,15 @@
+import logging
+
+from celery import task
+from django.conf import settings
+
+from apps.chahub.models import send_chahub_outbox
+
+logger = logging.getLogger(__name__)
+
+
+@task(queue='site-worker', soft_time_limit=60 * 5)
+def deliver_chahub_outbox():
+    if not settings.CHAHUB_API_URL:
+        return
+    send_chahub_outbox()
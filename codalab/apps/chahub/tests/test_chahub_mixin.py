@@ -1,12 +1,15 @@
 import datetime
+import json
 import mock
 from apps.authenz.models import ClUser
+from apps.chahub.models import ChaHubOutboxEntry, CHAHUB_OUTBOX_BACKOFF, send_chahub_outbox
 from apps.customizer.models import Configuration
 from apps.web.models import CompetitionSubmission, Competition, CompetitionPhase, CompetitionParticipant, \
     ParticipantStatus
 from django.conf import settings
 from django.http.response import HttpResponseBase
 from django.test import TestCase
+from django.utils import timezone
 
 
 class ChahubMixinTests(TestCase):
@@ -36,22 +39,94 @@ class ChahubMixinTests(TestCase):
     def tearDown(self):
         settings.PYTEST_FORCE_CHAHUB = False
 
-    def test_submission_mixin_save_doesnt_resend_same_data(self):
+    def _mock_chahub_response(self, send_to_chahub_mock, status=201):
+        send_to_chahub_mock.return_value = HttpResponseBase(status=status)
+        send_to_chahub_mock.return_value.content = ""
+
+    def test_submission_mixin_save_queues_data_in_outbox(self):
         submission = CompetitionSubmission(phase=self.phase, participant=self.participant)
         with mock.patch('apps.chahub.models.send_to_chahub') as send_to_chahub_mock:
-            send_to_chahub_mock.return_value = HttpResponseBase(status=201)
-            send_to_chahub_mock.return_value.content = ""
             submission.save()
-            # attempts to send to Chahub once
+            # Saving never talks to Chahub directly
+            assert not send_to_chahub_mock.called
+
+        entries = ChaHubOutboxEntry.objects.filter(endpoint="submissions/")
+        assert entries.count() == 1
+        assert json.loads(entries[0].data)['remote_id'] == submission.pk
+
+    def test_submission_mixin_save_doesnt_queue_same_data(self):
+        submission = CompetitionSubmission(phase=self.phase, participant=self.participant)
+        submission.save()
+        submission.save()
+
+        assert ChaHubOutboxEntry.objects.filter(endpoint="submissions/").count() == 1
+
+    def test_outbox_sends_one_request_per_endpoint(self):
+        for _ in range(3):
+            CompetitionSubmission(phase=self.phase, participant=self.participant).save()
+
+        with mock.patch('apps.chahub.models.send_to_chahub') as send_to_chahub_mock:
+            self._mock_chahub_response(send_to_chahub_mock)
+            send_chahub_outbox()
+
+        endpoints = [call[0][0] for call in send_to_chahub_mock.call_args_list]
+        assert sorted(endpoints) == sorted(set(endpoints))
+        submissions_data = [
+            json.loads(call[0][1].decode('utf-8'))
+            for call in send_to_chahub_mock.call_args_list if call[0][0] == "submissions/"
+        ][0]
+        assert len(submissions_data) == 3
+        assert not ChaHubOutboxEntry.objects.filter(sent_at__isnull=True).exists()
+        assert CompetitionSubmission.objects.filter(chahub_timestamp__isnull=True).count() == 0
+
+    def test_outbox_only_sends_the_latest_data_of_an_object(self):
+        self.competition.title = "Renamed Competition"
+        self.competition.save()
+
+        with mock.patch('apps.chahub.models.send_to_chahub') as send_to_chahub_mock:
+            self._mock_chahub_response(send_to_chahub_mock)
+            send_chahub_outbox()
+
+        competitions_data = [
+            json.loads(call[0][1].decode('utf-8'))
+            for call in send_to_chahub_mock.call_args_list if call[0][0] == "competitions/"
+        ][0]
+        assert len(competitions_data) == 1
+        assert competitions_data[0]['title'] == "Renamed Competition"
+
+    def test_outbox_backs_off_after_failures(self):
+        submission = CompetitionSubmission(phase=self.phase, participant=self.participant)
+        submission.save()
+
+        with mock.patch('apps.chahub.models.send_to_chahub') as send_to_chahub_mock:
+            self._mock_chahub_response(send_to_chahub_mock, status=500)
+            send_chahub_outbox()
             assert send_to_chahub_mock.called
 
             # reset
-            send_to_chahub_mock.called = False
+            send_to_chahub_mock.reset_mock()
 
-            # does not call again
-            submission.save()
+            # Entries are not retried before their backoff is over
+            send_chahub_outbox()
             assert not send_to_chahub_mock.called
 
+        entry = ChaHubOutboxEntry.objects.get(endpoint="submissions/")
+        assert entry.attempts == 1
+        assert entry.sent_at is None
+        assert entry.next_attempt_at > timezone.now()
+
+    def test_outbox_gives_up_and_marks_object_for_retry(self):
+        submission = CompetitionSubmission(phase=self.phase, participant=self.participant)
+        submission.save()
+        ChaHubOutboxEntry.objects.filter(endpoint="submissions/").update(attempts=len(CHAHUB_OUTBOX_BACKOFF))
+
+        with mock.patch('apps.chahub.models.send_to_chahub') as send_to_chahub_mock:
+            self._mock_chahub_response(send_to_chahub_mock, status=500)
+            send_chahub_outbox()
+
+        assert not ChaHubOutboxEntry.objects.filter(endpoint="submissions/").exists()
+        assert CompetitionSubmission.objects.get(pk=submission.pk).chahub_needs_retry
+
     # We should probably have a test for an _invalid_ model, but for now all the models we have we send all the time
     # def test_submission_invalid_not_sent_to_chahub(self):
     #     # Make submission invalid
@@ -70,34 +145,24 @@ class ChahubMixinTests(TestCase):
 
         # Mark submission for retry
         submission = CompetitionSubmission(phase=self.phase, participant=self.participant, chahub_needs_retry=True)
-        with mock.patch('apps.chahub.models.send_to_chahub') as send_to_chahub_mock:
-            submission.save()
-            assert not send_to_chahub_mock.called
+        submission.save()
+        assert not ChaHubOutboxEntry.objects.filter(endpoint="submissions/").exists()
 
     def test_submission_valid_not_retried_again(self):
         # Mark submission for retry
         submission = CompetitionSubmission(phase=self.phase, participant=self.participant, chahub_needs_retry=True)
-        with mock.patch('apps.chahub.models.send_to_chahub') as send_to_chahub_mock:
-            send_to_chahub_mock.return_value = HttpResponseBase(status=201)
-            send_to_chahub_mock.return_value.content = ""
-            submission.save()  # NOTE! not called with force_to_chahub=True as retrying would set
-            # It does not call send method, only during "do_retries" task should it
-            assert not send_to_chahub_mock.called
+        submission.save()  # NOTE! not called with force_to_chahub=True as retrying would set
+        # It is not queued, only during "do_retries" task should it
+        assert not ChaHubOutboxEntry.objects.filter(endpoint="submissions/").exists()
 
-    def test_submission_retry_valid_retried_then_sent_and_not_retried_again(self):
+    def test_submission_retry_valid_retried_then_queued_and_not_retried_again(self):
         # Mark submission for retry
         submission = CompetitionSubmission(phase=self.phase, participant=self.participant, chahub_needs_retry=True)
-        with mock.patch('apps.chahub.models.send_to_chahub') as send_to_chahub_mock:
-            send_to_chahub_mock.return_value = HttpResponseBase(status=201)
-            send_to_chahub_mock.return_value.content = ""
-            submission.save(force_to_chahub=True)
-            # It does not need retry any more, and was successful
-            assert send_to_chahub_mock.called
-            assert not CompetitionSubmission.objects.get(pk=submission.pk).chahub_needs_retry
-
-            # reset
-            send_to_chahub_mock.called = False
+        submission.save(force_to_chahub=True)
+        # It does not need retry any more, and was queued
+        assert ChaHubOutboxEntry.objects.filter(endpoint="submissions/").count() == 1
+        assert not CompetitionSubmission.objects.get(pk=submission.pk).chahub_needs_retry
 
-            # Try sending again
-            submission.save(force_to_chahub=True)
-            assert not send_to_chahub_mock.called
+        # Try queueing again
+        submission.save(force_to_chahub=True)
+        assert ChaHubOutboxEntry.objects.filter(endpoint="submissions/").count() == 1
@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _clear_cached_statuses():
+    # Test transactions are rolled back without any signal, so status rows cached by a test may not exist anymore
+    from apps.web.managers import clear_cached_statuses
+    clear_cached_statuses()
+
+
+@pytest.fixture(autouse=True)
+def _clear_cached_user_teams():
+    # Same for the teams cached by get_user_team, whose ids may be reused by the next test
+    from django.core.cache import cache
+    from apps.teams.models import _request_teams
+    _request_teams.teams = None
+    cache.clear()
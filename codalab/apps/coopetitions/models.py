@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import F
 
 
 class Like(models.Model):
@@ -49,6 +50,11 @@ class DownloadRecord(models.Model):
         return "%s downloaded %s" % (self.user, self.submission)
 
     def save(self, **kwargs):
+        created = self._state.adding
         super(DownloadRecord, self).save(**kwargs)
-        self.submission.download_count = self.submission.downloads.all().count()
-        self.submission.save()
+        if created:
+            # Only the counter changes, a full submission save would re-run its quota checks and ChaHub sync on
+            # every download. The unique (submission, user) pair makes `get_or_create` insert a record once.
+            type(self.submission).objects.filter(pk=self.submission_id).update(
+                download_count=F('download_count') + 1
+            )
@@ -1,5 +1,7 @@
 import datetime
 
+import mock
+
 from django.core.urlresolvers import reverse
 from django.test import TestCase
 from django.contrib.auth import get_user_model
@@ -7,7 +9,7 @@ from django.contrib.auth import get_user_model
 from apps.customizer.models import Configuration
 from apps.web.models import Competition, CompetitionSubmission, ParticipantStatus, CompetitionParticipant, \
     CompetitionPhase
-from apps.coopetitions.models import Like, Dislike
+from apps.coopetitions.models import DownloadRecord, Like, Dislike
 
 
 User = get_user_model()
@@ -70,3 +72,12 @@ class DownloadRecordTests(TestCase):
         self.client.get(self.download_url)
         updated_submission = CompetitionSubmission.objects.get(pk=self.submission.pk)
         self.assertEqual(updated_submission.download_count, 1)
+
+    def test_download_record_only_updates_the_counter(self):
+        with mock.patch.object(CompetitionSubmission, 'save') as save:
+            DownloadRecord.objects.get_or_create(user=self.other_user, submission=self.submission)
+            DownloadRecord.objects.get_or_create(user=self.other_user, submission=self.submission)
+            DownloadRecord.objects.get_or_create(user=self.user, submission=self.submission)
+
+        assert not save.called
+        assert CompetitionSubmission.objects.get(pk=self.submission.pk).download_count == 2
@@ -1,6 +1,25 @@
-from django.db import models
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from lxml.html.clean import clean_html
 
+# The singleton configuration is read on every request, so each process keeps its own copy for at most
+# CONFIGURATION_CACHE_TTL seconds. Saving or deleting a configuration bumps CONFIGURATION_VERSION_CACHE_KEY
+# in the shared cache, which makes every other process drop its copy on the next read.
+CONFIGURATION_CACHE_TTL = 60
+CONFIGURATION_VERSION_CACHE_KEY = 'customizer_configuration_version'
+
+_lock = threading.Lock()
+_cached_configuration = {
+    'configuration': None,
+    'version': None,
+    'expires_at': 0,
+}
+
 
 class Configuration(models.Model):
     header_logo = models.ImageField(upload_to='main_logo', null=True, blank=True)
@@ -16,3 +35,41 @@ class Configuration(models.Model):
         if self.front_page_message:
             self.front_page_message = clean_html(self.front_page_message)
         super(Configuration, self).save(*args, **kwargs)
+
+    @classmethod
+    def get_cached(cls):
+        """
+        Returns the site configuration, creating it if it does not exist yet.
+
+        The object comes from a process-local cache and must be treated as read only, use
+        `Configuration.objects.get_or_create(pk=1)` to get an object to edit.
+        """
+        version = cache.get(CONFIGURATION_VERSION_CACHE_KEY)
+        configuration = _cached_configuration['configuration']
+        if configuration is None or version != _cached_configuration['version'] or \
+                time.time() > _cached_configuration['expires_at']:
+            configuration = cls.objects.order_by('pk').first()
+            if configuration is None:
+                configuration, _ = cls.objects.get_or_create(pk=1)
+            with _lock:
+                _cached_configuration['configuration'] = configuration
+                _cached_configuration['version'] = version
+                _cached_configuration['expires_at'] = time.time() + CONFIGURATION_CACHE_TTL
+        return configuration
+
+
+def invalidate_cached_configuration():
+    """
+    Drops this process' cached configuration and, once the current transaction commits, tells the other
+    processes to drop theirs. Bumping the version earlier would let them cache the old configuration again
+    under the new version.
+    """
+    with _lock:
+        _cached_configuration['configuration'] = None
+    transaction.on_commit(lambda: cache.set(CONFIGURATION_VERSION_CACHE_KEY, time.time(), None))
+
+
+@receiver(post_save, sender=Configuration)
+@receiver(post_delete, sender=Configuration)
+def configuration_changed_handler(sender, **kwargs):
+    invalidate_cached_configuration()
@@ -0,0 +1,43 @@
+import mock
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from apps.customizer.models import CONFIGURATION_VERSION_CACHE_KEY, Configuration, invalidate_cached_configuration
+
+
+class ConfigurationCacheTests(TestCase):
+    def setUp(self):
+        invalidate_cached_configuration()
+
+    def test_get_cached_creates_configuration_if_missing(self):
+        config = Configuration.get_cached()
+        assert config.pk == 1
+        assert Configuration.objects.count() == 1
+
+    def test_repeated_reads_do_not_query_the_database(self):
+        Configuration.objects.create(disable_all_submissions=False)
+        Configuration.get_cached()
+        with self.assertNumQueries(0):
+            Configuration.get_cached()
+
+    def test_saving_configuration_invalidates_cache(self):
+        config = Configuration.objects.create(disable_all_submissions=False)
+        assert not Configuration.get_cached().disable_all_submissions
+        config.disable_all_submissions = True
+        config.save()
+        assert Configuration.get_cached().disable_all_submissions
+
+    @override_settings(
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'customizer-tests'}},
+    )
+    def test_other_processes_are_told_once_the_transaction_commits(self):
+        config = Configuration.objects.create(disable_all_submissions=False)
+        version = cache.get(CONFIGURATION_VERSION_CACHE_KEY)
+
+        with mock.patch('apps.customizer.models.transaction.on_commit') as on_commit:
+            config.save()
+        assert cache.get(CONFIGURATION_VERSION_CACHE_KEY) == version
+
+        on_commit.call_args[0][0]()
+        assert cache.get(CONFIGURATION_VERSION_CACHE_KEY) != version
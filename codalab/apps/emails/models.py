@@ -0,0 +1,222 @@
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import models, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Sent emails marked as sent per query
+EMAIL_OUTBOX_BATCH_SIZE = 50
+# Recipients per message for mass emails, which are sent as BCC
+EMAIL_OUTBOX_MAX_BCC = 50
+# How long a worker may take to send the messages it claimed before another worker picks them up
+EMAIL_OUTBOX_LEASE = timedelta(minutes=10)
+# Delay before each retry of a message that failed to send, after that the message is marked failed
+EMAIL_OUTBOX_BACKOFF = [
+    timedelta(minutes=1),
+    timedelta(minutes=10),
+    timedelta(hours=1),
+]
+
+
+class QueuedEmail(models.Model):
+    """A rendered email waiting to be sent by `apps.emails.tasks.send_queued_emails_task`."""
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(null=True, blank=True)
+    from_email = models.CharField(max_length=255)
+    # JSON encoded lists of addresses
+    to = models.TextField(default='[]')
+    bcc = models.TextField(default='[]')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        index_together = (('status', 'next_attempt_at'),)
+
+    def __str__(self):
+        return "[{}] {}".format(self.status, self.subject)
+
+    def get_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            self.subject,
+            self.body,
+            self.from_email,
+            to=json.loads(self.to),
+            bcc=json.loads(self.bcc),
+            connection=connection,
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
+
+
+def queue_email(subject, body, to=None, html_body=None, from_email=None, bcc=None):
+    """
+    Queues an email for the email worker, use it instead of sending mail from requests and tasks.
+
+    :param subject: Email's subject.
+    :param body: Email's text content.
+    :param to: List of recipients.
+    :param html_body: Email's html content.
+    :param from_email: Sender's email, defaults to `DEFAULT_FROM_EMAIL`.
+    :param bcc: List of hidden recipients.
+    :return: The QueuedEmail.
+    """
+    return QueuedEmail.objects.create(
+        subject=subject[:255],
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=json.dumps(list(to or [])),
+        bcc=json.dumps(list(bcc or [])),
+    )
+
+
+def queue_mass_email(subject, body, recipients, html_body=None, from_email=None):
+    """
+    Queues an email to many recipients as BCC, splitting them over messages of `EMAIL_OUTBOX_MAX_BCC` recipients.
+
+    :return: List of QueuedEmail.
+    """
+    recipients = list(recipients)
+    return QueuedEmail.objects.bulk_create([
+        QueuedEmail(
+            subject=subject[:255],
+            body=body,
+            html_body=html_body,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            bcc=json.dumps(recipients[index:index + EMAIL_OUTBOX_MAX_BCC]),
+        )
+        for index in range(0, len(recipients), EMAIL_OUTBOX_MAX_BCC)
+    ])
+
+
+def claim_queued_emails(limit):
+    """
+    Takes the oldest emails due for sending and leases them to this worker for `EMAIL_OUTBOX_LEASE`.
+
+    A message left in the sending state by a worker that died is picked up again once its lease ran out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(QueuedEmail.objects.select_for_update(skip_locked=True).filter(
+            status__in=[QueuedEmail.PENDING, QueuedEmail.SENDING],
+            next_attempt_at__lte=now,
+        ).order_by('pk')[:limit])
+        QueuedEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+            status=QueuedEmail.SENDING,
+            next_attempt_at=now + EMAIL_OUTBOX_LEASE,
+        )
+    return emails
+
+
+def _mark_email_failed(email, error):
+    attempts = email.attempts + 1
+    fields = {'attempts': attempts, 'last_error': error}
+    if attempts > len(EMAIL_OUTBOX_BACKOFF):
+        fields['status'] = QueuedEmail.FAILED
+    else:
+        fields['status'] = QueuedEmail.PENDING
+        fields['next_attempt_at'] = timezone.now() + EMAIL_OUTBOX_BACKOFF[attempts - 1]
+    QueuedEmail.objects.filter(pk=email.pk).update(**fields)
+
+
+def _mark_emails_sent(emails):
+    QueuedEmail.objects.filter(pk__in=[email.pk for email in emails]).update(
+        status=QueuedEmail.SENT,
+        sent_at=timezone.now(),
+    )
+
+
+def _close_connection(connection):
+    try:
+        connection.close()
+    except Exception:
+        logger.exception("Failed to close the email connection")
+
+
+def send_queued_emails(limit=None):
+    """
+    Sends due emails over a single SMTP connection, at most `EMAIL_OUTBOX_MAX_PER_MINUTE` messages per minute.
+
+    Messages are sent one at a time, so a failure never leaves it unknown which of them were delivered. A message
+    that fails is retried later, see `_mark_email_failed`, and so are the ones not sent yet when the SMTP server
+    can't be reached. Sent emails are marked `EMAIL_OUTBOX_BATCH_SIZE` at a time, and always before returning.
+
+    :param limit: Maximum amount of emails to send, defaults to `EMAIL_OUTBOX_MAX_PER_MINUTE`.
+    :return: Amount of emails sent.
+    """
+    max_per_minute = settings.EMAIL_OUTBOX_MAX_PER_MINUTE
+    emails = claim_queued_emails(limit or max_per_minute)
+    if not emails:
+        return 0
+
+    sent_count = 0
+    sent_emails = []
+    started_at = time.time()
+    connection = get_connection()
+    try:
+        try:
+            connection.open()
+        except Exception as e:
+            logger.exception("Failed to open the email connection, retrying the queued emails later")
+            for email in emails:
+                _mark_email_failed(email, str(e))
+            return 0
+
+        for index, email in enumerate(emails):
+            # Spread the messages over the minute instead of sending them all at once
+            expected_elapsed = 60.0 * index / max_per_minute
+            elapsed = time.time() - started_at
+            if expected_elapsed > elapsed:
+                time.sleep(expected_elapsed - elapsed)
+
+            try:
+                connection.send_messages([email.get_message(connection)])
+            except Exception as e:
+                logger.exception("Failed to send queued email (pk=%s)", email.pk)
+                _mark_email_failed(email, str(e))
+                # The connection may have been lost with the message
+                try:
+                    _close_connection(connection)
+                    connection.open()
+                except Exception as reopen_error:
+                    logger.exception("Failed to reopen the email connection, retrying the queued emails later")
+                    for unsent_email in emails[index + 1:]:
+                        _mark_email_failed(unsent_email, str(reopen_error))
+                    break
+                continue
+
+            sent_emails.append(email)
+            sent_count += 1
+            if len(sent_emails) >= EMAIL_OUTBOX_BATCH_SIZE:
+                _mark_emails_sent(sent_emails)
+                sent_emails = []
+    finally:
+        # Whatever happens, the delivered messages must not be sent again
+        _mark_emails_sent(sent_emails)
+        _close_connection(connection)
+
+    logger.info("Sent {} queued emails".format(sent_count))
+    return sent_count
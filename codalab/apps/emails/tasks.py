@@ -0,0 +1,12 @@
+import logging
+
+from celery import task
+
+from apps.emails.models import send_queued_emails
+
+logger = logging.getLogger(__name__)
+
+
+@task(queue='site-worker', soft_time_limit=60 * 5)
+def send_queued_emails_task():
+    send_queued_emails()
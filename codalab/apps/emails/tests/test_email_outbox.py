@@ -0,0 +1,123 @@
+import mock
+
+from django.core import mail
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from apps.emails.models import QueuedEmail, queue_email, queue_mass_email, send_queued_emails, EMAIL_OUTBOX_BACKOFF
+
+
+class EmailOutboxTests(TestCase):
+
+    def test_queue_email_does_not_send(self):
+        queue_email("Subject", "Body", ["user@test.com"], html_body="<p>Body</p>")
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(QueuedEmail.objects.get().status, QueuedEmail.PENDING)
+
+    def test_send_queued_emails_sends_and_marks_sent(self):
+        queue_email("Subject", "Body", ["user@test.com"], html_body="<p>Body</p>")
+        queue_email("Other subject", "Other body", ["other@test.com"])
+
+        self.assertEqual(send_queued_emails(), 2)
+
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ["user@test.com"])
+        self.assertEqual(mail.outbox[0].alternatives, [("<p>Body</p>", 'text/html')])
+        self.assertFalse(QueuedEmail.objects.exclude(status=QueuedEmail.SENT).exists())
+
+        # Nothing is sent twice
+        self.assertEqual(send_queued_emails(), 0)
+
+    def test_send_queued_emails_uses_one_connection(self):
+        for count in range(3):
+            queue_email("Subject", "Body", ["user%s@test.com" % count])
+
+        with mock.patch('apps.emails.models.get_connection', wraps=mail.get_connection) as get_connection_mock:
+            send_queued_emails()
+
+        self.assertEqual(get_connection_mock.call_count, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    @override_settings(EMAIL_OUTBOX_MAX_PER_MINUTE=2)
+    def test_send_queued_emails_is_rate_limited(self):
+        for count in range(3):
+            queue_email("Subject", "Body", ["user%s@test.com" % count])
+
+        self.assertEqual(send_queued_emails(), 2)
+        self.assertEqual(QueuedEmail.objects.filter(status=QueuedEmail.PENDING).count(), 1)
+
+    def test_mass_email_is_split_in_bcc_messages(self):
+        queue_mass_email("Subject", "Body", ["user%s@test.com" % count for count in range(120)])
+        send_queued_emails()
+
+        self.assertEqual([len(m.bcc) for m in mail.outbox], [50, 50, 20])
+        self.assertEqual([len(m.to) for m in mail.outbox], [0, 0, 0])
+
+    def test_failed_email_is_retried_then_marked_failed(self):
+        email = queue_email("Subject", "Body", ["user@test.com"])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages') as send_messages_mock:
+            send_messages_mock.side_effect = Exception("SMTP is down")
+            send_queued_emails()
+
+            email.refresh_from_db()
+            self.assertEqual(email.status, QueuedEmail.PENDING)
+            self.assertEqual(email.attempts, 1)
+            self.assertEqual(email.last_error, "SMTP is down")
+
+            QueuedEmail.objects.filter(pk=email.pk).update(attempts=len(EMAIL_OUTBOX_BACKOFF))
+            QueuedEmail.objects.filter(pk=email.pk).update(next_attempt_at=email.created_at)
+            send_queued_emails()
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, QueuedEmail.FAILED)
+
+    def test_delivered_emails_are_not_sent_again_after_a_failure(self):
+        for count in range(3):
+            queue_email("Subject", "Body", ["user%s@test.com" % count])
+        send_messages = mail.get_connection().send_messages.__func__
+
+        def fail_for_user1(backend, messages):
+            if messages[0].to == ["user1@test.com"]:
+                raise Exception("Rejected")
+            return send_messages(backend, messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', autospec=True,
+                        side_effect=fail_for_user1):
+            self.assertEqual(send_queued_emails(), 2)
+
+        self.assertEqual([m.to for m in mail.outbox], [["user0@test.com"], ["user2@test.com"]])
+        self.assertEqual(QueuedEmail.objects.filter(status=QueuedEmail.SENT).count(), 2)
+        self.assertEqual(QueuedEmail.objects.get(to='["user1@test.com"]').attempts, 1)
+
+    def test_emails_are_retried_when_the_connection_cannot_be_opened(self):
+        email = queue_email("Subject", "Body", ["user@test.com"])
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.open', side_effect=Exception("SMTP is down")):
+            self.assertEqual(send_queued_emails(), 0)
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, QueuedEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_sent_emails_are_marked_when_the_connection_cannot_be_reopened(self):
+        for count in range(3):
+            queue_email("Subject", "Body", ["user%s@test.com" % count])
+        send_messages = mail.get_connection().send_messages.__func__
+
+        def fail_after_first(backend, messages):
+            if mail.outbox:
+                raise Exception("Connection lost")
+            return send_messages(backend, messages)
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', autospec=True,
+                        side_effect=fail_after_first), \
+                mock.patch('django.core.mail.backends.locmem.EmailBackend.open',
+                           side_effect=[None, Exception("SMTP is down")]):
+            self.assertEqual(send_queued_emails(), 1)
+
+        self.assertEqual(QueuedEmail.objects.filter(status=QueuedEmail.SENT).count(), 1)
+        self.assertEqual(list(QueuedEmail.objects.filter(status=QueuedEmail.PENDING).values_list('attempts', flat=True)),
+                         [1, 1])
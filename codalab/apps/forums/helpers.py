@@ -1,12 +1,12 @@
-from django.conf import settings
 from django.contrib.sites.models import Site
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 
+from apps.emails.models import queue_email
+
 
 def send_mail(context=None, from_email=None, html_file=None, text_file=None, subject=None, to_email=None):
     """
-    Function to send emails to a particular user.
+    Function to send emails to a particular user. The email is rendered here and sent by the email worker.
 
     :param context: Site info.
     :param from_email: Sender's email.
@@ -15,13 +15,9 @@ def send_mail(context=None, from_email=None, html_file=None, text_file=None, sub
     :param subject: Email's subject.
     :param to_email: Recipient's email.
     """
-    from_email = from_email if from_email else settings.DEFAULT_FROM_EMAIL
-
     context["site"] = Site.objects.get_current()
 
     text = render_to_string(text_file, context)
     html = render_to_string(html_file, context)
 
-    message = EmailMultiAlternatives(subject, text, from_email, [to_email])
-    message.attach_alternative(html, 'text/html')
-    message.send(fail_silently=False)
+    queue_email(subject, text, [to_email], html_body=html, from_email=from_email)
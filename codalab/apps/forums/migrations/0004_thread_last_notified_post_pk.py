@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('forums', '0003_auto_20210513_1705'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='last_notified_post_pk',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
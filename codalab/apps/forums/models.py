@@ -1,8 +1,14 @@
 import datetime
 
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sites.models import Site
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
 from django.db import models
+from django.template.loader import render_to_string
 
+from apps.emails.models import queue_mass_email
 from .helpers import send_mail
 
 
@@ -33,6 +39,8 @@ class Thread(models.Model):
     title = models.CharField(max_length=255)
     last_post_date = models.DateTimeField(null=True, blank=True)
     pinned_date = models.DateTimeField(null=True, blank=True)
+    # Newest post emailed by send_new_posts_notification, the next notification starts after it
+    last_notified_post_pk = models.PositiveIntegerField(null=True, blank=True)
 
     class Meta:
         ordering = ('-last_post_date',)
@@ -57,20 +65,87 @@ class Thread(models.Model):
     def notify_all_posters_of_new_post(self, post):
         """
         Notify users when a new post is created on the thread.
+
+        The first post after a quiet period is sent right away, the next ones are gathered in one digest sent
+        `FORUM_NOTIFICATION_DIGEST_INTERVAL` seconds later, so a busy thread sends at most two emails per
+        interval to each user. Both are sent by the site worker.
+        """
+        from .tasks import notify_new_posts_task
+
+        interval = settings.FORUM_NOTIFICATION_DIGEST_INTERVAL
+        if cache.add('forum_thread_throttle:{}'.format(self.pk), True, interval):
+            notify_new_posts_task.delay(self.pk, post.pk)
+        elif cache.add('forum_thread_digest:{}'.format(self.pk), True, interval):
+            notify_new_posts_task.apply_async((self.pk, post.pk), countdown=interval)
+
+    def get_notification_recipients(self):
         """
-        users_in_thread = set(post.posted_by for post in self.posts.all())
+        :return: Queryset of the users to notify of new posts: everybody who posted in the thread, the user who
+            started it and the competition admins, when they allow forum notifications.
+        """
+        competition = self.forum.competition
+        user_ids = set(self.posts.order_by().values_list('posted_by', flat=True).distinct())
+        user_ids.add(self.started_by_id)
+        user_ids.update(competition.admins.values_list('pk', flat=True))
+        return get_user_model().objects.filter(pk__in=user_ids, allow_forum_notifications=True)
+
+    def send_new_posts_notification(self, from_post_pk):
+        """
+        Queues one email with the posts of this thread which were not notified yet, those after the last notified
+        post, or from `from_post_pk` on when none was. It is rendered once and sent to every recipient as BCC,
+        except to the author when all the posts are theirs.
 
-        for user in users_in_thread:
-            if user != post.posted_by:
-                self.notify_user(user, post=post)
+        :return: Number of recipients.
+        """
+        last_notified_post_pk = Thread.objects.filter(pk=self.pk).values_list(
+            'last_notified_post_pk', flat=True).get()
+        if last_notified_post_pk is None:
+            after_pk = from_post_pk - 1
+        else:
+            after_pk = last_notified_post_pk
+        new_posts = list(self.posts.filter(pk__gt=after_pk).select_related('posted_by').order_by('pk'))
+        if not new_posts:
+            return 0
+        # Only the task which moves the marker sends these posts, a concurrent one finds it moved and stops
+        if not Thread.objects.filter(pk=self.pk, last_notified_post_pk=last_notified_post_pk).update(
+                last_notified_post_pk=new_posts[-1].pk):
+            return 0
+        self.last_notified_post_pk = new_posts[-1].pk
+
+        recipients = self.get_notification_recipients()
+        authors = set(post.posted_by_id for post in new_posts)
+        if len(authors) == 1:
+            recipients = recipients.exclude(pk__in=authors)
+        emails = [email for email in recipients.order_by('pk').values_list('email', flat=True) if email]
+        if not emails:
+            return 0
+
+        context = {
+            'thread': self,
+            'new_posts': new_posts,
+            'site': Site.objects.get_current(),
+        }
+        if len(new_posts) == 1:
+            subject = 'New post in %s' % self.title
+        else:
+            subject = '%s new posts in %s' % (len(new_posts), self.title)
+        queue_mass_email(
+            subject,
+            render_to_string("forums/emails/new_post.txt", context),
+            emails,
+            html_body=render_to_string("forums/emails/new_post.html", context),
+        )
+        return len(emails)
 
     def notify_user(self, user, post=None):
         if user.allow_forum_notifications:
+            if post is None:
+                post = self.posts.last()
             send_mail(
                 context={
                     'thread': self,
                     'user': user,
-                    'new_post': self.posts.last() if post is None else post
+                    'new_posts': [post] if post else [],
                 },
                 subject='New post in %s' % self.title,
                 html_file="forums/emails/new_post.html",
@@ -0,0 +1,19 @@
+import logging
+
+from celery import task
+
+from apps.forums.models import Thread
+
+logger = logging.getLogger(__name__)
+
+
+@task(queue='site-worker', soft_time_limit=60 * 5)
+def notify_new_posts_task(thread_pk, from_post_pk):
+    """Queues the notification of the new posts of a thread, see `Thread.notify_all_posters_of_new_post`."""
+    try:
+        thread = Thread.objects.select_related('forum__competition').get(pk=thread_pk)
+    except Thread.DoesNotExist:
+        # Deleted in the meantime
+        return
+    recipients = thread.send_new_posts_notification(from_post_pk)
+    logger.info("Notified %s users of the new posts in thread %s", recipients, thread_pk)
@@ -1,7 +1,12 @@
+import mock
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
 
+from apps.forums.models import Post, Thread
+from apps.forums.views import ForumDetailView, ThreadDetailView
 from apps.web.models import Competition
 
 
@@ -31,3 +36,64 @@ class ForumTests(TestCase):
         self.assertEqual(resp.status_code, 200)
         updated_competition = Competition.objects.get(pk=self.competition.pk)
         self.assertTrue(updated_competition.forum)
+
+
+class ForumListingTests(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.poster = User.objects.create_user(username="poster", password="pass")
+        self.competition = Competition.objects.create(
+            title="Test Competition",
+            creator=self.organizer,
+            modified_by=self.organizer,
+            published=True,
+        )
+        self.forum = self.competition.forum
+
+    def create_thread(self, title, posts):
+        thread = Thread.objects.create(forum=self.forum, started_by=self.organizer, title=title)
+        for number in range(posts):
+            Post.objects.create(
+                thread=thread,
+                posted_by=self.poster if number % 2 else self.organizer,
+                content='Post {}'.format(number),
+            )
+        return thread
+
+    def get_forum(self, **params):
+        return self.client.get(reverse("forum_detail", kwargs={'forum_pk': self.forum.pk}), params)
+
+    def test_threads_are_annotated_with_their_posts(self):
+        self.create_thread('Busy', posts=4)
+
+        thread = self.get_forum().context['thread_list_sorted'][0]
+
+        assert thread.post_count == 4
+        assert thread.latest_post_date == thread.posts.latest('date_created').date_created
+        assert thread.last_poster == 'poster'
+
+    def test_forum_queries_do_not_grow_with_threads_and_posts(self):
+        self.create_thread('First', posts=2)
+        with CaptureQueriesContext(connection) as queries:
+            self.get_forum()
+
+        for number in range(5):
+            self.create_thread('Thread {}'.format(number), posts=3)
+        with self.assertNumQueries(len(queries)):
+            resp = self.get_forum()
+        assert len(resp.context['thread_list_sorted']) == 6
+
+    def test_threads_and_posts_are_paginated(self):
+        thread = self.create_thread('Long', posts=3)
+        self.create_thread('Short', posts=1)
+
+        with mock.patch.object(ForumDetailView, 'threads_per_page', 1):
+            assert len(self.get_forum().context['thread_list_sorted']) == 1
+            assert len(self.get_forum(page=2).context['thread_list_sorted']) == 1
+            assert self.get_forum(page=3).status_code == 404
+
+        url = reverse("forum_thread_detail", kwargs={'forum_pk': self.forum.pk, 'thread_pk': thread.pk})
+        with mock.patch.object(ThreadDetailView, 'posts_per_page', 2):
+            posts = self.client.get(url, {'page': 2}).context['ordered_posts']
+        assert [post.content for post in posts] == ['Post 2']
@@ -0,0 +1,107 @@
+import json
+
+import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from apps.emails.models import QueuedEmail
+from apps.forums.models import Post, Thread
+from apps.web.models import Competition
+
+User = get_user_model()
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'forum-tests'}},
+    FORUM_NOTIFICATION_DIGEST_INTERVAL=60,
+)
+class ForumNotificationTests(TestCase):
+
+    def setUp(self):
+        self.organizer = User.objects.create_user(username="organizer", email="organizer@example.com",
+                                                  organizer_direct_message_updates=False)
+        self.admin = User.objects.create_user(username="admin", email="admin@example.com")
+        self.starter = User.objects.create_user(username="starter", email="starter@example.com")
+        self.posters = [
+            User.objects.create_user(username="poster_{}".format(number), email="poster_{}@example.com".format(number))
+            for number in range(3)
+        ]
+        self.quiet = User.objects.create_user(username="quiet", email="quiet@example.com",
+                                              allow_forum_notifications=False)
+        self.competition = Competition.objects.create(
+            title="Test Competition",
+            creator=self.organizer,
+            modified_by=self.organizer,
+        )
+        self.competition.admins.add(self.admin)
+        self.thread = Thread.objects.create(forum=self.competition.forum, started_by=self.starter, title="Thread")
+        for user in self.posters + self.posters + [self.quiet]:
+            self.post(user)
+        cache.delete_many(['forum_thread_{}:{}'.format(key, self.thread.pk) for key in ('throttle', 'digest')])
+
+    def post(self, user):
+        return Post.objects.create(thread=self.thread, posted_by=user, content='By {}'.format(user.username))
+
+    def test_recipients_are_posters_starter_and_admins(self):
+        thread = Thread.objects.select_related('forum__competition').get(pk=self.thread.pk)
+        # The posters, the admins and the users
+        with self.assertNumQueries(3):
+            recipients = set(thread.get_notification_recipients())
+
+        assert recipients == set(self.posters + [self.starter, self.admin])
+
+    def test_new_post_is_rendered_once_for_everybody_but_its_author(self):
+        post = self.post(self.posters[0])
+
+        assert self.thread.send_new_posts_notification(post.pk) == 4
+
+        email = QueuedEmail.objects.get()
+        assert email.subject == 'New post in Thread'
+        assert 'By poster_0' in email.body
+        assert sorted(json.loads(email.bcc)) == [
+            'admin@example.com', 'poster_1@example.com', 'poster_2@example.com', 'starter@example.com',
+        ]
+        # Already notified, even by another instance of the thread
+        assert self.thread.send_new_posts_notification(post.pk) == 0
+        assert Thread.objects.get(pk=self.thread.pk).send_new_posts_notification(post.pk) == 0
+        assert Thread.objects.get(pk=self.thread.pk).last_notified_post_pk == post.pk
+
+    def test_digest_gathers_the_posts_not_notified_yet(self):
+        first = self.post(self.posters[0])
+        self.thread.send_new_posts_notification(first.pk)
+        second = self.post(self.posters[1])
+        self.post(self.posters[2])
+
+        assert self.thread.send_new_posts_notification(second.pk) == 5
+
+        digest = QueuedEmail.objects.order_by('pk').last()
+        assert digest.subject == '2 new posts in Thread'
+        assert 'By poster_0' not in digest.body
+        assert 'By poster_1' in digest.body and 'By poster_2' in digest.body
+
+    def test_posts_before_an_earlier_notification_are_not_dropped(self):
+        first = self.post(self.posters[0])
+        self.thread.send_new_posts_notification(first.pk)
+        # The digest of `second` is still pending when the throttle expires and `fourth` is sent right away
+        second = self.post(self.posters[1])
+        self.post(self.posters[2])
+        fourth = self.post(self.posters[1])
+
+        assert self.thread.send_new_posts_notification(fourth.pk) == 5
+        assert self.thread.send_new_posts_notification(second.pk) == 0
+
+        email = QueuedEmail.objects.order_by('pk').last()
+        assert email.subject == '3 new posts in Thread'
+        assert 'By poster_2' in email.body
+
+    def test_notifications_are_throttled(self):
+        posts = [self.post(self.posters[0]) for _ in range(3)]
+
+        with mock.patch('apps.forums.tasks.notify_new_posts_task') as task:
+            for post in posts:
+                self.thread.notify_all_posters_of_new_post(post)
+
+        task.delay.assert_called_once_with(self.thread.pk, posts[0].pk)
+        task.apply_async.assert_called_once_with((self.thread.pk, posts[1].pk), countdown=60)
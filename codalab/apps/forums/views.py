@@ -3,6 +3,8 @@ import datetime
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db.models import Count, Max, OuterRef, Subquery
 from django.http import HttpResponseRedirect, Http404
 from django.shortcuts import get_object_or_404
 from django.utils.timezone import now
@@ -35,6 +37,22 @@ class ForumBaseMixin(object):
         return context
 
 
+def paginate(request, queryset, per_page):
+    """:return: The page of `queryset` given by the `page` GET parameter, raises Http404 when there is no such page."""
+    try:
+        return Paginator(queryset, per_page).page(request.GET.get('page', 1))
+    except (EmptyPage, PageNotAnInteger):
+        raise Http404()
+
+
+def is_forum_moderator(user, forum):
+    """:return: Whether `user` organizes the competition of `forum`, and may pin or delete anything in it."""
+    competition = forum.competition
+    return user.is_authenticated() and (
+        competition.creator_id == user.pk or competition.admins.filter(pk=user.pk).exists()
+    )
+
+
 class ForumDetailView(DetailView):
     """
     Shows the details of a particular Forum.
@@ -42,12 +60,24 @@ class ForumDetailView(DetailView):
     model = Forum
     template_name = "forums/thread_list.html"
     pk_url_kwarg = 'forum_pk'
+    threads_per_page = 50
+
+    def get_queryset(self):
+        return super(ForumDetailView, self).get_queryset().select_related('competition')
 
     def get_context_data(self, **kwargs):
         context = super(ForumDetailView, self).get_context_data(**kwargs)
-        context['thread_list_sorted'] = self.object.threads.order_by('pinned_date', '-date_created')\
-            .select_related('forum', 'forum__competition', 'forum__competition__creator', 'started_by')\
-            .prefetch_related('forum__competition__admins', 'posts')
+        # The post counts and latest posts are computed by the database, without loading the posts
+        last_posts = Post.objects.filter(thread=OuterRef('pk')).order_by('-date_created', '-pk')
+        threads = self.object.threads.order_by('pinned_date', '-date_created')\
+            .select_related('started_by')\
+            .annotate(
+                post_count=Count('posts'),
+                latest_post_date=Max('posts__date_created'),
+                last_poster=Subquery(last_posts.values('posted_by__username')[:1]),
+            )
+        context['thread_list_sorted'] = paginate(self.request, threads, self.threads_per_page)
+        context['is_forum_moderator'] = is_forum_moderator(self.request.user, self.object)
         return context
 
 
@@ -145,12 +175,14 @@ class ThreadDetailView(ForumBaseMixin, DetailView):
     template_name = "forums/thread_detail.html"
     pk_url_kwarg = 'thread_pk'
 
+    posts_per_page = 50
+
     def get_context_data(self, **kwargs):
         thread = self.object
         context = super(ThreadDetailView, self).get_context_data(**kwargs)
-        context['ordered_posts'] = thread.posts.all().order_by('date_created')\
-            .select_related('thread__forum__competition__creator', 'posted_by')\
-            .prefetch_related('thread__forum__competition__admins')
+        posts = thread.posts.all().order_by('date_created', 'pk').select_related('posted_by')
+        context['ordered_posts'] = paginate(self.request, posts, self.posts_per_page)
+        context['is_forum_moderator'] = is_forum_moderator(self.request.user, self.forum)
         return context
 
 
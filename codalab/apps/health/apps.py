@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class HealthConfig(AppConfig):
+    name = 'apps.health'
+
+    def ready(self):
+        # Connects the celery task metrics handlers
+        from apps.health import signals  # noqa
@@ -0,0 +1,63 @@
+"""
+Cache backends counting hits and misses for `apps.web.middleware.InstrumentationMiddleware`.
+"""
+import threading
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import PyLibMCCache
+
+_lookups = threading.local()
+_MISSING = object()
+
+
+def start_counting_cache_lookups():
+    """Starts counting the cache lookups of the current thread."""
+    _lookups.hits = 0
+    _lookups.misses = 0
+    _lookups.counting = True
+
+
+def stop_counting_cache_lookups():
+    """
+    Stops counting the cache lookups of the current thread.
+
+    :return: Tuple of (hits, misses) since `start_counting_cache_lookups`.
+    """
+    _lookups.counting = False
+    return getattr(_lookups, 'hits', 0), getattr(_lookups, 'misses', 0)
+
+
+def _count_cache_lookups(hits, misses):
+    if getattr(_lookups, 'counting', False):
+        _lookups.hits += hits
+        _lookups.misses += misses
+
+
+class CacheLookupCountingMixin(object):
+    def get(self, key, default=None, version=None):
+        value = super(CacheLookupCountingMixin, self).get(key, _MISSING, version=version)
+        if value is _MISSING:
+            _count_cache_lookups(0, 1)
+            return default
+        _count_cache_lookups(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        # Some backends implement get_many with get(), don't count those lookups twice
+        counting = getattr(_lookups, 'counting', False)
+        _lookups.counting = False
+        try:
+            values = super(CacheLookupCountingMixin, self).get_many(keys, version=version)
+        finally:
+            _lookups.counting = counting
+        _count_cache_lookups(len(values), len(keys) - len(values))
+        return values
+
+
+class InstrumentedPyLibMCCache(CacheLookupCountingMixin, PyLibMCCache):
+    pass
+
+
+class InstrumentedLocMemCache(CacheLookupCountingMixin, LocMemCache):
+    pass
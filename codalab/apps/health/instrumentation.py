@@ -0,0 +1,136 @@
+"""
+Helpers of `apps.web.middleware.InstrumentationMiddleware`: SQL shapes, slow request samples and the process-local
+buffer of request metrics.
+"""
+import io
+import json
+import pstats
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.health.models import RequestSample, add_request_metrics
+
+# Amount of SQL shapes kept on a request sample
+REQUEST_SAMPLE_TOP_QUERIES = 10
+# Amount of functions kept in the cProfile statistics of a request sample
+REQUEST_SAMPLE_PROFILE_LINES = 60
+
+_SQL_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SQL_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+
+def get_sql_shape(sql):
+    """Replaces the literals of `sql` by placeholders, so queries only differing by their parameters match."""
+    shape = _SQL_STRING_RE.sub('?', sql)
+    shape = _SQL_NUMBER_RE.sub('?', shape)
+    return _SQL_LIST_RE.sub('(...)', shape)
+
+
+def get_top_sql_shapes(queries, limit=REQUEST_SAMPLE_TOP_QUERIES):
+    """
+    :param queries: Queries as logged in `connection.queries`.
+    :return: List of {"sql", "count", "time"} dictionaries, the most repeated SQL shapes first.
+    """
+    counts = Counter()
+    times = Counter()
+    for query in queries:
+        shape = get_sql_shape(query['sql'])
+        counts[shape] += 1
+        times[shape] += float(query['time'])
+    return [
+        {'sql': shape, 'count': count, 'time': round(times[shape], 3)}
+        for shape, count in counts.most_common(limit)
+    ]
+
+
+def get_profile_stats(profiler):
+    """:return: The cProfile statistics of `profiler` as text, sorted by cumulative time."""
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.sort_stats('cumulative').print_stats(REQUEST_SAMPLE_PROFILE_LINES)
+    return output.getvalue()
+
+
+def record_request_sample(request, response, view_name, metrics, queries, profiler=None):
+    """
+    Stores a `RequestSample` of a request.
+
+    :param metrics: Dictionary with the 'duration', 'db_time', 'query_count', 'cache_hits' and 'cache_misses'
+        of the request.
+    :param queries: Queries the request ran, as logged in `connection.queries`.
+    :param profiler: The cProfile.Profile of the request, if it was profiled.
+    """
+    user = getattr(request, 'user', None)
+    return RequestSample.objects.create(
+        view_name=view_name,
+        method=request.method,
+        path=request.get_full_path(),
+        user_id=user.pk if user is not None and user.is_authenticated else None,
+        status_code=response.status_code,
+        duration=metrics['duration'],
+        db_time=metrics['db_time'],
+        query_count=metrics['query_count'],
+        cache_hits=metrics['cache_hits'],
+        cache_misses=metrics['cache_misses'],
+        top_queries=json.dumps(get_top_sql_shapes(queries)),
+        profile=get_profile_stats(profiler) if profiler is not None else None,
+    )
+
+
+class RequestMetricsBuffer(object):
+    """
+    Sums the metrics of the requests served by this process per view, and writes them to `RequestMetrics` every
+    `settings.INSTRUMENTATION_FLUSH_INTERVAL` seconds instead of on every request.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.last_flush = time.time()
+        self.last_samples = {}
+
+    def add(self, view_name, metrics, is_slow):
+        """
+        Adds the metrics of one request, see `record_request_sample` for the expected keys.
+
+        :return: True if the buffered metrics were written to the database.
+        """
+        with self.lock:
+            totals = self.metrics.setdefault(view_name, {
+                'request_count': 0,
+                'slow_count': 0,
+                'query_count': 0,
+                'cache_hits': 0,
+                'cache_misses': 0,
+                'total_duration': 0.0,
+                'max_duration': 0.0,
+                'db_time': 0.0,
+            })
+            totals['request_count'] += 1
+            totals['slow_count'] += 1 if is_slow else 0
+            totals['query_count'] += metrics['query_count']
+            totals['cache_hits'] += metrics['cache_hits']
+            totals['cache_misses'] += metrics['cache_misses']
+            totals['total_duration'] += metrics['duration']
+            totals['max_duration'] = max(totals['max_duration'], metrics['duration'])
+            totals['db_time'] += metrics['db_time']
+
+            if time.time() - self.last_flush < settings.INSTRUMENTATION_FLUSH_INTERVAL:
+                return False
+            metrics_by_view, self.metrics, self.last_flush = self.metrics, {}, time.time()
+        add_request_metrics(metrics_by_view, timezone.now())
+        return True
+
+    def should_sample(self, view_name):
+        """Allows one slow request sample per view and minute in this process, so a slow view can't flood them."""
+        with self.lock:
+            now = time.time()
+            if now - self.last_samples.get(view_name, 0) < 60:
+                return False
+            self.last_samples[view_name] = now
+            return True
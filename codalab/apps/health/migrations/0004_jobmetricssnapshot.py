@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0003_auto_20220907_1946'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobMetricsSnapshot',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField(unique=True)),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('running_count', models.PositiveIntegerField(default=0)),
+                ('pending_longer_than_10_minutes_count', models.PositiveIntegerField(default=0)),
+                ('today_count', models.PositiveIntegerField(default=0)),
+                ('today_failed_count', models.PositiveIntegerField(default=0)),
+                ('today_finished_count', models.PositiveIntegerField(default=0)),
+                ('today_pending_count', models.PositiveIntegerField(default=0)),
+                ('finished_in_last_2_days_avg', models.FloatField(default=0.0)),
+                ('created_in_last_minute', models.PositiveIntegerField(default=0)),
+                ('finished_in_last_minute', models.PositiveIntegerField(default=0)),
+                ('failed_in_last_minute', models.PositiveIntegerField(default=0)),
+                ('finished_in_last_minute_avg', models.FloatField(default=0.0)),
+            ],
+            options={
+                'ordering': ('-minute',),
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('web', '0007_auto_20220623_1508'),
+        ('health', '0004_jobmetricssnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubmissionLifecycleEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queue_name', models.CharField(blank=True, default='', max_length=128)),
+                ('event', models.CharField(choices=[('submitted', 'Submitted'), ('dispatched', 'Dispatched'), ('picked_up', 'Picked up'), ('predict_finished', 'Predict finished'), ('scoring_dispatched', 'Scoring dispatched'), ('scoring_picked_up', 'Scoring picked up'), ('scores_ingested', 'Scores ingested'), ('leaderboard_updated', 'Leaderboard updated')], max_length=32)),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('competition', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='web.Competition')),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lifecycle_events', to='web.CompetitionSubmission')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='submissionlifecycleevent',
+            index_together=set([('event', 'timestamp')]),
+        ),
+    ]
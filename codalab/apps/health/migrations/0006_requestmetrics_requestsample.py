@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0005_submissionlifecycleevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestMetrics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minute', models.DateTimeField(db_index=True)),
+                ('view_name', models.CharField(max_length=255)),
+                ('request_count', models.PositiveIntegerField(default=0)),
+                ('slow_count', models.PositiveIntegerField(default=0)),
+                ('query_count', models.PositiveIntegerField(default=0)),
+                ('cache_hits', models.PositiveIntegerField(default=0)),
+                ('cache_misses', models.PositiveIntegerField(default=0)),
+                ('total_duration', models.FloatField(default=0.0)),
+                ('max_duration', models.FloatField(default=0.0)),
+                ('db_time', models.FloatField(default=0.0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RequestSample',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('view_name', models.CharField(max_length=255)),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.TextField()),
+                ('user_id', models.PositiveIntegerField(blank=True, null=True)),
+                ('status_code', models.PositiveIntegerField(default=0)),
+                ('duration', models.FloatField(default=0.0)),
+                ('db_time', models.FloatField(default=0.0)),
+                ('query_count', models.PositiveIntegerField(default=0)),
+                ('cache_hits', models.PositiveIntegerField(default=0)),
+                ('cache_misses', models.PositiveIntegerField(default=0)),
+                ('top_queries', models.TextField(blank=True)),
+                ('profile', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='requestmetrics',
+            unique_together=set([('minute', 'view_name')]),
+        ),
+    ]
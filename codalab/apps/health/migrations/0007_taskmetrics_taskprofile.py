@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('health', '0006_requestmetrics_requestsample'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskMetrics',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_name', models.CharField(max_length=255)),
+                ('queue', models.CharField(blank=True, default='', max_length=255)),
+                ('run_count', models.PositiveIntegerField(default=0)),
+                ('failure_count', models.PositiveIntegerField(default=0)),
+                ('queue_wait_count', models.PositiveIntegerField(default=0)),
+                ('total_queue_wait', models.FloatField(default=0.0)),
+                ('max_queue_wait', models.FloatField(default=0.0)),
+                ('total_runtime', models.FloatField(default=0.0)),
+                ('max_runtime', models.FloatField(default=0.0)),
+                ('query_count', models.BigIntegerField(default=0)),
+                ('max_rss_kb', models.BigIntegerField(default=0)),
+                ('total_rss_growth_kb', models.BigIntegerField(default=0)),
+                ('last_run_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ('task_name', 'queue'),
+            },
+        ),
+        migrations.CreateModel(
+            name='TaskProfile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('task_name', models.CharField(max_length=255)),
+                ('runtime', models.FloatField(default=0.0)),
+                ('profile', models.TextField()),
+            ],
+            options={
+                'ordering': ('-created_at',),
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='taskmetrics',
+            unique_together=set([('task_name', 'queue')]),
+        ),
+    ]
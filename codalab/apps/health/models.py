@@ -1,4 +1,39 @@
+import json
+import math
+from datetime import timedelta
+
+from django.core.cache import cache
 from django.db import models
+from django.db.models import Case, Count, DurationField, ExpressionWrapper, F, Max, Q, Sum, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from apps.jobs.models import Job
+
+# Jobs still pending after this long are reported on the health page and trigger alerts
+JOB_LONG_RUNNING_DURATION = timedelta(minutes=10)
+# Readers fall back to computing the metrics themselves when the latest snapshot is older than this
+JOB_METRICS_MAX_AGE = timedelta(minutes=2)
+JOB_METRICS_RETENTION = timedelta(days=7)
+
+SUBMISSION_EVENT_RETENTION = timedelta(days=30)
+# Submissions submitted within this window are included in the latency percentiles of the health page
+SUBMISSION_LATENCY_WINDOW = timedelta(days=1)
+SUBMISSION_LATENCY_CACHE_TIMEOUT = 5 * 60
+SUBMISSION_LATENCY_PERCENTILES = (50, 90, 99)
+# Upper bounds in seconds of the latency histogram buckets, the last bucket holds everything above
+SUBMISSION_LATENCY_BUCKETS = (
+    ('< 10s', 10),
+    ('< 1m', 60),
+    ('< 5m', 5 * 60),
+    ('< 15m', 15 * 60),
+    ('< 1h', 60 * 60),
+    ('< 6h', 6 * 60 * 60),
+    ('6h+', None),
+)
+
+REQUEST_METRICS_RETENTION = timedelta(days=7)
+TASK_PROFILE_RETENTION = timedelta(days=7)
 
 
 class HealthSettings(models.Model):
@@ -41,3 +76,474 @@ class UserStorageDataPoint(models.Model):
     datasets_total = models.BigIntegerField(default=0)
     submissions_total = models.BigIntegerField(default=0)
     total = models.BigIntegerField(default=0)
+
+
+class JobMetricsSnapshot(models.Model):
+    """
+    Per-minute rollup of job counts and latencies, written by `apps.health.tasks.rollup_job_metrics`.
+
+    The `*_in_last_minute` fields describe the activity in the minute before the snapshot was taken,
+    every other count is the state of the jobs table at that time.
+    """
+    minute = models.DateTimeField(unique=True)
+    pending_count = models.PositiveIntegerField(default=0)
+    running_count = models.PositiveIntegerField(default=0)
+    pending_longer_than_10_minutes_count = models.PositiveIntegerField(default=0)
+    today_count = models.PositiveIntegerField(default=0)
+    today_failed_count = models.PositiveIntegerField(default=0)
+    today_finished_count = models.PositiveIntegerField(default=0)
+    today_pending_count = models.PositiveIntegerField(default=0)
+    finished_in_last_2_days_avg = models.FloatField(default=0.0)
+    created_in_last_minute = models.PositiveIntegerField(default=0)
+    finished_in_last_minute = models.PositiveIntegerField(default=0)
+    failed_in_last_minute = models.PositiveIntegerField(default=0)
+    finished_in_last_minute_avg = models.FloatField(default=0.0)
+
+    class Meta:
+        ordering = ('-minute',)
+
+
+def _job_duration():
+    return ExpressionWrapper(F('updated') - F('created'), output_field=DurationField())
+
+
+def _average_seconds(total_duration, count):
+    # Whole seconds, like the health page always displayed them
+    if not total_duration or not count:
+        return 0.0
+    return float(round(total_duration.total_seconds() / count))
+
+
+def compute_job_metrics(current_time=None):
+    """
+    Computes the job metrics stored in a `JobMetricsSnapshot` with two aggregate queries.
+
+    :param current_time: Time to compute the metrics at, defaults to now.
+    :return: Dictionary of `JobMetricsSnapshot` field values, without `minute`.
+    """
+    if current_time is None:
+        current_time = timezone.now()
+    today_start = timezone.localtime(current_time).replace(hour=0, minute=0, second=0, microsecond=0)
+    minute_start = current_time - timedelta(minutes=1)
+    two_days_ago = current_time - timedelta(days=2)
+
+    # Durations are summed rather than averaged, Avg always converts its result to a float and
+    # can't handle the intervals returned by Postgres
+    finished = Job.objects.filter(status=Job.FINISHED).filter(
+        Q(created__gt=two_days_ago) | Q(updated__gte=minute_start)
+    ).aggregate(
+        last_2_days_count=Count(Case(When(created__gt=two_days_ago, then=1))),
+        last_2_days_duration=Sum(Case(
+            When(created__gt=two_days_ago, then=_job_duration()),
+            output_field=DurationField(),
+        )),
+        last_minute_count=Count(Case(When(updated__gte=minute_start, then=1))),
+        last_minute_duration=Sum(Case(
+            When(updated__gte=minute_start, then=_job_duration()),
+            output_field=DurationField(),
+        )),
+    )
+
+    jobs = Job.objects.filter(
+        Q(status__in=[Job.PENDING, Job.RUNNING]) |
+        Q(created__gte=min(today_start, minute_start)) |
+        Q(updated__gte=minute_start)
+    ).aggregate(
+        pending_count=Count(Case(When(status=Job.PENDING, then=1))),
+        running_count=Count(Case(When(status=Job.RUNNING, then=1))),
+        pending_longer_than_10_minutes_count=Count(Case(When(
+            status=Job.PENDING,
+            updated__gt=F('created') + JOB_LONG_RUNNING_DURATION,
+            then=1,
+        ))),
+        today_count=Count(Case(When(created__gte=today_start, then=1))),
+        today_failed_count=Count(Case(When(created__gte=today_start, status=Job.FAILED, then=1))),
+        today_finished_count=Count(Case(When(created__gte=today_start, status=Job.FINISHED, then=1))),
+        today_pending_count=Count(Case(When(created__gte=today_start, status=Job.PENDING, then=1))),
+        created_in_last_minute=Count(Case(When(created__gte=minute_start, then=1))),
+        failed_in_last_minute=Count(Case(When(updated__gte=minute_start, status=Job.FAILED, then=1))),
+    )
+
+    jobs['finished_in_last_minute'] = finished['last_minute_count']
+    jobs['finished_in_last_minute_avg'] = _average_seconds(
+        finished['last_minute_duration'],
+        finished['last_minute_count']
+    )
+    jobs['finished_in_last_2_days_avg'] = _average_seconds(
+        finished['last_2_days_duration'],
+        finished['last_2_days_count']
+    )
+    return jobs
+
+
+def rollup_job_metrics(current_time=None):
+    """
+    Stores the job metrics of the current minute and drops snapshots older than `JOB_METRICS_RETENTION`.
+
+    :param current_time: Time to compute the metrics at, defaults to now.
+    :return: The `JobMetricsSnapshot` of the current minute.
+    """
+    if current_time is None:
+        current_time = timezone.now()
+    snapshot, _ = JobMetricsSnapshot.objects.update_or_create(
+        minute=current_time.replace(second=0, microsecond=0),
+        defaults=compute_job_metrics(current_time),
+    )
+    JobMetricsSnapshot.objects.filter(minute__lt=current_time - JOB_METRICS_RETENTION).delete()
+    return snapshot
+
+
+def get_job_metrics():
+    """
+    Returns the latest `JobMetricsSnapshot`, taking a new one if the periodic rollup fell behind.
+    """
+    snapshot = JobMetricsSnapshot.objects.first()
+    if snapshot is None or snapshot.minute < timezone.now() - JOB_METRICS_MAX_AGE:
+        snapshot = rollup_job_metrics()
+    return snapshot
+
+
+class SubmissionLifecycleEvent(models.Model):
+    """
+    Append-only log of the steps a submission goes through, from `evaluate_submission` to the leaderboard.
+
+    Submissions evaluated without a prediction step skip `dispatched -> picked up -> predict finished`
+    and are picked up as scoring runs.
+    """
+    SUBMITTED = 'submitted'
+    DISPATCHED = 'dispatched'
+    PICKED_UP = 'picked_up'
+    PREDICT_FINISHED = 'predict_finished'
+    SCORING_DISPATCHED = 'scoring_dispatched'
+    SCORING_PICKED_UP = 'scoring_picked_up'
+    SCORES_INGESTED = 'scores_ingested'
+    LEADERBOARD_UPDATED = 'leaderboard_updated'
+    EVENT_CHOICES = (
+        (SUBMITTED, 'Submitted'),
+        (DISPATCHED, 'Dispatched'),
+        (PICKED_UP, 'Picked up'),
+        (PREDICT_FINISHED, 'Predict finished'),
+        (SCORING_DISPATCHED, 'Scoring dispatched'),
+        (SCORING_PICKED_UP, 'Scoring picked up'),
+        (SCORES_INGESTED, 'Scores ingested'),
+        (LEADERBOARD_UPDATED, 'Leaderboard updated'),
+    )
+
+    submission = models.ForeignKey('web.CompetitionSubmission', on_delete=models.CASCADE,
+                                   related_name='lifecycle_events')
+    # Copied from the submission so the latencies can be grouped without joins
+    competition = models.ForeignKey('web.Competition', on_delete=models.CASCADE, related_name='+')
+    queue_name = models.CharField(max_length=128, blank=True, default='')
+    event = models.CharField(max_length=32, choices=EVENT_CHOICES)
+    timestamp = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        index_together = (('event', 'timestamp'),)
+
+    def __str__(self):
+        return "{} {} at {}".format(self.submission_id, self.event, self.timestamp)
+
+
+# Latencies shown on the health page: (name, start event, end event)
+SUBMISSION_LIFECYCLE_STAGES = (
+    ('Dispatch', SubmissionLifecycleEvent.SUBMITTED, SubmissionLifecycleEvent.DISPATCHED),
+    ('Waiting for a worker', SubmissionLifecycleEvent.DISPATCHED, SubmissionLifecycleEvent.PICKED_UP),
+    ('Prediction', SubmissionLifecycleEvent.PICKED_UP, SubmissionLifecycleEvent.PREDICT_FINISHED),
+    ('Scoring dispatch', SubmissionLifecycleEvent.PREDICT_FINISHED, SubmissionLifecycleEvent.SCORING_DISPATCHED),
+    ('Waiting for a scoring worker', SubmissionLifecycleEvent.SCORING_DISPATCHED,
+     SubmissionLifecycleEvent.SCORING_PICKED_UP),
+    ('Scoring', SubmissionLifecycleEvent.SCORING_PICKED_UP, SubmissionLifecycleEvent.SCORES_INGESTED),
+    ('Leaderboard update', SubmissionLifecycleEvent.SCORES_INGESTED, SubmissionLifecycleEvent.LEADERBOARD_UPDATED),
+    ('Total', SubmissionLifecycleEvent.SUBMITTED, SubmissionLifecycleEvent.SCORES_INGESTED),
+)
+
+
+def record_submission_event(submission, event, timestamp=None):
+    """
+    Appends `event` to the lifecycle of `submission`.
+
+    :param submission: The CompetitionSubmission.
+    :param event: One of the `SubmissionLifecycleEvent` event codes.
+    :param timestamp: When the event happened, defaults to now.
+    """
+    return SubmissionLifecycleEvent.objects.create(
+        submission_id=submission.pk,
+        competition_id=submission.phase.competition_id,
+        queue_name=submission.queue_name or '',
+        event=event,
+        timestamp=timestamp or timezone.now(),
+    )
+
+
+def _percentile(sorted_values, percentile):
+    # Nearest-rank percentile
+    index = int(math.ceil(percentile / 100.0 * len(sorted_values))) - 1
+    return sorted_values[max(index, 0)]
+
+
+def _latency_histogram(sorted_values):
+    counts = []
+    remaining = sorted_values
+    for _, upper_bound in SUBMISSION_LATENCY_BUCKETS:
+        if upper_bound is None:
+            counts.append(len(remaining))
+            break
+        in_bucket = [value for value in remaining if value < upper_bound]
+        counts.append(len(in_bucket))
+        remaining = remaining[len(in_bucket):]
+    return counts
+
+
+def compute_submission_latencies(group_by='queue', since=None):
+    """
+    Computes the latency percentiles and histogram of every `SUBMISSION_LIFECYCLE_STAGES` stage, for the
+    submissions submitted since `since`, with a single query.
+
+    :param group_by: 'queue' or 'competition'.
+    :param since: Defaults to `SUBMISSION_LATENCY_WINDOW` ago.
+    :return: List of dictionaries with the group 'name' and its 'stages', busiest groups first. Each stage
+        has a 'name', 'count', one 'p<percentile>' entry per `SUBMISSION_LATENCY_PERCENTILES`, 'max' and
+        'histogram' counts matching `SUBMISSION_LATENCY_BUCKETS`, all durations in seconds.
+    """
+    if since is None:
+        since = timezone.now() - SUBMISSION_LATENCY_WINDOW
+    submitted = SubmissionLifecycleEvent.objects.filter(
+        event=SubmissionLifecycleEvent.SUBMITTED,
+        timestamp__gte=since,
+    ).values('submission_id')
+    events = SubmissionLifecycleEvent.objects.filter(submission_id__in=submitted).order_by('timestamp', 'pk')
+    if group_by == 'competition':
+        events = events.values_list('submission_id', 'event', 'timestamp', 'competition__title')
+    else:
+        events = events.values_list('submission_id', 'event', 'timestamp', 'queue_name')
+
+    # First occurrence of every event per submission
+    submissions = {}
+    groups = {}
+    for submission_id, event, timestamp, group in events:
+        submissions.setdefault(submission_id, {}).setdefault(event, timestamp)
+        # The queue is only known once the submission was dispatched
+        if group or submission_id not in groups:
+            groups[submission_id] = group or ('compute-worker' if group_by == 'queue' else 'Untitled')
+
+    durations = {}
+    for submission_id, timestamps in submissions.items():
+        for stage_name, start_event, end_event in SUBMISSION_LIFECYCLE_STAGES:
+            if start_event in timestamps and end_event in timestamps:
+                duration = max((timestamps[end_event] - timestamps[start_event]).total_seconds(), 0)
+                durations.setdefault(groups[submission_id], {}).setdefault(stage_name, []).append(duration)
+
+    results = []
+    for group_name, stage_durations in durations.items():
+        stages = []
+        for stage_name, _, _ in SUBMISSION_LIFECYCLE_STAGES:
+            values = sorted(stage_durations.get(stage_name, []))
+            if not values:
+                continue
+            stage = {
+                'name': stage_name,
+                'count': len(values),
+                'max': values[-1],
+                'histogram': _latency_histogram(values),
+            }
+            for percentile in SUBMISSION_LATENCY_PERCENTILES:
+                stage['p{}'.format(percentile)] = _percentile(values, percentile)
+            stages.append(stage)
+        results.append({
+            'name': group_name,
+            'count': max(stage['count'] for stage in stages),
+            'stages': stages,
+        })
+    results.sort(key=lambda group: (-group['count'], group['name']))
+    return results
+
+
+def get_submission_latencies(group_by='queue'):
+    """Returns `compute_submission_latencies`, cached for `SUBMISSION_LATENCY_CACHE_TIMEOUT`."""
+    cache_key = 'health-submission-latencies-{}'.format(group_by)
+    latencies = cache.get(cache_key)
+    if latencies is None:
+        latencies = compute_submission_latencies(group_by)
+        cache.set(cache_key, latencies, SUBMISSION_LATENCY_CACHE_TIMEOUT)
+    return latencies
+
+
+def delete_old_submission_events():
+    """Drops the lifecycle events older than `SUBMISSION_EVENT_RETENTION`."""
+    return SubmissionLifecycleEvent.objects.filter(
+        timestamp__lt=timezone.now() - SUBMISSION_EVENT_RETENTION
+    ).delete()[0]
+
+
+class RequestMetrics(models.Model):
+    """
+    Per-minute totals of the requests served by a view, written by `apps.web.middleware.InstrumentationMiddleware`.
+    Durations are in seconds.
+    """
+    minute = models.DateTimeField(db_index=True)
+    view_name = models.CharField(max_length=255)
+    request_count = models.PositiveIntegerField(default=0)
+    slow_count = models.PositiveIntegerField(default=0)
+    query_count = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)
+    cache_misses = models.PositiveIntegerField(default=0)
+    total_duration = models.FloatField(default=0.0)
+    max_duration = models.FloatField(default=0.0)
+    db_time = models.FloatField(default=0.0)
+
+    class Meta:
+        unique_together = (('minute', 'view_name'),)
+
+
+class RequestSample(models.Model):
+    """A slow request, or a request profiled by staff, with the SQL it repeated the most."""
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    view_name = models.CharField(max_length=255)
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    user_id = models.PositiveIntegerField(null=True, blank=True)
+    status_code = models.PositiveIntegerField(default=0)
+    duration = models.FloatField(default=0.0)
+    db_time = models.FloatField(default=0.0)
+    query_count = models.PositiveIntegerField(default=0)
+    cache_hits = models.PositiveIntegerField(default=0)
+    cache_misses = models.PositiveIntegerField(default=0)
+    # JSON list of {"sql", "count", "time"}, most repeated SQL shape first
+    top_queries = models.TextField(blank=True)
+    # cProfile statistics of profiled requests
+    profile = models.TextField(null=True, blank=True)
+
+    class Meta:
+        ordering = ('-created_at',)
+
+    def __str__(self):
+        return "{} {} ({:.3f}s)".format(self.method, self.path, self.duration)
+
+    def get_top_queries(self):
+        return json.loads(self.top_queries) if self.top_queries else []
+
+
+def add_request_metrics(metrics_by_view, minute):
+    """
+    Adds request totals to the `RequestMetrics` of `minute`.
+
+    :param metrics_by_view: Dictionary mapping view names to dictionaries of `RequestMetrics` field values.
+    :param minute: The minute the requests were served in.
+    """
+    minute = minute.replace(second=0, microsecond=0)
+    for view_name, metrics in metrics_by_view.items():
+        bucket, created = RequestMetrics.objects.get_or_create(minute=minute, view_name=view_name, defaults=metrics)
+        if not created:
+            updates = {
+                name: F(name) + value for name, value in metrics.items() if name != 'max_duration'
+            }
+            updates['max_duration'] = Greatest(F('max_duration'), metrics['max_duration'])
+            RequestMetrics.objects.filter(pk=bucket.pk).update(**updates)
+
+
+def get_request_metrics(since=None, limit=None):
+    """
+    Aggregates the `RequestMetrics` of every view since `since`, defaulting to the last hour.
+
+    :return: List of dictionaries, the views that spent the most time serving requests first.
+    """
+    if since is None:
+        since = timezone.now() - timedelta(hours=1)
+    views = RequestMetrics.objects.filter(minute__gte=since).values('view_name').annotate(
+        request_count=Sum('request_count'),
+        slow_count=Sum('slow_count'),
+        query_count=Sum('query_count'),
+        cache_hits=Sum('cache_hits'),
+        cache_misses=Sum('cache_misses'),
+        total_duration=Sum('total_duration'),
+        max_duration=Max('max_duration'),
+        db_time=Sum('db_time'),
+    ).order_by('-total_duration', 'view_name')
+    if limit is not None:
+        views = views[:limit]
+
+    metrics = []
+    for view in views:
+        request_count = view['request_count'] or 1
+        cache_lookups = view['cache_hits'] + view['cache_misses']
+        view.update({
+            'avg_duration': view['total_duration'] / request_count,
+            'avg_db_time': view['db_time'] / request_count,
+            'avg_query_count': view['query_count'] / float(request_count),
+            'cache_hit_ratio': view['cache_hits'] / float(cache_lookups) if cache_lookups else None,
+        })
+        metrics.append(view)
+    return metrics
+
+
+def delete_old_request_metrics():
+    """Drops the request metrics and samples older than `REQUEST_METRICS_RETENTION`, and old task profiles."""
+    now = timezone.now()
+    RequestMetrics.objects.filter(minute__lt=now - REQUEST_METRICS_RETENTION).delete()
+    RequestSample.objects.filter(created_at__lt=now - REQUEST_METRICS_RETENTION).delete()
+    TaskProfile.objects.filter(created_at__lt=now - TASK_PROFILE_RETENTION).delete()
+
+
+class TaskMetrics(models.Model):
+    """
+    Running totals of the celery tasks run per task name and queue, recorded by the handlers in
+    `apps.health.signals` and exported for Prometheus. Durations are in seconds.
+    """
+    task_name = models.CharField(max_length=255)
+    queue = models.CharField(max_length=255, blank=True, default='')
+    run_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    # Only tasks published with a `sent_at` header have a known queue wait
+    queue_wait_count = models.PositiveIntegerField(default=0)
+    total_queue_wait = models.FloatField(default=0.0)
+    max_queue_wait = models.FloatField(default=0.0)
+    total_runtime = models.FloatField(default=0.0)
+    max_runtime = models.FloatField(default=0.0)
+    query_count = models.BigIntegerField(default=0)
+    # Peak resident set size of the worker process after the task, and how much the task made it grow
+    max_rss_kb = models.BigIntegerField(default=0)
+    total_rss_growth_kb = models.BigIntegerField(default=0)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = (('task_name', 'queue'),)
+        ordering = ('task_name', 'queue')
+
+
+class TaskProfile(models.Model):
+    """cProfile statistics of a run of one of the tasks listed in `settings.CELERY_PROFILED_TASKS`."""
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    task_name = models.CharField(max_length=255)
+    runtime = models.FloatField(default=0.0)
+    profile = models.TextField()
+
+    class Meta:
+        ordering = ('-created_at',)
+
+
+def record_task_metrics(task_name, queue, runtime, query_count, rss_kb, rss_growth_kb, failed, queue_wait=None):
+    """Adds one run of `task_name` to its `TaskMetrics`, see the fields for the meaning of the arguments."""
+    values = {
+        'run_count': 1,
+        'failure_count': 1 if failed else 0,
+        'queue_wait_count': 1 if queue_wait is not None else 0,
+        'total_queue_wait': queue_wait or 0.0,
+        'total_runtime': runtime,
+        'query_count': query_count,
+        'total_rss_growth_kb': rss_growth_kb,
+    }
+    maximums = {
+        'max_queue_wait': queue_wait or 0.0,
+        'max_runtime': runtime,
+        'max_rss_kb': rss_kb,
+    }
+    now = timezone.now()
+    metrics, created = TaskMetrics.objects.get_or_create(
+        task_name=task_name,
+        queue=queue,
+        defaults=dict(values, last_run_at=now, **maximums),
+    )
+    if not created:
+        updates = {name: F(name) + value for name, value in values.items()}
+        updates.update({name: Greatest(F(name), value) for name, value in maximums.items()})
+        TaskMetrics.objects.filter(pk=metrics.pk).update(last_run_at=now, **updates)
@@ -0,0 +1,106 @@
+"""
+Celery signal handlers recording the queue wait, runtime, queries and memory of each task run into
+`apps.health.models.TaskMetrics`, to size the worker pools and `CELERYD_MAX_TASKS_PER_CHILD`.
+Connected by `apps.health.apps.HealthConfig.ready`, so web, beat and worker processes all have them.
+"""
+import cProfile
+import logging
+import resource
+import time
+
+from celery.signals import before_task_publish, task_failure, task_postrun, task_prerun
+from django.conf import settings
+from django.db import connection, reset_queries
+
+from apps.health.instrumentation import get_profile_stats
+from apps.health.models import TaskProfile, record_task_metrics
+
+logger = logging.getLogger(__name__)
+
+# Task id -> measurements taken when the task started
+_running_tasks = {}
+
+
+def _get_rss_kb():
+    """:return: The peak resident set size of this process in kilobytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _get_sent_at(request):
+    sent_at = getattr(request, 'sent_at', None)
+    if sent_at is None:
+        sent_at = (getattr(request, 'headers', None) or {}).get('sent_at')
+    return sent_at if isinstance(sent_at, (int, float)) else None
+
+
+@before_task_publish.connect
+def stamp_task_sent_at(headers=None, **kwargs):
+    """Adds the time a task is published to its message headers, the worker computes its queue wait from it."""
+    if headers is not None:
+        headers.setdefault('sent_at', time.time())
+
+
+@task_prerun.connect
+def start_task_metrics(task_id=None, task=None, **kwargs):
+    if not settings.INSTRUMENTATION_ENABLED or task is None:
+        return
+    if not task.request.is_eager:
+        # The log is capped at `queries_log.maxlen` and never reset in workers, once full the count would stay 0
+        reset_queries()
+    now = time.time()
+    sent_at = _get_sent_at(task.request)
+    state = {
+        'start': now,
+        'queue_wait': max(now - sent_at, 0.0) if sent_at is not None else None,
+        'rss_kb': _get_rss_kb(),
+        'force_debug_cursor': connection.force_debug_cursor,
+        # Eager tasks run inside requests, whose queries are logged too
+        'query_offset': len(connection.queries_log),
+        'failed': False,
+        'profiler': None,
+    }
+    connection.force_debug_cursor = True
+    if task.name in settings.CELERY_PROFILED_TASKS:
+        state['profiler'] = cProfile.Profile()
+        state['profiler'].enable()
+    _running_tasks[task_id] = state
+
+
+@task_failure.connect
+def mark_task_failed(task_id=None, **kwargs):
+    # Sent before task_postrun, which records the run
+    state = _running_tasks.get(task_id)
+    if state is not None:
+        state['failed'] = True
+
+
+@task_postrun.connect
+def record_task_run(task_id=None, task=None, state=None, **kwargs):
+    started = _running_tasks.pop(task_id, None)
+    if started is None:
+        return
+    runtime = time.time() - started['start']
+    profiler = started['profiler']
+    if profiler is not None:
+        profiler.disable()
+    query_count = max(len(connection.queries_log) - started['query_offset'], 0)
+    connection.force_debug_cursor = started['force_debug_cursor']
+    rss_kb = _get_rss_kb()
+
+    delivery_info = getattr(task.request, 'delivery_info', None) or {}
+    try:
+        record_task_metrics(
+            task.name,
+            delivery_info.get('routing_key') or '',
+            runtime=runtime,
+            query_count=query_count,
+            rss_kb=rss_kb,
+            rss_growth_kb=max(rss_kb - started['rss_kb'], 0),
+            failed=started['failed'] or state == 'FAILURE',
+            queue_wait=started['queue_wait'],
+        )
+        if profiler is not None:
+            TaskProfile.objects.create(task_name=task.name, runtime=runtime, profile=get_profile_stats(profiler))
+    except Exception:
+        # The metrics must never break the worker, e.g. when the task failed because the database is down
+        logger.exception("Could not record the metrics of task %s", task.name)
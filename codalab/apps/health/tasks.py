@@ -0,0 +1,24 @@
+import logging
+
+from celery import task
+
+from apps.health.models import delete_old_request_metrics, delete_old_submission_events, rollup_job_metrics
+
+logger = logging.getLogger(__name__)
+
+
+@task(queue='site-worker', soft_time_limit=50)
+def rollup_job_metrics_task():
+    snapshot = rollup_job_metrics()
+    logger.debug("Stored job metrics snapshot for {}".format(snapshot.minute))
+
+
+@task(queue='site-worker')
+def delete_old_submission_events_task():
+    deleted = delete_old_submission_events()
+    logger.debug("Deleted {} old submission lifecycle events".format(deleted))
+
+
+@task(queue='site-worker')
+def delete_old_request_metrics_task():
+    delete_old_request_metrics()
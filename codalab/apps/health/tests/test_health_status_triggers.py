@@ -6,7 +6,7 @@ from django.core.urlresolvers import reverse
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
-from apps.health.models import HealthSettings
+from apps.health.models import HealthSettings, JobMetricsSnapshot
 
 User = get_user_model()
 
@@ -18,12 +18,11 @@ class HealthStatusTriggerTests(TestCase):
         self.health_settings.save()
 
     def test_health_status_triggers_when_jobs_in_queue_greater_than_25(self):
-        with mock.patch('apps.health.views.get_health_metrics') as get_health_metrics_mock:
-            get_health_metrics_mock.return_value = {
-                "jobs_pending_count": 510,
-                "jobs_lasting_longer_than_10_minutes": [_ for _ in range(0, 5)],
-                "alert_emails": self.health_settings.emails,
-            }
+        with mock.patch('apps.health.views.get_job_metrics') as get_job_metrics_mock:
+            get_job_metrics_mock.return_value = JobMetricsSnapshot(
+                pending_count=510,
+                pending_longer_than_10_minutes_count=5,
+            )
 
             self.client.get(reverse("health_status_check_thresholds"))
 
@@ -33,12 +32,11 @@ class HealthStatusTriggerTests(TestCase):
             self.assertEqual(mail.outbox[0].subject, "Codalab Warning: Jobs pending > 25!")
 
     def test_health_status_triggers_when_a_job_takes_greater_than_10_minutes_to_process(self):
-        with mock.patch('apps.health.views.get_health_metrics') as get_health_metrics_mock:
-            get_health_metrics_mock.return_value = {
-                "jobs_pending_count": 5,
-                "jobs_lasting_longer_than_10_minutes": [_ for _ in range(0, 15)],
-                "alert_emails": self.health_settings.emails,
-            }
+        with mock.patch('apps.health.views.get_job_metrics') as get_job_metrics_mock:
+            get_job_metrics_mock.return_value = JobMetricsSnapshot(
+                pending_count=5,
+                pending_longer_than_10_minutes_count=15,
+            )
 
             self.client.get(reverse("health_status_check_thresholds"))
 
@@ -51,12 +49,11 @@ class HealthStatusTriggerTests(TestCase):
         self.health_settings.emails = "test_only_one@test.com"
         self.health_settings.save()
 
-        with mock.patch('apps.health.views.get_health_metrics') as get_health_metrics_mock:
-            get_health_metrics_mock.return_value = {
-                "jobs_pending_count": 510,
-                "jobs_lasting_longer_than_10_minutes": None,
-                "alert_emails": self.health_settings.emails,
-            }
+        with mock.patch('apps.health.views.get_job_metrics') as get_job_metrics_mock:
+            get_job_metrics_mock.return_value = JobMetricsSnapshot(
+                pending_count=510,
+                pending_longer_than_10_minutes_count=0,
+            )
 
             self.client.get(reverse("health_status_check_thresholds"))
 
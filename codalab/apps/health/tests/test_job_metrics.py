@@ -0,0 +1,55 @@
+import datetime
+
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.health.models import JobMetricsSnapshot, compute_job_metrics, get_job_metrics, rollup_job_metrics
+from apps.jobs.models import Job
+
+
+class JobMetricsTests(TestCase):
+    def _create_job(self, status, created_ago=None):
+        job = Job.objects.create(status=status)
+        if created_ago is not None:
+            Job.objects.filter(pk=job.pk).update(created=timezone.now() - created_ago)
+        return job
+
+    def test_job_metrics_are_computed_with_two_queries(self):
+        self._create_job(Job.PENDING)
+        self._create_job(Job.PENDING, created_ago=datetime.timedelta(minutes=15))
+        self._create_job(Job.RUNNING)
+        self._create_job(Job.FAILED)
+        self._create_job(Job.FINISHED, created_ago=datetime.timedelta(minutes=2))
+        self._create_job(Job.FINISHED, created_ago=datetime.timedelta(days=3))
+
+        with self.assertNumQueries(2):
+            metrics = compute_job_metrics()
+
+        assert metrics['pending_count'] == 2
+        assert metrics['running_count'] == 1
+        assert metrics['pending_longer_than_10_minutes_count'] == 1
+        assert metrics['failed_in_last_minute'] == 1
+        assert metrics['finished_in_last_minute'] == 2
+        assert metrics['finished_in_last_2_days_avg'] == 120
+
+    def test_rollup_stores_one_snapshot_per_minute(self):
+        current_time = timezone.now().replace(second=10)
+        rollup_job_metrics(current_time)
+        self._create_job(Job.PENDING)
+        snapshot = rollup_job_metrics(current_time + datetime.timedelta(seconds=30))
+
+        assert JobMetricsSnapshot.objects.count() == 1
+        assert snapshot.pending_count == 1
+
+    def test_rollup_drops_old_snapshots(self):
+        JobMetricsSnapshot.objects.create(minute=timezone.now() - datetime.timedelta(days=8))
+        rollup_job_metrics()
+
+        assert JobMetricsSnapshot.objects.count() == 1
+
+    def test_get_job_metrics_reads_a_recent_snapshot(self):
+        snapshot = rollup_job_metrics()
+        self._create_job(Job.PENDING)
+
+        with self.assertNumQueries(1):
+            assert get_job_metrics().pk == snapshot.pk
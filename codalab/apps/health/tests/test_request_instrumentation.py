@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from apps.health.cache import start_counting_cache_lookups, stop_counting_cache_lookups
+from apps.health.instrumentation import get_sql_shape, get_top_sql_shapes
+from apps.health.models import RequestMetrics, RequestSample, get_request_metrics
+
+User = get_user_model()
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'apps.health.cache.InstrumentedLocMemCache', 'LOCATION': 'instrumentation-tests'}},
+    INSTRUMENTATION_ENABLED=True,
+    INSTRUMENTATION_SAMPLE_RATE=1.0,
+    INSTRUMENTATION_FLUSH_INTERVAL=0,
+    SLOW_REQUEST_THRESHOLD=60,
+    SLOW_REQUEST_QUERY_THRESHOLD=1000,
+)
+class RequestInstrumentationTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username="staff", password="pass", is_staff=True)
+        self.user = User.objects.create_user(username="user", password="pass")
+        self.url = reverse('health_request_metrics')
+
+    def test_sql_shapes_ignore_parameters(self):
+        queries = [
+            {'sql': 'SELECT * FROM "web_competition" WHERE "id" = 1', 'time': '0.001'},
+            {'sql': 'SELECT * FROM "web_competition" WHERE "id" = 22', 'time': '0.002'},
+            {'sql': "SELECT * FROM \"auth\" WHERE \"name\" = 'it''s' AND \"id\" IN (1, 2, 3)", 'time': '0.001'},
+        ]
+
+        assert get_sql_shape(queries[2]['sql']) == 'SELECT * FROM "auth" WHERE "name" = ? AND "id" IN (...)'
+        assert get_top_sql_shapes(queries)[0] == {
+            'sql': 'SELECT * FROM "web_competition" WHERE "id" = ?',
+            'count': 2,
+            'time': 0.003,
+        }
+
+    def test_cache_lookups_are_counted(self):
+        start_counting_cache_lookups()
+        cache.get('missing')
+        cache.set('present', 1)
+        cache.get('present')
+        cache.get_many(['present', 'missing'])
+
+        assert stop_counting_cache_lookups() == (2, 2)
+
+    def test_requests_are_aggregated_per_view(self):
+        self.client.login(username="staff", password="pass")
+        self.client.get(self.url)
+        self.client.get(self.url)
+
+        metrics = RequestMetrics.objects.get(view_name='health_request_metrics')
+        assert metrics.request_count == 2
+        assert metrics.query_count > 0
+        assert metrics.slow_count == 0
+        assert not RequestSample.objects.exists()
+        assert get_request_metrics()[0]['avg_query_count'] == metrics.query_count / 2.0
+
+    def test_slow_requests_are_sampled_with_their_queries(self):
+        self.client.login(username="staff", password="pass")
+        with self.settings(SLOW_REQUEST_QUERY_THRESHOLD=1):
+            self.client.get(self.url)
+            self.client.get(self.url)
+
+        # One sample per view and minute
+        sample = RequestSample.objects.get(view_name='health_request_metrics')
+        assert sample.query_count > 0
+        assert sample.get_top_queries()[0]['count'] >= 1
+        assert sample.profile is None
+        assert RequestMetrics.objects.get(view_name='health_request_metrics').slow_count == 2
+
+    def test_staff_can_profile_requests(self):
+        self.client.login(username="staff", password="pass")
+        resp = self.client.get(self.url, {'profile': ''})
+
+        sample = RequestSample.objects.get(pk=resp['X-Request-Sample'])
+        assert 'function calls' in sample.profile
+
+    def test_other_users_can_not_profile_requests(self):
+        self.client.login(username="user", password="pass")
+        resp = self.client.get(self.url, {'profile': ''})
+
+        assert not resp.has_header('X-Request-Sample')
+        assert not RequestSample.objects.exists()
+
+    def test_request_metrics_endpoint(self):
+        self.client.login(username="staff", password="pass")
+        self.client.get(self.url)
+
+        views = self.client.get(self.url).json()['views']
+        assert [view['view_name'] for view in views] == ['health_request_metrics']
+        assert views[0]['request_count'] == 1
@@ -0,0 +1,102 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.utils import timezone
+
+from apps.customizer.models import Configuration
+from apps.health.models import SubmissionLifecycleEvent, compute_submission_latencies, \
+    delete_old_submission_events, record_submission_event
+from apps.web.models import Competition, CompetitionParticipant, CompetitionPhase, CompetitionSubmission, \
+    ParticipantStatus
+
+User = get_user_model()
+
+
+class SubmissionLatencyTests(TestCase):
+    def setUp(self):
+        Configuration.objects.create(disable_all_submissions=False)
+        self.user = User.objects.create_user(username="user", password="pass")
+        self.competition = Competition.objects.create(title="Test Competition", creator=self.user, modified_by=self.user)
+        self.participant = CompetitionParticipant.objects.create(
+            user=self.user,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0],
+        )
+        self.phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+        )
+        self.start = timezone.now() - datetime.timedelta(hours=1)
+
+    def _submission_with_events(self, offsets, queue_name=''):
+        """Creates a submission and records its events, `offsets` maps events to seconds after `self.start`."""
+        submission = CompetitionSubmission.objects.create(phase=self.phase, participant=self.participant)
+        submission.queue_name = queue_name
+        for event, offset in offsets:
+            record_submission_event(submission, event, timestamp=self.start + datetime.timedelta(seconds=offset))
+        return submission
+
+    def test_latencies_per_stage(self):
+        for worker_wait in (10, 20, 30, 40):
+            self._submission_with_events([
+                (SubmissionLifecycleEvent.SUBMITTED, 0),
+                (SubmissionLifecycleEvent.DISPATCHED, 5),
+                (SubmissionLifecycleEvent.PICKED_UP, 5 + worker_wait),
+                (SubmissionLifecycleEvent.PREDICT_FINISHED, 100),
+                (SubmissionLifecycleEvent.SCORING_DISPATCHED, 101),
+                (SubmissionLifecycleEvent.SCORING_PICKED_UP, 110),
+                (SubmissionLifecycleEvent.SCORES_INGESTED, 200),
+            ])
+
+        with self.assertNumQueries(1):
+            latencies = compute_submission_latencies()
+
+        assert len(latencies) == 1
+        assert latencies[0]['name'] == 'compute-worker'
+        stages = {stage['name']: stage for stage in latencies[0]['stages']}
+        assert stages['Waiting for a worker']['count'] == 4
+        assert stages['Waiting for a worker']['p50'] == 20
+        assert stages['Waiting for a worker']['p90'] == 40
+        assert stages['Waiting for a worker']['max'] == 40
+        assert stages['Waiting for a worker']['histogram'] == [0, 4, 0, 0, 0, 0, 0]
+        assert stages['Total']['p99'] == 200
+        # Nothing reached the leaderboard
+        assert 'Leaderboard update' not in stages
+
+    def test_latencies_grouped_by_queue_and_competition(self):
+        self._submission_with_events([
+            (SubmissionLifecycleEvent.SUBMITTED, 0),
+            (SubmissionLifecycleEvent.DISPATCHED, 5),
+        ], queue_name='gpu')
+        self._submission_with_events([
+            (SubmissionLifecycleEvent.SUBMITTED, 0),
+            (SubmissionLifecycleEvent.DISPATCHED, 10),
+        ])
+
+        by_queue = {group['name']: group for group in compute_submission_latencies('queue')}
+        assert by_queue['gpu']['stages'][0]['p50'] == 5
+        assert by_queue['compute-worker']['stages'][0]['p50'] == 10
+
+        by_competition = compute_submission_latencies('competition')
+        assert [group['name'] for group in by_competition] == ['Test Competition']
+        assert by_competition[0]['count'] == 2
+
+    def test_submissions_outside_the_window_are_ignored(self):
+        self.start = timezone.now() - datetime.timedelta(days=2)
+        self._submission_with_events([
+            (SubmissionLifecycleEvent.SUBMITTED, 0),
+            (SubmissionLifecycleEvent.DISPATCHED, 5),
+        ])
+
+        assert compute_submission_latencies() == []
+
+    def test_old_events_are_deleted(self):
+        self.start = timezone.now() - datetime.timedelta(days=31)
+        self._submission_with_events([(SubmissionLifecycleEvent.SUBMITTED, 0)])
+        self.start = timezone.now()
+        self._submission_with_events([(SubmissionLifecycleEvent.SUBMITTED, 0)])
+
+        assert delete_old_submission_events() == 1
+        assert SubmissionLifecycleEvent.objects.count() == 1
@@ -0,0 +1,87 @@
+import time
+
+import mock
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from apps.health.models import TaskMetrics, TaskProfile
+from apps.health.signals import record_task_run, stamp_task_sent_at, start_task_metrics
+from apps.health.tasks import rollup_job_metrics_task
+
+User = get_user_model()
+
+TASK_NAME = 'apps.health.tasks.rollup_job_metrics_task'
+
+
+@override_settings(INSTRUMENTATION_ENABLED=True, CELERY_PROFILED_TASKS=[], METRICS_TOKEN='secret')
+class TaskMetricsTests(TestCase):
+    def test_task_runs_are_recorded(self):
+        rollup_job_metrics_task.apply()
+        rollup_job_metrics_task.apply()
+
+        metrics = TaskMetrics.objects.get(task_name=TASK_NAME)
+        assert metrics.run_count == 2
+        assert metrics.failure_count == 0
+        assert metrics.query_count > 0
+        assert metrics.max_rss_kb > 0
+        assert metrics.total_runtime >= metrics.max_runtime > 0
+        assert not TaskProfile.objects.exists()
+
+    def test_worker_queries_are_counted_once_the_query_log_is_full(self):
+        task = mock.Mock(request=mock.Mock(is_eager=False, sent_at=None, headers={}, delivery_info={}))
+        task.name = TASK_NAME
+        connection.queries_log.extend({} for _ in range(connection.queries_log.maxlen))
+
+        start_task_metrics(task_id='1', task=task)
+        list(User.objects.all())
+        record_task_run(task_id='1', task=task, state='SUCCESS')
+
+        assert TaskMetrics.objects.get(task_name=TASK_NAME).query_count == 1
+
+    def test_failed_task_runs_are_recorded(self):
+        with mock.patch('apps.health.tasks.rollup_job_metrics', side_effect=ValueError):
+            rollup_job_metrics_task.apply()
+
+        assert TaskMetrics.objects.get(task_name=TASK_NAME).failure_count == 1
+
+    def test_queue_wait_is_measured_from_the_sent_at_header(self):
+        headers = {}
+        stamp_task_sent_at(headers=headers)
+        rollup_job_metrics_task.apply(headers={'sent_at': headers['sent_at'] - 5})
+
+        metrics = TaskMetrics.objects.get(task_name=TASK_NAME)
+        assert metrics.queue_wait_count == 1
+        assert 5 <= metrics.max_queue_wait < 5 + time.time() - headers['sent_at'] + 1
+
+    def test_profiled_tasks(self):
+        with self.settings(CELERY_PROFILED_TASKS=[TASK_NAME]):
+            rollup_job_metrics_task.apply()
+
+        profile = TaskProfile.objects.get(task_name=TASK_NAME)
+        assert 'function calls' in profile.profile
+
+    def test_nothing_is_recorded_when_disabled(self):
+        with self.settings(INSTRUMENTATION_ENABLED=False):
+            rollup_job_metrics_task.apply()
+
+        assert not TaskMetrics.objects.exists()
+
+    def test_prometheus_export(self):
+        rollup_job_metrics_task.apply()
+        url = reverse('health_task_metrics')
+
+        assert self.client.get(url).status_code == 404
+        assert self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code == 404
+
+        resp = self.client.get(url, HTTP_AUTHORIZATION='Bearer secret')
+        assert resp['Content-Type'].startswith('text/plain; version=0.0.4')
+        lines = resp.content.decode().splitlines()
+        assert '# TYPE codalab_task_runs_total counter' in lines
+        assert 'codalab_task_runs_total{{task="{}",queue=""}} 1'.format(TASK_NAME) in lines
+
+        User.objects.create_user(username="staff", password="pass", is_staff=True)
+        self.client.login(username="staff", password="pass")
+        assert self.client.get(url).status_code == 200
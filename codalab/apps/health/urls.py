@@ -9,5 +9,9 @@ urlpatterns = [
     url(r'^download_simple_status', views.simple_health_csv, name='health_status_simple_csv'),
     url(r'^email_settings', views.email_settings, name='health_status_email_settings'),
     url(r'^check_thresholds', views.check_thresholds, name='health_status_check_thresholds'),
-    url(r'^storage', views.storage_analytics, name='health_storage_analytics')
+    url(r'^storage', views.storage_analytics, name='health_storage_analytics'),
+    url(r'^request_metrics', views.request_metrics, name='health_request_metrics'),
+    url(r'^request_samples/(?P<pk>\d+)', views.request_sample, name='health_request_sample'),
+    url(r'^task_metrics', views.task_metrics, name='health_task_metrics'),
+    url(r'^task_profiles/(?P<task_name>[\w.]+)', views.task_profile, name='health_task_profile'),
 ]
@@ -1,13 +1,17 @@
-from apps.health.models import HealthSettings
+from apps.health.models import HealthSettings, JobMetricsSnapshot, JOB_LONG_RUNNING_DURATION, RequestSample, \
+    SUBMISSION_LATENCY_BUCKETS, TaskMetrics, TaskProfile, get_job_metrics, get_request_metrics, \
+    get_submission_latencies
 from apps.jobs.models import Job
 from apps.web.models import CompetitionSubmission
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.core.mail import send_mail
-from django.http import HttpResponse
-from django.shortcuts import render
+from django.db.models import F
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
+from django.utils.crypto import constant_time_compare
 from django.utils import timezone
 
 import csv
@@ -17,49 +21,41 @@ from .models import HealthSettings
 
 def get_health_metrics():
     """
-    Function that get health metrics based on the amouunt of jobs.
+    Function that get health metrics based on the amount of jobs.
+
+    Counts and averages come from the latest `JobMetricsSnapshot`, only the job lists shown on the
+    page are queried here, and each of them is limited.
 
     :return: jobs dictionary
     -------
     - **Jobs pending** - Jobs pending queryset.
-    - **Jobs pending count** - Length of pending jobs.
-    - **Jobs finished in the last two days** - Jobs processed in the last two days.
-    - **Jobs lasting longer than 10 minutes** - Jobs that are running for more than 30 minutes.
+    - **Jobs pending count** - Amount of pending jobs.
+    - **Jobs finished in the last two days avg** - Average duration of the jobs processed in the last two days.
+    - **Jobs lasting longer than 10 minutes** - Jobs that are pending for more than 10 minutes.
     - **Jobs failed** - Jobs that failed
     - **Jobs failed count** - Amount of jobs failed.
     - **alert emails** Email to send alert.
     - **alert_threshold** Threshold number.
     """
-    jobs_pending = Job.objects.filter(status=Job.PENDING)
-
-    jobs_finished_in_last_2_days = Job.objects.filter(status=Job.FINISHED, created__gt=datetime.now() - timedelta(days=2))
-    jobs_finished_in_last_2_days_count = len(jobs_finished_in_last_2_days)
-    jobs_finished_in_last_2_days_total_time_in_seconds = 0
-    jobs_finished_in_last_2_days_avg = 0.0
-
-    for job in jobs_finished_in_last_2_days:
-        jobs_finished_in_last_2_days_total_time_in_seconds += (job.updated - job.created).seconds
-
-    if jobs_finished_in_last_2_days_total_time_in_seconds > 0:
-        jobs_finished_in_last_2_days_avg = jobs_finished_in_last_2_days_total_time_in_seconds / jobs_finished_in_last_2_days_count
+    job_metrics = get_job_metrics()
 
-    jobs_lasting_longer_than_10_minutes = []
-
-    for job in jobs_pending:
-        if (job.updated - job.created) > timedelta(minutes=10):
-            jobs_lasting_longer_than_10_minutes.append(job)
-
-    jobs_failed = Job.objects.filter(status=Job.FAILED).order_by("-updated")[:10]
+    jobs_pending = Job.objects.filter(status=Job.PENDING)
+    jobs_lasting_longer_than_10_minutes = jobs_pending.filter(
+        updated__gt=F('created') + JOB_LONG_RUNNING_DURATION
+    ).order_by('-updated')[:100]
+    jobs_failed = list(Job.objects.filter(status=Job.FAILED).order_by("-updated")[:10])
 
     health_settings = HealthSettings.objects.get_or_create(pk=1)[0]
 
     alert_emails = health_settings.emails if health_settings.emails else ""
 
     context = {
+        "job_metrics": job_metrics,
         "jobs_pending": jobs_pending,
-        "jobs_pending_count": len(jobs_pending),
-        "jobs_finished_in_last_2_days_avg": jobs_finished_in_last_2_days_avg,
+        "jobs_pending_count": job_metrics.pending_count,
+        "jobs_finished_in_last_2_days_avg": job_metrics.finished_in_last_2_days_avg,
         "jobs_lasting_longer_than_10_minutes": jobs_lasting_longer_than_10_minutes,
+        "jobs_lasting_longer_than_10_minutes_count": job_metrics.pending_longer_than_10_minutes_count,
         "jobs_failed": jobs_failed,
         "jobs_failed_count": len(jobs_failed),
         "alert_emails": alert_emails,
@@ -70,9 +66,8 @@ def get_health_metrics():
     # Health page update Dec 22, 2017
 
     # Today's jobs
-    jobs_today = Job.objects.filter(created__year=datetime.today().year,
-                                    created__day=datetime.today().day,
-                                    created__month=datetime.today().month)
+    today_start = timezone.localtime(timezone.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    jobs_today = Job.objects.filter(created__gte=today_start).order_by('-created')
     jobs_today_failed = jobs_today.filter(status=Job.FAILED)
     jobs_today_finished = jobs_today.filter(status=Job.FINISHED)
     jobs_today_pending = jobs_today.filter(status=Job.PENDING)
@@ -81,26 +76,38 @@ def get_health_metrics():
     jobs_last_fifty_updated = Job.objects.all().order_by('-updated')[0:50]
     jobs_last_fifty_failed = Job.objects.filter(status=Job.FAILED).order_by('-updated')[0:50]
 
-    jobs_pending_stuck = Job.objects.filter(status=Job.PENDING, created__lt=datetime.now() + timedelta(days=1)).order_by('-updated')[0:100]
-    jobs_running_stuck = Job.objects.filter(status=Job.RUNNING, created__lt=datetime.now() + timedelta(days=1)).order_by('-updated')[0:100]
-
-    context['jobs_today'] = jobs_today
-    context['jobs_today_count'] = len(jobs_today)
-    context['jobs_today_failed'] = jobs_today_failed
-    context['jobs_today_failed_count'] = len(jobs_today_failed)
-    context['jobs_today_finished'] = jobs_today_finished
-    context['jobs_today_finished_count'] = len(jobs_today_finished)
-    context['jobs_today_pending'] = jobs_today_pending
-    context['jobs_today_pending_count'] = len(jobs_today_pending)
+    one_day_ago = timezone.now() - timedelta(days=1)
+    jobs_pending_stuck = Job.objects.filter(status=Job.PENDING, created__lt=one_day_ago)
+    jobs_running_stuck = Job.objects.filter(status=Job.RUNNING, created__lt=one_day_ago)
+    jobs_pending_stuck_count = jobs_pending_stuck.count()
+    jobs_running_stuck_count = jobs_running_stuck.count()
+
+    context['jobs_today'] = jobs_today[:100]
+    context['jobs_today_count'] = job_metrics.today_count
+    context['jobs_today_failed'] = jobs_today_failed[:100]
+    context['jobs_today_failed_count'] = job_metrics.today_failed_count
+    context['jobs_today_finished'] = jobs_today_finished[:100]
+    context['jobs_today_finished_count'] = job_metrics.today_finished_count
+    context['jobs_today_pending'] = jobs_today_pending[:100]
+    context['jobs_today_pending_count'] = job_metrics.today_pending_count
 
     context['jobs_last_fifty'] = jobs_last_fifty
     context['jobs_last_fifty_updated'] = jobs_last_fifty_updated
     context['jobs_last_fifty_failed'] = jobs_last_fifty_failed
-    context['jobs_pending_stuck'] = jobs_pending_stuck
-    context['jobs_pending_stuck_count'] = len(jobs_pending_stuck)
-    context['jobs_running_stuck'] = jobs_running_stuck
-    context['jobs_running_stuck_count'] = len(jobs_running_stuck)
-    context['jobs_all_stuck_count'] = len(jobs_running_stuck) + len(jobs_pending_stuck)
+    context['jobs_pending_stuck'] = jobs_pending_stuck.order_by('-updated')[0:100]
+    context['jobs_pending_stuck_count'] = jobs_pending_stuck_count
+    context['jobs_running_stuck'] = jobs_running_stuck.order_by('-updated')[0:100]
+    context['jobs_running_stuck_count'] = jobs_running_stuck_count
+    context['jobs_all_stuck_count'] = jobs_pending_stuck_count + jobs_running_stuck_count
+
+    context['job_metrics_history'] = JobMetricsSnapshot.objects.all()[:60]
+
+    context['submission_latencies_by_queue'] = get_submission_latencies('queue')
+    context['submission_latencies_by_competition'] = get_submission_latencies('competition')[:20]
+    context['latency_bucket_names'] = [name for name, _ in SUBMISSION_LATENCY_BUCKETS]
+
+    context['request_metrics'] = get_request_metrics(limit=20)
+    context['request_samples'] = RequestSample.objects.defer('profile', 'top_queries')[:20]
 
     return context
 
@@ -186,6 +193,90 @@ def simple_health_csv(request):
 
 
 
+@login_required
+def request_metrics(request):
+    """
+    Returns the request metrics of every view over the last `minutes` (60 by default) as JSON, the views that
+    spent the most time serving requests first.
+    """
+    if not request.user.is_staff:
+        return HttpResponse(status=404)
+    try:
+        minutes = int(request.GET.get('minutes', 60))
+    except ValueError:
+        return HttpResponse(status=400)
+    since = timezone.now() - timedelta(minutes=minutes)
+    return JsonResponse({'views': get_request_metrics(since)})
+
+
+@login_required
+def request_sample(request, pk):
+    if not request.user.is_staff:
+        return HttpResponse(status=404)
+    sample = get_object_or_404(RequestSample, pk=pk)
+    return render(request, "health/request_sample.html", {'sample': sample})
+
+
+def _prometheus_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# (metric name, type, help, function of a TaskMetrics returning the value)
+TASK_PROMETHEUS_METRICS = (
+    ('codalab_task_runs_total', 'counter', 'Task runs.', lambda m: m.run_count),
+    ('codalab_task_failures_total', 'counter', 'Task runs which failed.', lambda m: m.failure_count),
+    ('codalab_task_runtime_seconds_sum', 'counter', 'Total runtime of the task runs.', lambda m: m.total_runtime),
+    ('codalab_task_runtime_seconds_max', 'gauge', 'Longest task run.', lambda m: m.max_runtime),
+    ('codalab_task_queue_wait_seconds_sum', 'counter', 'Total time tasks waited in their queue.',
+     lambda m: m.total_queue_wait),
+    ('codalab_task_queue_wait_seconds_count', 'counter', 'Task runs with a known queue wait.',
+     lambda m: m.queue_wait_count),
+    ('codalab_task_queue_wait_seconds_max', 'gauge', 'Longest time a task waited in its queue.',
+     lambda m: m.max_queue_wait),
+    ('codalab_task_db_queries_total', 'counter', 'Database queries run by the tasks.', lambda m: m.query_count),
+    ('codalab_task_peak_rss_bytes', 'gauge', 'Highest peak resident set size of a worker after the task.',
+     lambda m: m.max_rss_kb * 1024),
+    ('codalab_task_rss_growth_bytes_total', 'counter', 'Growth of the peak resident set size of the workers.',
+     lambda m: m.total_rss_growth_kb * 1024),
+)
+
+
+def task_metrics(request):
+    """
+    Exports the `TaskMetrics` in the Prometheus text format, for staff or with `settings.METRICS_TOKEN` as
+    bearer token.
+    """
+    token = settings.METRICS_TOKEN
+    authorized = token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), 'Bearer {}'.format(token))
+    if not authorized and not request.user.is_staff:
+        return HttpResponse(status=404)
+
+    metrics = list(TaskMetrics.objects.all())
+    lines = []
+    for name, metric_type, description, get_value in TASK_PROMETHEUS_METRICS:
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+        for task in metrics:
+            lines.append('{}{{task="{}",queue="{}"}} {}'.format(
+                name,
+                _prometheus_label(task.task_name),
+                _prometheus_label(task.queue),
+                get_value(task),
+            ))
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required
+def task_profile(request, task_name):
+    """Returns the cProfile statistics of the latest profiled run of `task_name`."""
+    if not request.user.is_staff:
+        return HttpResponse(status=404)
+    profile = TaskProfile.objects.filter(task_name=task_name).first()
+    if profile is None:
+        return HttpResponse(status=404)
+    return HttpResponse(profile.profile, content_type='text/plain; charset=utf-8')
+
+
 @login_required
 def storage_analytics(request):
     if not request.user.is_staff:
@@ -210,13 +301,13 @@ def check_thresholds(request):
     Function that checks if the amount of pending jobs is greater than threshold number.
     It will send an email if the number exceeded.
     """
-    metrics = get_health_metrics()
+    job_metrics = get_job_metrics()
     health_settings = HealthSettings.objects.get_or_create(pk=1)[0]
     email_string = health_settings.emails
     if email_string:
         emails = [s.strip() for s in email_string.split(",")]
 
-        if metrics["jobs_pending_count"] > health_settings.threshold:
+        if job_metrics.pending_count > health_settings.threshold:
             send_mail(
                 "Codalab Warning: Jobs pending > %s!" % health_settings.threshold,
                 "There are > %s jobs pending for processing right now" % health_settings.threshold,
@@ -224,7 +315,7 @@ def check_thresholds(request):
                 emails
             )
 
-        if metrics["jobs_lasting_longer_than_10_minutes"] and len(metrics["jobs_lasting_longer_than_10_minutes"]) > 10:
+        if job_metrics.pending_longer_than_10_minutes_count > 10:
             send_mail("Codalab Warning: Many jobs taking > 10 minutes!", "There are many jobs taking longer than 10 minutes to process", settings.DEFAULT_FROM_EMAIL, emails)
 
     return HttpResponse()
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Date of creation'),
+        ),
+        migrations.AlterField(
+            model_name='job',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Date of last update'),
+        ),
+    ]
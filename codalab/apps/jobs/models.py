@@ -6,6 +6,7 @@ import logging
 import threading
 import traceback
 
+from apps.jobs.notifications import job_channel, publish_status_on_commit
 from codalabtools.azure_extensions import AzureServiceBusQueue
 from django.conf import settings
 from django.db import (models,
@@ -98,8 +99,8 @@ class Job(models.Model):
     # Reverse map to get integer code from friendly code name
     STATUS_BY_CODE_NAME = { v['code_name']: k  for (k, v) in STATUS_BY_CODE.items() }
 
-    created = models.DateTimeField('Date of creation', auto_now_add=True)
-    updated = models.DateTimeField('Date of last update', auto_now=True)
+    created = models.DateTimeField('Date of creation', auto_now_add=True, db_index=True)
+    updated = models.DateTimeField('Date of last update', auto_now=True, db_index=True)
     status = models.PositiveIntegerField('Status', default=PENDING, db_index=True)
     task_type = models.CharField('Task type', max_length=256)
     task_args_json = models.TextField('JSON-encoded task arguments', blank=True)
@@ -189,6 +190,10 @@ def update_job_status_task(job_id, args):
             if info_json is not None:
                 job.task_info_json = info_json
             job.save()
+            publish_status_on_commit(job_channel(job_id), {
+                'status': job.get_status_code_name(),
+                'info': job.get_task_info(),
+            })
             logger.info("Completed update for job id=%s. New status=%s.", job_id, job.status)
         else:
             logger.warning("Skipping update for job id=%s: invalid transition %s -> %s.", job_id, job.status, status)
@@ -0,0 +1,95 @@
+"""
+Status notifications pushed to waiting clients through the shared cache.
+
+Memcached has no pub-sub, so a channel is a versioned cache entry: publishers bump the version and store the
+latest message, waiting clients long-poll the cache (never the database) until the version differs from the
+last one they have seen.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+# How long a channel is kept after its last message
+STATUS_CHANNEL_TIMEOUT = 60 * 60
+# Delay between two cache reads of a waiting client
+STATUS_WAIT_INTERVAL = 0.5
+
+
+def job_channel(job_id):
+    return 'job:{}'.format(job_id)
+
+
+def submission_channel(submission_id):
+    return 'submission:{}'.format(submission_id)
+
+
+def _message_key(channel):
+    return 'status-channel:{}:message'.format(channel)
+
+
+def _version_key(channel):
+    return 'status-channel:{}:version'.format(channel)
+
+
+def publish_status(channel, message):
+    """
+    Publishes `message` on `channel`, replacing the previous one.
+
+    :param channel: Channel name, see `job_channel` and `submission_channel`.
+    :param message: JSON serializable dictionary, a 'version' key is added to it.
+    :return: The version of the published message.
+    """
+    version_key = _version_key(channel)
+    cache.add(version_key, 0, STATUS_CHANNEL_TIMEOUT)
+    try:
+        version = cache.incr(version_key)
+    except ValueError:
+        # The version was evicted between add and incr, waiting clients see any new version as a change
+        version = 1
+        cache.set(version_key, version, STATUS_CHANNEL_TIMEOUT)
+    message = dict(message, version=version)
+    cache.set(_message_key(channel), message, STATUS_CHANNEL_TIMEOUT)
+    return version
+
+
+def publish_status_on_commit(channel, message):
+    """Publishes `message` once the current transaction commits, so clients never see uncommitted changes."""
+    transaction.on_commit(lambda: publish_status(channel, message))
+
+
+def get_status(channel):
+    """:return: The latest message published on `channel`, or None."""
+    return cache.get(_message_key(channel))
+
+
+def get_status_version(channel):
+    """:return: The version of the latest message published on `channel`, or 0 if there is none."""
+    message = get_status(channel)
+    return message['version'] if message else 0
+
+
+def wait_for_status(channel, since=0, timeout=None):
+    """
+    Blocks until a message with a version other than `since` is published on `channel`.
+
+    The database connection is closed before waiting, so waiting clients don't hold one each.
+
+    :param channel: Channel name.
+    :param since: Version of the last message the client has seen.
+    :param timeout: Seconds to wait for, defaults to `settings.STATUS_WAIT_TIMEOUT`.
+    :return: The new message, or None if nothing was published before the timeout.
+    """
+    if timeout is None:
+        timeout = settings.STATUS_WAIT_TIMEOUT
+    if not connection.in_atomic_block:
+        connection.close()
+    deadline = time.time() + timeout
+    while True:
+        message = get_status(channel)
+        if message is not None and message['version'] != since:
+            return message
+        if time.time() >= deadline:
+            return None
+        time.sleep(STATUS_WAIT_INTERVAL)
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 12:00
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('newsletter', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newslettersubscription',
+            name='sync_batch_id',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+    ]
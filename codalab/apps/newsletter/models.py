@@ -1,19 +1,27 @@
 import hashlib
+import io
 import json
 import logging
-import requests
+import tarfile
 
-from django.db import models
+import requests
+from django.db import models, transaction
 from django.conf import settings
 
 logger = logging.getLogger(__name__)
 
+# Maximum amount of subscriptions sent to Mailchimp in one batch operation
+MAILCHIMP_BATCH_SIZE = 500
+
 
 class NewsletterSubscription(models.Model):
     email = models.EmailField(null=False, blank=False, unique=True)
     date_added = models.DateTimeField(auto_now_add=True)
     subscription_active = models.BooleanField(default=False)
+    # The subscription changed and still has to be pushed to Mailchimp by `sync_newsletter_subscriptions`
     needs_retry = models.BooleanField(default=False)
+    # Mailchimp batch operation currently pushing this subscription
+    sync_batch_id = models.CharField(max_length=64, null=True, blank=True, db_index=True)
 
     def __str__(self):
         return self.email
@@ -24,78 +32,144 @@ class NewsletterSubscription(models.Model):
         return user_hash
 
     def subscribe(self):
+        """Marks the subscription active, Mailchimp is updated by the next `sync_newsletter_subscriptions`."""
         self.subscription_active = True
+        self.needs_retry = True
         self.save()
-        if not all([settings.MAILCHIMP_MEMBERS_ENDPOINT_NEWSLETTER, settings.MAILCHIMP_API_KEY]):
-            self.needs_retry = True
-            self.save()
-            return
-
-        data = {
-            "email_address": self.email,
-            "status": "subscribed",
-        }
-
-        try:
-            response = requests.patch(
-                settings.MAILCHIMP_MEMBERS_ENDPOINT_NEWSLETTER + '/' + self.get_user_hash,
-                auth=("", settings.MAILCHIMP_API_KEY),
-                data=json.dumps(data)
-            )
-
-            if response.ok:
-                self.needs_retry = False
-                self.save()
-
-            elif 'The requested resource could not be found' in response.json().get('detail'):
-                response = requests.post(
-                    settings.MAILCHIMP_MEMBERS_ENDPOINT_NEWSLETTER,
-                    auth=("", settings.MAILCHIMP_API_KEY),
-                    data=json.dumps(data)
-                )
-
-                self.needs_retry = not response.ok
-                self.save()
-            else:
-                self.needs_retry = True
-                self.save()
-
-        except requests.exceptions.RequestException:
-            self.needs_retry = True
-            self.save()
 
     def unsubscribe(self):
+        """
+        Marks the subscription inactive, it is deleted once the next `sync_newsletter_subscriptions` removed it
+        from Mailchimp.
+        """
         self.subscription_active = False
+        self.needs_retry = True
         self.save()
-        if not all([settings.MAILCHIMP_MEMBERS_ENDPOINT_NEWSLETTER, settings.MAILCHIMP_API_KEY]):
-            self.needs_retry = True
-            self.save()
-            return
 
-        data = {
-            "status": "unsubscribed",
+    def get_operation_id(self):
+        # The status is part of the id so a result can be matched against what was sent
+        return "{}:{}".format(self.pk, "subscribed" if self.subscription_active else "unsubscribed")
+
+    def get_batch_operation(self):
+        status = "subscribed" if self.subscription_active else "unsubscribed"
+        return {
+            "method": "PUT",
+            "path": "/lists/{}/members/{}".format(settings.MAILCHIMP_EMAIL_LIST_ID_NEWSLETTER, self.get_user_hash),
+            "operation_id": self.get_operation_id(),
+            "body": json.dumps({
+                "email_address": self.email,
+                "status": status,
+                "status_if_new": status,
+            }),
         }
 
-        try:
-            response = requests.patch(
-                settings.MAILCHIMP_MEMBERS_ENDPOINT_NEWSLETTER + '/' + self.get_user_hash,
-                auth=("", settings.MAILCHIMP_API_KEY),
-                data=json.dumps(data)
-            )
-
-            if response.ok:
-                self.delete()
-            else:
-                self.needs_retry = True
-                self.save()
-
-        except requests.exceptions.RequestException as e:
-            self.needs_retry = True
-            self.save()
-            logger.error(e)
-
-    def retry(self):
-        if self.subscription_active:
-            self.subscribe()
-        else:
-            self.unsubscribe()
+
+def _mailchimp_is_configured():
+    return all([
+        settings.MAILCHIMP_BATCHES_ENDPOINT,
+        settings.MAILCHIMP_EMAIL_LIST_ID_NEWSLETTER,
+        settings.MAILCHIMP_API_KEY,
+    ])
+
+
+def _read_batch_results(response_body_url):
+    """
+    Downloads the results of a finished Mailchimp batch operation, a gzipped tar archive of JSON files.
+
+    :return: Dictionary mapping operation ids to their HTTP status code.
+    """
+    response = requests.get(response_body_url, timeout=60)
+    response.raise_for_status()
+    results = {}
+    with tarfile.open(fileobj=io.BytesIO(response.content), mode='r:gz') as archive:
+        for member in archive.getmembers():
+            if not member.isfile() or not member.name.endswith('.json'):
+                continue
+            for result in json.loads(archive.extractfile(member).read().decode('utf-8')):
+                results[result['operation_id']] = result['status_code']
+    return results
+
+
+def reconcile_newsletter_batch(batch_id):
+    """
+    Applies the results of a Mailchimp batch operation once it finished. Successfully unsubscribed subscriptions
+    are deleted, failed ones are sent again by the next sync.
+
+    :return: True if the batch finished and was reconciled.
+    """
+    response = requests.get(
+        '{}/{}'.format(settings.MAILCHIMP_BATCHES_ENDPOINT, batch_id),
+        auth=("", settings.MAILCHIMP_API_KEY),
+        timeout=30,
+    )
+    response.raise_for_status()
+    batch = response.json()
+    if batch.get('status') != 'finished':
+        return False
+
+    results = _read_batch_results(batch['response_body_url']) if batch.get('response_body_url') else {}
+
+    with transaction.atomic():
+        subscriptions = NewsletterSubscription.objects.select_for_update().filter(sync_batch_id=batch_id)
+        synced_ids = []
+        unsubscribed_ids = []
+        for subscription in subscriptions:
+            status_code = results.get(subscription.get_operation_id())
+            # Subscriptions changed since the batch was sent have a different operation id and stay pending
+            if status_code is not None and 200 <= status_code < 300:
+                if subscription.subscription_active:
+                    synced_ids.append(subscription.pk)
+                else:
+                    unsubscribed_ids.append(subscription.pk)
+            elif status_code is not None:
+                logger.info("Mailchimp :: Failed to sync {} (status={})".format(subscription.email, status_code))
+        NewsletterSubscription.objects.filter(pk__in=unsubscribed_ids).delete()
+        NewsletterSubscription.objects.filter(pk__in=synced_ids).update(needs_retry=False)
+        NewsletterSubscription.objects.filter(sync_batch_id=batch_id).update(sync_batch_id=None)
+    logger.info("Mailchimp :: Batch {} synced {} subscriptions and removed {}".format(
+        batch_id, len(synced_ids), len(unsubscribed_ids)))
+    return True
+
+
+def start_newsletter_batch(batch_size=MAILCHIMP_BATCH_SIZE):
+    """
+    Sends the pending subscription changes to Mailchimp as one batch operation.
+
+    :return: The id of the Mailchimp batch, or None if there was nothing to send.
+    """
+    subscriptions = list(
+        NewsletterSubscription.objects.filter(needs_retry=True, sync_batch_id__isnull=True).order_by('pk')[:batch_size]
+    )
+    if not subscriptions:
+        return None
+
+    response = requests.post(
+        settings.MAILCHIMP_BATCHES_ENDPOINT,
+        auth=("", settings.MAILCHIMP_API_KEY),
+        data=json.dumps({"operations": [subscription.get_batch_operation() for subscription in subscriptions]}),
+        timeout=30,
+    )
+    response.raise_for_status()
+    batch_id = response.json()['id']
+    NewsletterSubscription.objects.filter(pk__in=[subscription.pk for subscription in subscriptions]).update(
+        sync_batch_id=batch_id
+    )
+    logger.info("Mailchimp :: Started batch {} for {} subscriptions".format(batch_id, len(subscriptions)))
+    return batch_id
+
+
+def sync_newsletter_subscriptions():
+    """Reconciles the Mailchimp batches in flight, then sends the subscriptions that changed since."""
+    if not _mailchimp_is_configured():
+        logger.info("Settings not found for Mailchimp endpoint and API. Please"
+                    "add these to your Django settings file.")
+        return
+
+    try:
+        batch_ids = NewsletterSubscription.objects.filter(sync_batch_id__isnull=False).order_by().values_list(
+            'sync_batch_id', flat=True).distinct()
+        for batch_id in list(batch_ids):
+            reconcile_newsletter_batch(batch_id)
+        start_newsletter_batch()
+    except (requests.exceptions.RequestException, tarfile.TarError, ValueError, KeyError) as e:
+        logger.info("Mailchimp could not be synced at this time, it will be retried on the next run. {}".format(e))
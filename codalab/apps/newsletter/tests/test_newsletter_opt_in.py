@@ -1,144 +1,209 @@
-import mock
-import requests
+import io
+import json
+import tarfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.contrib.auth import get_user_model
 
-from apps.newsletter.models import NewsletterSubscription
-from django.conf import settings
-
-from apps.newsletter.tasks import retry_mailing_list
+from apps.newsletter.models import NewsletterSubscription, sync_newsletter_subscriptions
 
 User = get_user_model()
 
 
-class CustomResponse:
-    def __init__(self, status=200, detail=None):
-        self.status = status
-        self.detail = 'The requested resource could not be found' if detail is None else detail
-        self.ok = str(self.status).startswith('2')
-
-    def json(self):
-        return {'detail': self.detail}
+class FakeMailchimp(object):
+    """Tiny stand in for the Mailchimp batch operations API, served on a local port."""
+
+    def __init__(self):
+        self.batches = {}
+        self.requests = []
+        self.finished = True
+        self.failing_emails = set()
+        self.server_error = False
+
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _respond(self, status, body, content_type='application/json'):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                data = json.loads(self.rfile.read(length).decode('utf-8'))
+                fake.requests.append(('POST', self.path, data))
+                if fake.server_error:
+                    return self._respond(500, b'{}')
+                batch_id = 'batch-{}'.format(len(fake.batches) + 1)
+                fake.batches[batch_id] = data['operations']
+                self._respond(200, json.dumps({'id': batch_id, 'status': 'pending'}).encode('utf-8'))
+
+            def do_GET(self):
+                fake.requests.append(('GET', self.path, None))
+                if fake.server_error:
+                    return self._respond(500, b'{}')
+                if self.path.startswith('/3.0/batches/'):
+                    batch_id = self.path.rsplit('/', 1)[1]
+                    self._respond(200, json.dumps({
+                        'id': batch_id,
+                        'status': 'finished' if fake.finished else 'started',
+                        'response_body_url': '{}/results/{}.tar.gz'.format(fake.url, batch_id),
+                    }).encode('utf-8'))
+                elif self.path.startswith('/results/'):
+                    batch_id = self.path.rsplit('/', 1)[1][:-len('.tar.gz')]
+                    self._respond(200, fake.build_results(batch_id), 'application/x-gzip')
+                else:
+                    self._respond(404, b'{}')
+
+        self.server = HTTPServer(('127.0.0.1', 0), Handler)
+        self.url = 'http://127.0.0.1:{}'.format(self.server.server_port)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def build_results(self, batch_id):
+        results = []
+        for operation in self.batches[batch_id]:
+            email = json.loads(operation['body'])['email_address']
+            results.append({
+                'status_code': 400 if email in self.failing_emails else 200,
+                'operation_id': operation['operation_id'],
+                'response': '{}',
+            })
+        content = json.dumps(results).encode('utf-8')
+        archive_file = io.BytesIO()
+        with tarfile.open(fileobj=archive_file, mode='w:gz') as archive:
+            info = tarfile.TarInfo('{}.json'.format(batch_id))
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+        return archive_file.getvalue()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
 
 
 class NewsletterOptIn(TestCase):
     def setUp(self):
+        self.mailchimp = FakeMailchimp()
+        self.settings_override = override_settings(
+            MAILCHIMP_API_KEY='doesnt-matter',
+            MAILCHIMP_EMAIL_LIST_ID_NEWSLETTER='newsletter',
+            MAILCHIMP_BATCHES_ENDPOINT='{}/3.0/batches'.format(self.mailchimp.url),
+        )
+        self.settings_override.enable()
         self.user = User(email='test@user.com', username='testuser', is_active=True)
-        self.other_user = User(email='other@user.com', username='otheruser')
-        self.newsletter_subscription = NewsletterSubscription(email='test@user.com')
-        settings.MAILCHIMP_MEMBERS_ENDPOINT_NEWSLETTER = 'doesnt-matter'
-        settings.MAILCHIMP_API_KEY = 'doesnt-matter'
+        self.other_user = User(email='other@user.com', username='otheruser', is_active=True)
 
     def tearDown(self):
-        settings.MAILCHIMP_MEMBERS_ENDPOINT_NEWSLETTER = None
-        settings.MAILCHIMP_API_KEY = None
-
-    def mock_save_user(self, post_status_code, patch_status_code, user=None, response_detail=None, exception=False):
-        user = self.user if user is None else user
-        post_response = CustomResponse(status=post_status_code)
-        patch_response = CustomResponse(status=patch_status_code, detail=response_detail)
-
-        with mock.patch('apps.newsletter.models.requests.post') as mock_post:
-            mock_post.return_value = post_response
-            if exception:
-                mock_post.side_effect = requests.exceptions.RequestException
-            with mock.patch('apps.newsletter.models.requests.patch') as mock_patch:
-                mock_patch.return_value = patch_response
-                if exception:
-                    mock_patch.side_effect = requests.exceptions.RequestException
-                user.save()
-                return mock_post, mock_patch
-
-    def mock_retry_mailing_list(self, get_status_code):
-        get_response = CustomResponse(status=get_status_code)
-        with mock.patch('apps.newsletter.models.NewsletterSubscription.subscribe') as mock_subscribe:
-            with mock.patch('apps.newsletter.models.NewsletterSubscription.unsubscribe') as mock_unsubscribe:
-                with mock.patch('apps.newsletter.tasks.requests.get') as mock_get:
-                    mock_get.return_value = get_response
-                    retry_mailing_list()
-                    return mock_subscribe, mock_unsubscribe
-
-    def test_user_creation_with_opt_in_creates_newsletter_subscription(self):
+        self.settings_override.disable()
+        self.mailchimp.stop()
+
+    def test_user_creation_with_opt_in_records_subscription_without_calling_mailchimp(self):
         self.user.newsletter_opt_in = True
-        mock_post, mock_patch = self.mock_save_user(patch_status_code=400, post_status_code=200)
-        assert mock_post.called
-        assert mock_patch.called
-        assert NewsletterSubscription.objects.filter(email=self.user.email).exists()
+        self.user.save()
+        assert self.mailchimp.requests == []
         newsletter_user = NewsletterSubscription.objects.get(email=self.user.email)
-        assert not newsletter_user.needs_retry
+        assert newsletter_user.needs_retry
         assert newsletter_user.subscription_active
 
     def test_user_creation_without_opt_in_does_not_create_newsletter_subscription(self):
         self.user.newsletter_opt_in = False
-        self.mock_save_user(patch_status_code=200, post_status_code=200)
+        self.user.save()
         assert User.objects.filter(email=self.user.email).exists()
         assert not NewsletterSubscription.objects.filter(email=self.user.email).exists()
 
-    def test_user_unsubscribed_from_mailing_list(self):
-        # Subscribe the user
-        self.user.newsletter_opt_in = True
-        self.mock_save_user(patch_status_code=400, post_status_code=200)
-        assert NewsletterSubscription.objects.filter(email=self.user.email).exists()
-        # Unsubscribe the user
-        self.user.newsletter_opt_in = False
-        self.mock_save_user(patch_status_code=200, post_status_code=400)
-        assert not NewsletterSubscription.objects.filter(email=self.user.email).exists()
-
     def test_create_user_newsletter_is_active_false(self):
         self.user.newsletter_opt_in = True
         self.user.is_active = False
-        self.mock_save_user(patch_status_code=400, post_status_code=400)
+        self.user.save()
         assert not NewsletterSubscription.objects.filter(email=self.user.email).exists()
 
-    def test_retry_mailing_list(self):
-        self.newsletter_subscription.subscription_active = False
-        self.newsletter_subscription.needs_retry = True
-        self.newsletter_subscription.save()
-        mock_subscribe, mock_unsubscribe = self.mock_retry_mailing_list(get_status_code=200)
-        assert not mock_subscribe.called
-        assert mock_unsubscribe.called
-
-        self.newsletter_subscription.subscription_active = True
-        self.newsletter_subscription.needs_retry = True
-        self.newsletter_subscription.save()
-        mock_subscribe, mock_unsubscribe = self.mock_retry_mailing_list(get_status_code=200)
-        assert mock_subscribe.called
-        assert not mock_unsubscribe.called
-
-    def test_mailing_list_needs_retry_on_patch_fail_with_empty_detail(self):
+    def test_sync_sends_pending_subscriptions_in_one_batch(self):
+        for user in (self.user, self.other_user):
+            user.newsletter_opt_in = True
+            user.save()
+        self.mailchimp.finished = False
+
+        sync_newsletter_subscriptions()
+
+        posts = [request for request in self.mailchimp.requests if request[0] == 'POST']
+        assert len(posts) == 1
+        assert len(posts[0][2]['operations']) == 2
+        assert NewsletterSubscription.objects.filter(sync_batch_id='batch-1').count() == 2
+
+    def test_sync_reconciles_finished_batch(self):
         self.user.newsletter_opt_in = True
-        mock_post, mock_patch = self.mock_save_user(patch_status_code=400, post_status_code=400, response_detail='')
-        assert mock_patch.called
-        assert not mock_post.called
-        assert NewsletterSubscription.objects.filter(email=self.user.email).exists()
+        self.user.save()
+        self.other_user.newsletter_opt_in = True
+        self.other_user.save()
+        self.mailchimp.failing_emails.add(self.other_user.email)
+        sync_newsletter_subscriptions()
+
+        sync_newsletter_subscriptions()
+
         newsletter_user = NewsletterSubscription.objects.get(email=self.user.email)
-        assert newsletter_user.needs_retry
-        assert newsletter_user.subscription_active
+        assert not newsletter_user.needs_retry
+        assert newsletter_user.sync_batch_id is None
+        # Failed subscriptions are sent again in a new batch
+        failed_user = NewsletterSubscription.objects.get(email=self.other_user.email)
+        assert failed_user.needs_retry
+        assert failed_user.sync_batch_id == 'batch-2'
 
-    def test_mailing_list_needs_retry_on_patch_fail_with_detail(self):
+    def test_user_unsubscribed_from_mailing_list(self):
+        # Subscribe the user
         self.user.newsletter_opt_in = True
-        mock_post, mock_patch = self.mock_save_user(patch_status_code=400, post_status_code=400)
-        assert mock_patch.called
-        assert mock_post.called
+        self.user.save()
+        sync_newsletter_subscriptions()
+        sync_newsletter_subscriptions()
         assert NewsletterSubscription.objects.filter(email=self.user.email).exists()
-        newsletter_user = NewsletterSubscription.objects.get(email=self.user.email)
-        assert newsletter_user.needs_retry
-        assert newsletter_user.subscription_active
+        # Unsubscribe the user
+        self.user.newsletter_opt_in = False
+        self.user.save()
+        assert not NewsletterSubscription.objects.get(email=self.user.email).subscription_active
+        sync_newsletter_subscriptions()
+        sync_newsletter_subscriptions()
+        assert not NewsletterSubscription.objects.filter(email=self.user.email).exists()
 
-    def test_mailing_list_needs_retry_on_unsubscribe_patch_fail(self):
-        self.newsletter_subscription.save()
-        assert NewsletterSubscription.objects.filter(email=self.user.email).exists()
+    def test_subscription_changed_during_batch_stays_pending(self):
+        self.user.newsletter_opt_in = True
+        self.user.save()
+        sync_newsletter_subscriptions()
         self.user.newsletter_opt_in = False
-        mock_post, mock_patch = self.mock_save_user(patch_status_code=400, post_status_code=400)
-        assert mock_patch.called
-        assert not mock_post.called
-        assert NewsletterSubscription.objects.filter(email=self.user.email).exists()
+        self.user.save()
+
+        # batch-1 reports the subscribe as successful, the unsubscribe has to be sent on its own
+        sync_newsletter_subscriptions()
+
         newsletter_user = NewsletterSubscription.objects.get(email=self.user.email)
         assert newsletter_user.needs_retry
         assert not newsletter_user.subscription_active
 
-    def test_mailing_list_needs_retry_on_request_error(self):
+    def test_unfinished_batch_is_left_alone(self):
         self.user.newsletter_opt_in = True
-        self.mock_save_user(patch_status_code=200, post_status_code=200, exception=True)
-        assert NewsletterSubscription.objects.filter(email=self.user.email).exists()
-        assert NewsletterSubscription.objects.get(email=self.user.email).needs_retry
+        self.user.save()
+        sync_newsletter_subscriptions()
+        self.mailchimp.finished = False
+
+        sync_newsletter_subscriptions()
+
+        assert NewsletterSubscription.objects.get(email=self.user.email).sync_batch_id == 'batch-1'
+
+    def test_mailing_list_stays_pending_when_mailchimp_fails(self):
+        self.user.newsletter_opt_in = True
+        self.user.save()
+        self.mailchimp.server_error = True
+
+        sync_newsletter_subscriptions()
+
+        newsletter_user = NewsletterSubscription.objects.get(email=self.user.email)
+        assert newsletter_user.needs_retry
+        assert newsletter_user.sync_batch_id is None
@@ -2,9 +2,9 @@ from django.contrib import messages
 from django.contrib.sites.models import Site
 from django.http import Http404
 from django.shortcuts import render
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 
+from apps.emails.models import queue_email
 from codalab import settings
 from .models import NewsletterSubscription
 from .forms import NewsletterSubscriptionSignUpForm, NewsletterSubscriptionUnsubscribeForm
@@ -18,9 +18,7 @@ def _send_mail(context, from_email=None, html_file=None, text_file=None, subject
     text = render_to_string(text_file, context)
     html = render_to_string(html_file, context)
 
-    message = EmailMultiAlternatives(subject, text, from_email, [to_email])
-    message.attach_alternative(html, 'text/html')
-    message.send()
+    queue_email(subject, text, [to_email], html_body=html, from_email=from_email)
 
 
 def newsletter_signup(request):
@@ -31,7 +29,8 @@ def newsletter_signup(request):
 
     if form.is_valid():
         instance = form.save(commit=False)
-        if NewsletterSubscription.objects.filter(email=instance.email).exists():
+        subscription = NewsletterSubscription.objects.filter(email=instance.email).first()
+        if subscription and subscription.subscription_active:
             messages.warning(request, 'This email already signed up for newsletters',
                              'alert alert-warning alert-dismissible')
         else:
@@ -40,7 +39,7 @@ def newsletter_signup(request):
                 "status": "subscribed",
             }
 
-            NewsletterSubscription.objects.create(email=instance.email).subscribe()
+            (subscription or NewsletterSubscription.objects.create(email=instance.email)).subscribe()
 
             messages.success(request, 'You have been added to the Codalab newsletter',
                              'alert alert-success alert-dismissible')
@@ -72,12 +71,13 @@ def newsletter_unsubscribe(request):
 
     if form.is_valid():
         email = form.cleaned_data['email']
-        if NewsletterSubscription.objects.filter(email=email).exists():
+        subscription = NewsletterSubscription.objects.filter(email=email, subscription_active=True).first()
+        if subscription:
             data = {
                 "status": "unsubscribed",
             }
 
-            NewsletterSubscription.objects.get(email=email).unsubscribe()
+            subscription.unsubscribe()
 
             messages.success(request, 'You have been removed from the Codalab newsletter',
                              'alert alert-success alert-dismissible')
@@ -8,7 +8,7 @@ from tinymce.widgets import TinyMCE
 from django.utils import timezone
 from apps.web.models import Competition
 from apps.authenz.models import ClUser
-from apps.teams.models import TeamMembership, Team, TeamStatus, TeamMembershipStatus
+from apps.teams.models import TeamMembership, Team, TeamStatus, TeamMembershipStatus, import_organizer_teams
 from django.utils.safestring import mark_safe
 import os
 import logging
@@ -131,7 +131,7 @@ class OrganizerTeamForm(forms.ModelForm):
     def save(self, commit=True):
         self.instance.creator = self.creator
         self.instance.competition = self.competition
-        self.instance.status = TeamStatus.objects.get(codename=TeamStatus.APPROVED)
+        self.instance.status = TeamStatus.objects.get_cached(TeamStatus.APPROVED)
 
         # We need to call save before adding members
         self.instance.save()
@@ -157,7 +157,7 @@ class OrganizerTeamForm(forms.ModelForm):
                         is_request=False,
                         start_date=timezone.now(),
                         message="Organizer Created",
-                        status=TeamMembershipStatus.objects.get(codename=TeamMembershipStatus.APPROVED),
+                        status=TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.APPROVED),
                         reason="Organizer Created Team"
                     )
                     logger.info("Created new membership: {0} for user: {1} on team: {2}".format(new_team_membership, user, self.instance))
@@ -181,7 +181,7 @@ class OrganizerTeamsCSVForm(forms.Form):
             csv_team_list = [line.rstrip().decode('utf-8') for line in self.cleaned_data.get('csv_file')]
             for string_line in csv_team_list:
                 if string_line == '' or string_line == ' ':
-                    logger.log("String read from CSV is not readable.")
+                    logger.info("String read from CSV is not readable.")
                 else:
                     # String line is the literal line from a file.
                     # It's split on comma's, and every string from the split is stripped and turned into a list
@@ -195,42 +195,13 @@ class OrganizerTeamsCSVForm(forms.Form):
         cleaned_data = super(OrganizerTeamsCSVForm, self).clean()
         return cleaned_data
 
+    def get_teams(self):
+        """:return: List of (team name, list of member usernames or emails), in the order of the file."""
+        return list((self.cleaned_data.get('csv_file') or {}).items())
+
     def save(self):
-        if self.cleaned_data.get('csv_file'):
-            for team_name, team_member_list in self.cleaned_data.get('csv_file').items():
-                existing_team = Team.objects.filter(name=team_name, competition=self.competition).first()
-                if not existing_team:
-                    new_team = Team.objects.create(
-                        name=team_name,
-                        competition=self.competition,
-                        description=team_name,
-                        allow_requests=False,
-                        creator=self.creator,
-                        created_at=timezone.now(),
-                        status=TeamStatus.objects.get(codename=TeamStatus.APPROVED),
-                        reason="Organizer Created Team"
-                    )
-                    logger.info("Created new team: {}".format(new_team))
-                    existing_team = new_team
-                else:
-                    logger.info("Using existing team: {}".format(existing_team))
-                user_list = ClUser.objects.filter(Q(username__in=team_member_list) | Q(email__in=team_member_list))
-                for user in existing_team.members.all():
-                    if user not in user_list:
-                        logger.info("Deleting membership for user: {}".format(user))
-                        TeamMembership.objects.get(user=user, team=existing_team).delete()
-                for user in user_list:
-                    if user not in existing_team.members.all():
-                        TeamMembership.objects.create(
-                            user=user,
-                            team=existing_team,
-                            is_invitation=False,
-                            is_request=False,
-                            start_date=timezone.now(),
-                            message="Organizer Created",
-                            status=TeamMembershipStatus.objects.get(codename=TeamMembershipStatus.APPROVED),
-                            reason="Organizer Created Team"
-                        )
-                        logger.info("Created new membership for user: {0} on team: {1}".format(user, existing_team))
-                    else:
-                        logger.info("User already exists on team.")
+        """Imports the teams of the file, :return: the report of `import_organizer_teams`."""
+        teams = self.get_teams()
+        if not teams:
+            return []
+        return import_organizer_teams(self.competition, self.creator, teams)
@@ -1,12 +1,19 @@
 import apps.web as web
 import logging
 import os
+import threading
+import time
+from apps.web.managers import StatusManager
 from apps.web.utils import PublicStorage, get_object_base_url, delete_key_from_storage
 from datetime import datetime, timedelta
 from django import template
 from django.conf import settings
-from django.db import models
-from django.db.models.signals import post_delete
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.signals import request_finished, request_started
+from django.db import models, transaction
+from django.db.models import Exists, OuterRef, Q, Subquery, Value
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils.functional import cached_property
 from django.utils.timezone import now
@@ -15,11 +22,20 @@ register = template.Library()
 User = settings.AUTH_USER_MODEL
 logger = logging.getLogger(__name__)
 
+# Rows inserted or deleted per query by import_organizer_teams
+TEAM_IMPORT_BATCH_SIZE = 500
+# Seconds a team resolved by get_user_team is kept in the shared cache. Team and membership changes invalidate it
+# right away, the TTL only bounds how late a membership starting or ending with time is noticed.
+USER_TEAM_CACHE_TTL = 60
+
+# Teams resolved during the current request, by (user id, competition id), None outside of requests
+_request_teams = threading.local()
+
 
 def get_competition_teams(competition):
     team_list=Team.objects.filter(
         competition=competition,
-        status=TeamStatus.objects.get(codename="approved"),
+        status=TeamStatus.objects.get_cached("approved"),
     ).all()
     return team_list
 
@@ -27,7 +43,7 @@ def get_competition_teams(competition):
 def get_competition_pending_teams(competition):
     team_list=Team.objects.filter(
         competition=competition,
-        status=TeamStatus.objects.get(codename="pending"),
+        status=TeamStatus.objects.get_cached("pending"),
     ).select_related("status").all()
 
     return team_list
@@ -37,7 +53,7 @@ def get_team_pending_membership(team):
     requests = TeamMembership.objects.filter(
         team=team,
         is_request=True,
-        status=TeamMembershipStatus.objects.get(codename="pending"),
+        status=TeamMembershipStatus.objects.get_cached("pending"),
     ).select_related("user").all()
     return requests
 
@@ -45,7 +61,7 @@ def get_team_pending_membership(team):
 def get_competition_deleted_teams(competition):
     team_list=Team.objects.filter(
         competition=competition,
-        status=TeamStatus.objects.get(codename="deleted"),
+        status=TeamStatus.objects.get_cached("deleted"),
     ).all()
 
     return team_list
@@ -54,7 +70,7 @@ def get_competition_deleted_teams(competition):
 def get_competition_user_teams(competition,user):
     team_list=Team.objects.filter(
         competition=competition,
-        status=TeamStatus.objects.get(codename="approved"),
+        status=TeamStatus.objects.get_cached("approved"),
         creator=user.user,
     ).all()
     if len(team_list)==0:
@@ -67,7 +83,7 @@ def get_competition_user_teams(competition,user):
 def get_competition_user_pending_teams(competition,user):
     team_list=Team.objects.filter(
         competition=competition,
-        status=TeamStatus.objects.get(codename="pending"),
+        status=TeamStatus.objects.get_cached("pending"),
         creator=user.user,
     ).all()
     if len(team_list)==0:
@@ -91,8 +107,49 @@ def get_allowed_teams(user,competition):
     return get_competition_teams(competition)
 
 
-# def get_user_team(user, competition):
-def get_user_team(participant, competition):
+def _user_team_version_key(user_id):
+    return 'user_team_version:{}'.format(user_id)
+
+
+def _user_team_cache_key(user_id, competition_id):
+    return 'user_team:{}:{}'.format(user_id, competition_id)
+
+
+def invalidate_user_teams(user_ids):
+    """
+    Drops the teams cached by `get_user_team` for these users, in every competition. The shared cache is only
+    invalidated once the current transaction commits, otherwise another process could cache the old team again
+    before the change is visible to it.
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    request_teams = getattr(_request_teams, 'teams', None)
+    if request_teams:
+        for key in [key for key in request_teams if key[0] in user_ids]:
+            del request_teams[key]
+
+    def bump_versions():
+        version = time.time()
+        # Outlives every entry cached with the previous version
+        cache.set_many(
+            dict((_user_team_version_key(user_id), version) for user_id in user_ids),
+            USER_TEAM_CACHE_TTL * 2,
+        )
+    transaction.on_commit(bump_versions)
+
+
+@receiver(request_started)
+def _start_request_teams(sender, **kwargs):
+    _request_teams.teams = {}
+
+
+@receiver(request_finished)
+def _finish_request_teams(sender, **kwargs):
+    _request_teams.teams = None
+
+
+def _get_user_team(participant, competition):
     # This function just gets user's created teams that are approved
     # and returns the first one or None
     user_created_teams = Team.objects.filter(competition=competition, creator=participant.user, status__codename='approved').select_related('status')
@@ -107,6 +164,182 @@ def get_user_team(participant, competition):
             return user_approved_active_teams[0].team
     return None
 
+
+def get_user_team(participant, competition):
+    """
+    :return: The approved team `participant` created in `competition`, else the team of their first approved and
+        active membership, else None.
+
+    The team is memoized for the current request and for `USER_TEAM_CACHE_TTL` seconds in the shared cache, so
+    calling it several times for the same participant costs no query. Saving or deleting a team or a membership
+    invalidates the teams of the users involved.
+    """
+    key = (participant.user_id, competition.pk)
+    request_teams = getattr(_request_teams, 'teams', None)
+    if request_teams is not None and key in request_teams:
+        return request_teams[key]
+
+    version_key = _user_team_version_key(key[0])
+    cache_key = _user_team_cache_key(*key)
+    cached = cache.get_many([version_key, cache_key])
+    version = cached.get(version_key)
+    entry = cached.get(cache_key)
+    if entry is not None and entry[0] == version:
+        team = entry[1]
+    else:
+        team = _get_user_team(participant, competition)
+        cache.set(cache_key, (version, team), USER_TEAM_CACHE_TTL)
+
+    if request_teams is not None:
+        request_teams[key] = team
+    return team
+
+
+def get_competition_teams_by_user(competition):
+    """
+    Resolves the team of every user in a competition with two queries, instead of calling `get_user_team`
+    once per participant. Like `get_user_team`, an approved team created by the user wins over an approved
+    and active membership, but only teams of this competition are considered.
+
+    :param competition: The competition to resolve teams for.
+    :return: Dictionary mapping user ids to their Team.
+    """
+    teams_by_user = {}
+    memberships = TeamMembership.objects.filter(
+        team__competition=competition,
+        status__codename=TeamMembershipStatus.APPROVED,
+    ).select_related('team').order_by('pk')
+    for membership in memberships:
+        if membership.is_active:
+            teams_by_user.setdefault(membership.user_id, membership.team)
+
+    created_teams = {}
+    for team in Team.objects.filter(competition=competition, status__codename=TeamStatus.APPROVED).order_by('pk'):
+        created_teams.setdefault(team.creator_id, team)
+    teams_by_user.update(created_teams)
+    return teams_by_user
+
+
+def import_organizer_teams(competition, creator, teams):
+    """
+    Creates or updates the teams an organizer listed in a CSV file, with a handful of queries whatever the number
+    of teams. Every listed team ends up with exactly its listed members, approved, and like `TeamMembership.save`
+    a user added to a team leaves their other teams of the competition. A user listed in several teams goes to
+    the last one.
+
+    :param competition: The competition the teams belong to.
+    :param creator: The user new teams are created by.
+    :param teams: List of (team name, list of member usernames or emails) in the order of the file, the team
+        names being unique.
+    :return: List with a dictionary per team: its 'row' number, 'team' name, whether it was 'created', the
+        usernames 'added' and 'removed', and the 'unknown' names which matched no user.
+    """
+    member_names = set(name for _, names in teams for name in names if name)
+    user_ids_by_name = {}
+    usernames = {}
+    users = get_user_model().objects.filter(
+        Q(username__in=member_names) | Q(email__in=member_names),
+    ).values_list('pk', 'username', 'email')
+    for user_id, username, email in users:
+        usernames[user_id] = username
+        for name in (username, email):
+            if name in member_names:
+                user_ids_by_name.setdefault(name, set()).add(user_id)
+
+    final_team_names = {}
+    for team_name, names in teams:
+        for name in names:
+            for user_id in user_ids_by_name.get(name, ()):
+                final_team_names[user_id] = team_name
+
+    team_status = TeamStatus.objects.get_cached(TeamStatus.APPROVED)
+    membership_status = TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.APPROVED)
+
+    with transaction.atomic():
+        existing_team_names = set(Team.objects.filter(competition=competition).values_list('name', flat=True))
+        created_at = now()
+        # bulk_create skips Team.save, which sets the image url base from the storage
+        image_url_base = get_object_base_url(Team(), 'image')
+        Team.objects.bulk_create([
+            Team(
+                name=team_name,
+                competition=competition,
+                description=team_name,
+                allow_requests=False,
+                creator=creator,
+                created_at=created_at,
+                last_modified=created_at,
+                image_url_base=image_url_base,
+                status=team_status,
+                reason="Organizer Created Team",
+            )
+            for team_name, _ in teams if team_name not in existing_team_names
+        ], batch_size=TEAM_IMPORT_BATCH_SIZE)
+        team_ids = dict(Team.objects.filter(competition=competition).values_list('name', 'pk'))
+
+        memberships = list(TeamMembership.objects.filter(
+            team__competition=competition,
+        ).values_list('pk', 'team_id', 'user_id', 'user__username'))
+        member_ids_by_team = {}
+        for _, team_id, user_id, username in memberships:
+            member_ids_by_team.setdefault(team_id, set()).add(user_id)
+            usernames.setdefault(user_id, username)
+
+        report = []
+        new_member_ids_by_team = {}
+        added_user_ids = set()
+        for number, (team_name, names) in enumerate(teams, start=1):
+            team_id = team_ids[team_name]
+            new_member_ids = set(
+                user_id for name in names for user_id in user_ids_by_name.get(name, ())
+                if final_team_names[user_id] == team_name
+            )
+            member_ids = member_ids_by_team.get(team_id, set())
+            new_member_ids_by_team[team_id] = new_member_ids
+            added_user_ids.update(new_member_ids - member_ids)
+            report.append({
+                'row': number,
+                'team': team_name,
+                'created': team_name not in existing_team_names,
+                'added': sorted(usernames[user_id] for user_id in new_member_ids - member_ids),
+                'removed': sorted(usernames[user_id] for user_id in member_ids - new_member_ids),
+                'unknown': [name for name in names if name and name not in user_ids_by_name],
+            })
+
+        removed_membership_ids = [
+            membership_id for membership_id, team_id, user_id, _ in memberships
+            if (user_id not in new_member_ids_by_team[team_id] if team_id in new_member_ids_by_team
+                else user_id in added_user_ids)
+        ]
+        for start in range(0, len(removed_membership_ids), TEAM_IMPORT_BATCH_SIZE):
+            TeamMembership.objects.filter(
+                pk__in=removed_membership_ids[start:start + TEAM_IMPORT_BATCH_SIZE],
+            ).delete()
+
+        start_date = now()
+        TeamMembership.objects.bulk_create([
+            TeamMembership(
+                user_id=user_id,
+                team_id=team_id,
+                is_invitation=False,
+                is_request=False,
+                start_date=start_date,
+                message="Organizer Created",
+                status=membership_status,
+                reason="Organizer Created Team",
+            )
+            for team_id, new_member_ids in new_member_ids_by_team.items()
+            for user_id in new_member_ids - member_ids_by_team.get(team_id, set())
+        ], batch_size=TEAM_IMPORT_BATCH_SIZE)
+
+    # bulk_create sends no signal, invalidate the teams of every user whose team may have changed
+    invalidate_user_teams(
+        set(user_id for _, _, user_id, _ in memberships) | added_user_ids | {creator.pk}
+    )
+    logger.info("Imported %s teams in competition %s", len(teams), competition.pk)
+    return report
+
+
 def get_team_submissions(team, phase=None):
     if phase is None:
         t_s = web.models.CompetitionSubmission.objects.filter(phase=phase, team=team)
@@ -121,21 +354,35 @@ def get_last_team_submissions(team, days=1):
 
 
 def get_team_submissions_inf(team, phase):
-
+    """
+    :return: List with a dictionary describing each submission of `team` to `phase`, the latest first, with
+        whether it is on the leaderboard (never when the phase is blind) and its default score, the score of its
+        first leaderboard column.
+
+    Everything is read in one query, whatever the number of submissions.
+    """
+    # The default score is the one of the scoredef with the lowest ordering, like get_default_score
+    default_scores = web.models.SubmissionScore.objects.filter(
+        result=OuterRef('pk'),
+    ).order_by('scoredef__ordering').values('value')[:1]
     submissions = web.models.CompetitionSubmission.objects.filter(
         team=team,
         phase=phase
-    ).select_related('status').order_by('-submitted_at')
-
-    # find which submission is in the leaderboard, if any and only if phase allows seeing results.
-    id_of_submission_in_leaderboard = -1
+    ).select_related('status', 'participant__user').annotate(
+        default_score=Subquery(
+            default_scores,
+            output_field=web.models.SubmissionScore._meta.get_field('value'),
+        ),
+    ).order_by('-submitted_at')
+
+    # find which submissions are in the leaderboard, if any and only if phase allows seeing results.
     if phase and not phase.is_blind:
-        leaderboard_entry = web.models.PhaseLeaderBoardEntry.objects.filter(
-            board__phase=phase,
-            result__team=team
-        ).select_related('result', 'result__participant')
-        if leaderboard_entry:
-            id_of_submission_in_leaderboard = leaderboard_entry[0].result.pk
+        submissions = submissions.annotate(is_in_leaderboard=Exists(
+            web.models.PhaseLeaderBoardEntry.objects.filter(board__phase=phase, result=OuterRef('pk'))
+        ))
+    else:
+        submissions = submissions.annotate(is_in_leaderboard=Value(False, output_field=models.BooleanField()))
+
     submission_info_list = []
     for submission in submissions:
         submission_info = {
@@ -146,7 +393,7 @@ def get_team_submissions_inf(team, phase):
             'submitted_at': submission.submitted_at,
             'status_name': submission.status.name,
             'is_finished': submission.status.codename == 'finished',
-            'is_in_leaderboard': submission.id == id_of_submission_in_leaderboard,
+            'is_in_leaderboard': submission.is_in_leaderboard,
             'exception_details': submission.exception_details,
             'description': submission.description,
             'team_name': submission.team_name,
@@ -157,7 +404,7 @@ def get_team_submissions_inf(team, phase):
             'bibtex': submission.bibtex,
             'organization_or_affiliation': submission.organization_or_affiliation,
             'is_public': submission.is_public,
-            'score': submission.get_default_score(),
+            'score': submission.default_score,
         }
         submission_info_list.append(submission_info)
 
@@ -178,6 +425,8 @@ class TeamStatus(models.Model):
     codename = models.CharField(max_length=30,unique=True)
     description = models.CharField(max_length=50)
 
+    objects = StatusManager()
+
     def __unicode__(self):
         return self.name
 
@@ -212,7 +461,7 @@ class Team(models.Model):
         self.last_modified=now()
 
         if self.status is None:
-            self.status = TeamStatus.objects.get(codename=TeamStatus.PENDING)
+            self.status = TeamStatus.objects.get_cached(TeamStatus.PENDING)
 
         # Do the real save
         return super(Team,self).save(*args,**kwargs)
@@ -256,7 +505,7 @@ class Team(models.Model):
         requests = TeamMembership.objects.filter(
             team=self,
             is_request=True,
-            status=TeamMembershipStatus.objects.get(codename=status),
+            status=TeamMembershipStatus.objects.get_cached(status),
         ).select_related("user").all()
 
         members=[]
@@ -267,10 +516,20 @@ class Team(models.Model):
         return members
 
 
+@receiver(post_save, sender=Team)
+def team_post_save_handler(sender, **kwargs):
+    team = kwargs['instance']
+    invalidate_user_teams([team.creator_id] + list(
+        TeamMembership.objects.filter(team=team).values_list('user_id', flat=True)
+    ))
+
+
 @receiver(post_delete, sender=Team)
 def team_post_delete_handler(sender, **kwargs):
     team = kwargs['instance']
     delete_key_from_storage(team, 'image')
+    # The memberships were deleted before, each invalidating its user
+    invalidate_user_teams([team.creator_id])
 
 
 class TeamMembershipStatus(models.Model):
@@ -283,6 +542,8 @@ class TeamMembershipStatus(models.Model):
     codename = models.CharField(max_length=30,unique=True)
     description = models.CharField(max_length=50)
 
+    objects = StatusManager()
+
     def __unicode__(self):
         return self.name
 
@@ -321,3 +582,9 @@ class TeamMembership(models.Model):
             return False
 
         return True
+
+
+@receiver(post_save, sender=TeamMembership)
+@receiver(post_delete, sender=TeamMembership)
+def team_membership_changed_handler(sender, **kwargs):
+    invalidate_user_teams([kwargs['instance'].user_id])
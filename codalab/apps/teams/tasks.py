@@ -0,0 +1,33 @@
+import logging
+
+from celery import task
+
+from apps.authenz.models import ClUser
+from apps.jobs.models import Job, JobTaskResult, update_job_status_task
+from apps.teams.models import import_organizer_teams
+from apps.web.models import Competition
+
+logger = logging.getLogger(__name__)
+
+
+@task(queue='site-worker', soft_time_limit=60 * 30)
+def import_organizer_teams_task(job_id, competition_pk, creator_pk, teams):
+    """
+    Imports the teams of a large organizer CSV file in the background, see `import_organizer_teams`. The job
+    is running with the number of 'teams' as info, then finished with the 'report' or failed with the 'error'.
+    """
+    update_job_status_task(job_id, JobTaskResult(status=Job.RUNNING, info={'teams': len(teams)}).get_dict())
+    try:
+        report = import_organizer_teams(
+            Competition.objects.get(pk=competition_pk),
+            ClUser.objects.get(pk=creator_pk),
+            teams,
+        )
+    except Exception as e:
+        logger.exception("Failed importing teams (job_id=%s, competition_pk=%s)", job_id, competition_pk)
+        update_job_status_task(job_id, JobTaskResult(status=Job.FAILED, info={'error': str(e)}).get_dict())
+        return
+    update_job_status_task(job_id, JobTaskResult(status=Job.FINISHED, info={
+        'teams': len(teams),
+        'report': report,
+    }).get_dict())
@@ -0,0 +1,56 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from apps.web.models import Competition, CompetitionParticipant, ParticipantStatus
+from apps.teams.models import Team, TeamStatus, TeamMembership, TeamMembershipStatus, get_user_team, \
+    get_competition_teams_by_user
+
+User = get_user_model()
+
+
+class CompetitionTeamsByUserTests(TestCase):
+    def setUp(self):
+        self.creator = User.objects.create(email='test@user.com', username='testuser')
+        self.member = User.objects.create(email='member@user.com', username='memberuser')
+        self.loner = User.objects.create(email='loner@user.com', username='loneruser')
+
+        self.competition = Competition.objects.create(creator=self.creator, modified_by=self.creator)
+        self.other_competition = Competition.objects.create(creator=self.creator, modified_by=self.creator)
+
+        self.approved, _ = TeamStatus.objects.get_or_create(name="Approved", codename="approved", description="Team was approved")
+        self.membership_approved, _ = TeamMembershipStatus.objects.get_or_create(
+            name="Approved",
+            codename="approved",
+            description="User membership approved."
+        )
+        part_status, _ = ParticipantStatus.objects.get_or_create(name='Approved', codename=ParticipantStatus.APPROVED)
+        self.participants = {
+            user.pk: CompetitionParticipant.objects.create(user=user, competition=self.competition, status=part_status)
+            for user in (self.creator, self.member, self.loner)
+        }
+
+        self.team = Team.objects.create(name="Team", competition=self.competition, creator=self.creator, status=self.approved)
+        TeamMembership.objects.create(user=self.member, team=self.team, status=self.membership_approved)
+
+        self.other_team = Team.objects.create(
+            name="Other Team",
+            competition=self.other_competition,
+            creator=self.member,
+            status=self.approved
+        )
+        TeamMembership.objects.create(user=self.loner, team=self.other_team, status=self.membership_approved)
+
+    def test_teams_by_user_only_considers_teams_of_the_competition(self):
+        teams_by_user = get_competition_teams_by_user(self.competition)
+
+        assert teams_by_user == {self.creator.pk: self.team, self.member.pk: self.team}
+
+    def test_teams_by_user_matches_get_user_team(self):
+        teams_by_user = get_competition_teams_by_user(self.competition)
+
+        for user_pk in (self.creator.pk, self.member.pk):
+            assert teams_by_user[user_pk] == get_user_team(self.participants[user_pk], self.competition)
+
+    def test_teams_by_user_uses_two_queries(self):
+        with self.assertNumQueries(2):
+            get_competition_teams_by_user(self.competition)
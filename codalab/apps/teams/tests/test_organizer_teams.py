@@ -1,11 +1,15 @@
 
+import mock
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.contrib.auth import get_user_model
 from django.core.urlresolvers import reverse
 
 from apps.web.models import Competition
-from apps.teams.models import Team, TeamStatus, TeamMembershipStatus
+from apps.teams.models import Team, TeamMembership, TeamStatus, TeamMembershipStatus, import_organizer_teams
+from apps.teams.tasks import import_organizer_teams_task
 
 User = get_user_model()
 
@@ -184,8 +188,11 @@ class CompetitionOrganizerTeamsTests(TestCase):
             }),
             {"csv_file": test_csv}
         )
-        assert resp.status_code == 302
-        assert resp.url == '/my/competition/1/participants/'
+        assert resp.status_code == 200
+        assert [(row['team'], row['created'], row['added'], row['unknown']) for row in resp.context['report']] == [
+            ("Team 1", True, ['testuser'], ['team_member2', 'team_member3']),
+            ("Team 2", True, [], ['team_member_1', 'team_member_2']),
+        ]
 
         new_team = Team.objects.get(name="Team 1", description="Team 1")
         print("NEW MEMBERS: {}".format(new_team.members.all()))
@@ -220,8 +227,7 @@ class CompetitionOrganizerTeamsTests(TestCase):
             {"csv_file": test_csv_two}
         )
 
-        assert resp.status_code == 302
-        assert resp.url == '/my/competition/1/participants/'
+        assert resp.status_code == 200
 
         new_team = Team.objects.get(name="Team 1", description="Team 1")
         # Make sure we can grab it by the new name and description.
@@ -241,8 +247,8 @@ class CompetitionOrganizerTeamsTests(TestCase):
             {"csv_file": test_csv_three}
         )
 
-        assert resp.status_code == 302
-        assert resp.url == '/my/competition/1/participants/'
+        assert resp.status_code == 200
+        assert resp.context['report'][0]['removed'] == ['testuser']
 
         new_team = Team.objects.get(name="Team 1", description="Team 1")
         # Make sure we can grab it by the new name and description.
@@ -377,3 +383,73 @@ class CompetitionOrganizerTeamsTests(TestCase):
 
         assert resp.status_code == 302
         assert resp.url == '/my/competition/1/participants/'
+
+    def import_teams(self, teams):
+        with CaptureQueriesContext(connection) as queries:
+            report = import_organizer_teams(self.competition, self.creator, teams)
+        return report, len(queries)
+
+    def test_organizer_teams_csv_import_runs_the_same_queries_for_any_number_of_teams(self):
+        users = [
+            User.objects.create(email='member{}@user.com'.format(number), username='member{}'.format(number))
+            for number in range(20)
+        ]
+        # Cache the status rows first, or only the first import would query them
+        TeamStatus.objects.get_cached(TeamStatus.APPROVED)
+        TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.APPROVED)
+        _, few_queries = self.import_teams([("Few {}".format(number), [users[number].username]) for number in range(2)])
+        _, many_queries = self.import_teams([
+            ("Many {}".format(number), [users[number].email, users[number + 9].username]) for number in range(2, 11)
+        ])
+
+        assert few_queries == many_queries
+        assert set(Team.objects.get(name="Many 3").members.all()) == {users[3], users[12]}
+
+    def test_organizer_teams_csv_import_moves_users_to_their_last_team(self):
+        self.import_teams([("Team 1", ['testuser', 'testclientuser'])])
+
+        report, _ = self.import_teams([
+            ("Team 2", ['testclientuser']),
+            ("Team 3", ['testclientuser', 'nobody']),
+        ])
+
+        assert list(Team.objects.get(name="Team 1").members.all()) == [self.creator]
+        assert not Team.objects.get(name="Team 2").members.exists()
+        assert list(Team.objects.get(name="Team 3").members.all()) == [self.user]
+        assert report[1]['added'] == ['testclientuser']
+        assert report[1]['unknown'] == ['nobody']
+        assert TeamMembership.objects.get(user=self.user).status.codename == TeamMembershipStatus.APPROVED
+
+    @override_settings(TEAM_CSV_IMPORT_SYNC_ROWS=1)
+    def test_organizer_teams_large_csv_file_is_imported_in_the_background(self):
+        test_csv = SimpleUploadedFile(
+            "test_team.csv",
+            "Team 1, testuser\nTeam 2, testclientuser".encode('utf-8'),
+            content_type='multipart/form-data'
+        )
+        self.client.login(username='testuser', password='test')
+
+        with mock.patch('apps.teams.views.import_organizer_teams_task.apply_async') as task_mock:
+            resp = self.client.post(
+                reverse('create_org_teams_from_csv', kwargs={'competition_pk': self.competition.pk}),
+                {"csv_file": test_csv}
+            )
+
+        assert resp.status_code == 202
+        job = resp.context['job']
+        task_args = task_mock.call_args[0][0]
+        assert task_args == (job.pk, self.competition.pk, self.creator.pk, [
+            ("Team 1", ['testuser']),
+            ("Team 2", ['testclientuser']),
+        ])
+        status_url = reverse('org_teams_csv_status', kwargs={'competition_pk': self.competition.pk, 'job_pk': job.pk})
+        assert self.client.get(status_url).json()['status'] == 'pending'
+
+        import_organizer_teams_task(*task_args)
+
+        data = self.client.get(status_url).json()
+        assert data['status'] == 'finished'
+        assert [row['added'] for row in data['report']] == [['testuser'], ['testclientuser']]
+
+        self.client.login(username='testclientuser', password='testclient')
+        assert self.client.get(status_url).status_code == 403
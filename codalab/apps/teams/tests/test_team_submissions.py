@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from apps.customizer.models import Configuration
+from apps.teams.models import Team, get_team_submissions_inf
+from apps.web.models import CompetitionSubmission, LeaderboardManagementMode
+from apps.web.synthetic_data import create_synthetic_competition
+
+User = get_user_model()
+
+
+class TeamSubmissionsInfoTests(TestCase):
+    def setUp(self):
+        Configuration.objects.get_or_create(pk=1, defaults={'disable_all_submissions': False})
+        self.creator = User.objects.create_user(username='organizer', password='pass')
+
+    def create_team_submissions(self, submissions):
+        competition = create_synthetic_competition(
+            self.creator,
+            participants=3,
+            teams=1,
+            submissions=submissions,
+            seed=0,
+        )
+        team = Team.objects.get(competition=competition)
+        phase = competition.phases.get()
+        CompetitionSubmission.objects.filter(phase=phase).update(team=team)
+        return team, phase
+
+    def test_submissions_info(self):
+        team, phase = self.create_team_submissions(6)
+
+        info = get_team_submissions_inf(team, phase)
+
+        assert len(info) == 6
+        for submission_info in info:
+            submission = CompetitionSubmission.objects.get(pk=submission_info['id'])
+            assert submission_info['username'] == submission.participant.user.username
+            assert submission_info['score'] == submission.get_default_score()
+            assert submission_info['is_in_leaderboard'] == phase.board.entries.filter(result=submission).exists()
+        # The latest submission of each participant is on the leaderboard
+        assert sum(submission_info['is_in_leaderboard'] for submission_info in info) == 3
+
+    def test_submissions_are_not_shown_in_the_leaderboard_of_blind_phases(self):
+        team, phase = self.create_team_submissions(3)
+        phase.leaderboard_management_mode = LeaderboardManagementMode.HIDE_RESULTS
+
+        assert not any(submission_info['is_in_leaderboard'] for submission_info in get_team_submissions_inf(team, phase))
+
+    def test_query_count_does_not_grow_with_submissions(self):
+        team, phase = self.create_team_submissions(3)
+        with CaptureQueriesContext(connection) as queries:
+            get_team_submissions_inf(team, phase)
+
+        team, phase = self.create_team_submissions(30)
+        with self.assertNumQueries(len(queries)):
+            assert len(get_team_submissions_inf(team, phase)) == 30
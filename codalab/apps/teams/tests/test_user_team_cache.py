@@ -0,0 +1,88 @@
+import mock
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from apps.teams.models import Team, TeamMembership, TeamMembershipStatus, TeamStatus, _finish_request_teams, \
+    _get_user_team, _start_request_teams, get_user_team
+from apps.web.models import Competition, CompetitionParticipant, ParticipantStatus
+
+User = get_user_model()
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'user-team-tests'}},
+)
+class UserTeamCacheTests(TestCase):
+    def setUp(self):
+        # The test transaction never commits, invalidate the cached teams right away instead
+        on_commit_patcher = mock.patch('apps.teams.models.transaction.on_commit', side_effect=lambda func: func())
+        on_commit_patcher.start()
+        self.addCleanup(on_commit_patcher.stop)
+
+        self.creator = User.objects.create(email='test@user.com', username='testuser')
+        self.member = User.objects.create(email='member@user.com', username='memberuser')
+        self.competition = Competition.objects.create(creator=self.creator, modified_by=self.creator)
+
+        self.approved, _ = TeamStatus.objects.get_or_create(name="Approved", codename="approved", description="Team was approved")
+        self.membership_approved, _ = TeamMembershipStatus.objects.get_or_create(
+            name="Approved",
+            codename="approved",
+            description="User membership approved."
+        )
+        part_status, _ = ParticipantStatus.objects.get_or_create(name='Approved', codename=ParticipantStatus.APPROVED)
+        self.creator_participant = CompetitionParticipant.objects.create(
+            user=self.creator, competition=self.competition, status=part_status)
+        self.member_participant = CompetitionParticipant.objects.create(
+            user=self.member, competition=self.competition, status=part_status)
+
+        self.team = Team.objects.create(name="Team", competition=self.competition, creator=self.creator, status=self.approved)
+        self.membership = TeamMembership.objects.create(user=self.member, team=self.team, status=self.membership_approved)
+
+    def test_cached_teams_are_the_same_as_uncached(self):
+        for participant in (self.creator_participant, self.member_participant):
+            expected = _get_user_team(participant, self.competition)
+
+            assert get_user_team(participant, self.competition) == expected
+            with self.assertNumQueries(0):
+                assert get_user_team(participant, self.competition) == expected
+
+    def test_repeated_calls_in_a_request_use_no_query(self):
+        # Sending request_started would also close the test's connection
+        _start_request_teams(sender=None)
+        try:
+            get_user_team(self.member_participant, self.competition)
+            with self.assertNumQueries(0):
+                for _ in range(3):
+                    assert get_user_team(self.member_participant, self.competition) == self.team
+        finally:
+            _finish_request_teams(sender=None)
+
+    def test_teams_are_invalidated_when_the_transaction_commits(self):
+        assert get_user_team(self.member_participant, self.competition) == self.team
+
+        with mock.patch('apps.teams.models.transaction.on_commit') as on_commit:
+            self.membership.delete()
+            assert get_user_team(self.member_participant, self.competition) == self.team
+
+            on_commit.call_args[0][0]()
+        assert get_user_team(self.member_participant, self.competition) is None
+
+    def test_membership_changes_invalidate_the_team(self):
+        assert get_user_team(self.member_participant, self.competition) == self.team
+
+        self.membership.delete()
+        assert get_user_team(self.member_participant, self.competition) is None
+
+        TeamMembership.objects.create(user=self.member, team=self.team, status=self.membership_approved)
+        assert get_user_team(self.member_participant, self.competition) == self.team
+
+    def test_team_changes_invalidate_the_team(self):
+        assert get_user_team(self.creator_participant, self.competition) == self.team
+
+        self.team.status = TeamStatus.objects.get_or_create(codename=TeamStatus.DENIED, defaults={'name': 'Denied'})[0]
+        self.team.save()
+        assert get_user_team(self.creator_participant, self.competition) is None
+
+        self.team.delete()
+        assert get_user_team(self.member_participant, self.competition) is None
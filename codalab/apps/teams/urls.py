@@ -12,6 +12,7 @@ urlpatterns = [
     url(r'^(?P<competition_pk>\d+)/request/(?P<team_pk>\d+)/$', views.NewRequestTeamView.as_view(), name='team_enrol'),
     url(r'^(?P<competition_pk>\d+)/create_org_team/$', views.CompetitionOrganizerTeams.as_view(), name='create_org_team'),
     url(r'^(?P<competition_pk>\d+)/create_org_teams_from_csv/$', views.CompetitionOrganizerCSVTeams.as_view(), name='create_org_teams_from_csv'),
+    url(r'^(?P<competition_pk>\d+)/create_org_teams_from_csv/(?P<job_pk>\d+)/status/$', views.organizer_csv_teams_status, name='org_teams_csv_status'),
     url(r'^(?P<competition_pk>\d+)/edit_org_team/(?P<pk>\d+)$', views.CompetitionOrganizerTeams.as_view(), name='edit_org_team'),
     url(r'^(?P<competition_pk>\d+)/delete_org_team/(?P<team_pk>\d+)$', views.delete_organizer_team, name='delete_org_team'),
 ]
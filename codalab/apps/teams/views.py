@@ -1,13 +1,17 @@
 import logging
 from apps.teams import forms
+from apps.jobs.models import Job
+from apps.jobs.notifications import get_status_version, job_channel, wait_for_status
 from apps.teams.forms import OrganizerTeamForm, OrganizerTeamsCSVForm
+from apps.teams.tasks import import_organizer_teams_task
 from apps.web.models import Competition, ParticipantStatus, CompetitionSubmission, get_current_phase
 from apps.web.views import LoginRequiredMixin
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
-from django.http import Http404, QueryDict, HttpResponseForbidden, HttpResponse
+from django.conf import settings
+from django.http import Http404, QueryDict, HttpResponseForbidden, HttpResponse, JsonResponse
 from django.shortcuts import redirect
 from django.utils.decorators import method_decorator
 from django.utils.timezone import now
@@ -41,7 +45,7 @@ class TeamDetailView(LoginRequiredMixin, TemplateView):
             participant = competition.participants.get(user=membership.user)
             if participant.status.codename == ParticipantStatus.APPROVED:
                 if get_user_team(participant, competition) is None:
-                    membership.status = TeamMembershipStatus.objects.get(codename=form_status)
+                    membership.status = TeamMembershipStatus.objects.get_cached(form_status)
                     membership.reason = form_reason
                     if membership.status.codename == TeamMembershipStatus.REJECTED:
                         membership.end_date = now()
@@ -56,7 +60,7 @@ class TeamDetailView(LoginRequiredMixin, TemplateView):
                         ).all()
                         for req in current_requests:
                             if req.is_active and req.is_request and req != membership:
-                                req.status = TeamMembershipStatus.objects.get(codename=TeamMembershipStatus.CANCELED)
+                                req.status = TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.CANCELED)
                                 req.end_date = now()
                                 req.save()
 
@@ -119,7 +123,7 @@ class TeamDetailView(LoginRequiredMixin, TemplateView):
                             'entries': len(CompetitionSubmission.objects.filter(team=user_team, participant=owner_part)),
                         }
                     ]
-                    status_approved = TeamMembershipStatus.objects.get(codename=TeamMembershipStatus.APPROVED)
+                    status_approved = TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.APPROVED)
                     for number, member in enumerate(user_team.members.all()):
                         member_part=competition.participants.get(user=member)
                         membership_set = member.team_memberships.filter(status=status_approved)
@@ -169,24 +173,21 @@ class RequestTeamView(TeamDetailView):
                                 error="Invalid request type: Cannot accept your own request"
                             else:
                                 request.is_accepted=True
-                                request.status = TeamMembershipStatus.objects.get(
-                                                        codename=TeamMembershipStatus.APPROVED)
+                                request.status = TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.APPROVED)
                                 request.save()
                         elif action == 'reject':
                             if not request.is_invitation:
                                 error="Invalid request type: Cannot reject your own request"
                             else:
                                 request.end_date=now()
-                                request.status = TeamMembershipStatus.objects.get(
-                                    codename=TeamMembershipStatus.REJECTED)
+                                request.status = TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.REJECTED)
                                 request.save()
                         elif action == 'cancel':
                             if not request.is_request:
                                 error="Invalid request type: Cannot cancel an invitation"
                             else:
                                 request.end_date=now()
-                                request.status = TeamMembershipStatus.objects.get(
-                                    codename=TeamMembershipStatus.CANCELED)
+                                request.status = TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.CANCELED)
                                 request.save()
                     elif request.team.creator==participant.user:
                         if action == 'accept':
@@ -194,24 +195,21 @@ class RequestTeamView(TeamDetailView):
                                 error="Invalid request type: Cannot accept your own invitation"
                             else:
                                 request.is_accepted=True
-                                request.status = TeamMembershipStatus.objects.get(
-                                    codename=TeamMembershipStatus.APPROVED)
+                                request.status = TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.APPROVED)
                                 request.save()
                         elif action == 'reject':
                             if request.is_invitation:
                                 error="Invalid request type: Cannot reject your own invitation"
                             else:
                                 request.end_date=now()
-                                request.status = TeamMembershipStatus.objects.get(
-                                    codename=TeamMembershipStatus.REJECTED)
+                                request.status = TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.REJECTED)
                                 request.save()
                         elif action == 'cancel':
                             if request.is_request:
                                 error="Invalid request type: Cannot cancel a request"
                             else:
                                 request.end_date=now()
-                                request.status = TeamMembershipStatus.objects.get(
-                                    codename=TeamMembershipStatus.CANCELED)
+                                request.status = TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.CANCELED)
                                 request.save()
                     else:
                         error = "You cannot modify this request"
@@ -246,7 +244,7 @@ class NewRequestTeamView(LoginRequiredMixin, CreateView):
         form.instance.team = Team.objects.get(pk=self.kwargs['team_pk'])
         form.instance.start_date = now()
         form.instance.is_request = True
-        form.instance.status = TeamMembershipStatus.objects.get(codename=TeamMembershipStatus.PENDING)
+        form.instance.status = TeamMembershipStatus.objects.get_cached(TeamMembershipStatus.PENDING)
         form.save()
         return super(NewRequestTeamView, self).form_valid(form)
 
@@ -269,9 +267,9 @@ class TeamCreateView(LoginRequiredMixin, CreateView):
         form.instance.created_at=now()
         form.instance.competition=Competition.objects.get(pk=self.kwargs['competition_pk'])
         if form.instance.competition.require_team_approval:
-            form.instance.status = TeamStatus.objects.get(codename=TeamStatus.PENDING)
+            form.instance.status = TeamStatus.objects.get_cached(TeamStatus.PENDING)
         else:
-            form.instance.status = TeamStatus.objects.get(codename=TeamStatus.APPROVED)
+            form.instance.status = TeamStatus.objects.get_cached(TeamStatus.APPROVED)
 
         form.save()
         return super(TeamCreateView, self).form_valid(form)
@@ -306,7 +304,7 @@ class TeamCancelView(TeamDetailView):
         team = Team.objects.get(pk=self.kwargs['team_pk'])
         if team.creator == self.request.user:
             if team.status.codename == 'pending':
-                status = TeamStatus.objects.get(codename="deleted")
+                status = TeamStatus.objects.get_cached("deleted")
                 team.status = status
                 team.save()
             else:
@@ -414,13 +412,17 @@ class CompetitionOrganizerCSVTeams(FormView):
         return kwargs
 
     def form_valid(self, form):
-        try:
-            competition = Competition.objects.get(pk=self.kwargs['competition_pk'])
-        except ObjectDoesNotExist:
-            print("Could not find a competition for that PK!")
-        form.save()
-        self.success_url = reverse("my_competition_participants", kwargs={'competition_id': competition.pk})
-        return super(CompetitionOrganizerCSVTeams, self).form_valid(form)
+        teams = form.get_teams()
+        if len(teams) > settings.TEAM_CSV_IMPORT_SYNC_ROWS:
+            # Large files are imported in the background, the page follows the job until it shows the report
+            job = Job.objects.create_job('import_organizer_teams', {
+                'competition_pk': form.competition.pk,
+                'teams': len(teams),
+            })
+            import_organizer_teams_task.apply_async((job.pk, form.competition.pk, form.creator.pk, teams))
+            return self.render_to_response(self.get_context_data(form=form, job=job), status=202)
+        report = form.save()
+        return self.render_to_response(self.get_context_data(form=form, report=report))
 
     def form_invalid(self, form):
         return self.render_to_response(self.get_context_data(form=form), status=400)
@@ -430,3 +432,29 @@ class CompetitionOrganizerCSVTeams(FormView):
         competition = Competition.objects.get(pk=self.kwargs['competition_pk'])
         context['competition'] = competition
         return context
+
+
+@login_required
+def organizer_csv_teams_status(request, competition_pk, job_pk):
+    """
+    Returns the status of a background CSV import as JSON, with its 'report' once finished. Pass the last
+    'version' received as the 'since' query parameter to wait for the next status change.
+    """
+    competition = Competition.objects.get(pk=competition_pk)
+    if request.user != competition.creator and request.user not in competition.admins.all():
+        return HttpResponseForbidden(status=403)
+    try:
+        job = Job.objects.get(pk=job_pk, task_type='import_organizer_teams')
+    except Job.DoesNotExist:
+        raise Http404()
+    if job.get_task_args().get('competition_pk') != competition.pk:
+        raise Http404()
+
+    channel = job_channel(job.pk)
+    since = request.GET.get('since')
+    if since is not None and since.isdigit():
+        wait_for_status(channel, int(since))
+        job.refresh_from_db()
+    data = {'status': job.get_status_code_name(), 'version': get_status_version(channel)}
+    data.update(job.get_task_info())
+    return JsonResponse(data)
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.utils.text import slugify
 from django.contrib.auth.models import User
 from apps.web.models import Competition, CompetitionPhase, CompetitionDataset, CompetitionParticipant, ExternalFile, ExternalFileType, ParticipantStatus
+from apps.web.synthetic_data import create_synthetic_competition
 
 import datetime
 import pytz
@@ -37,6 +38,28 @@ class Command(BaseCommand):
                     default=ParticipantStatus.PENDING,
                     help="The initial status of the created participants"
                     )
+        parser.add_argument('--submissions',
+                    dest='submissions',
+                    type=int,
+                    default=0,
+                    help="Number of scored submissions per phase. When set, creates competitions with a "
+                         "leaderboard, teams and approved participants at this scale instead."),
+        parser.add_argument('--phases',
+                    dest='phases',
+                    type=int,
+                    default=1,
+                    help="Number of phases, with --submissions"),
+        parser.add_argument('--score_columns',
+                    dest='score_columns',
+                    type=int,
+                    default=3,
+                    help="Number of scored leaderboard columns, followed by an Avg and a MRR column, with "
+                         "--submissions"),
+        parser.add_argument('--teams',
+                    dest='teams',
+                    type=int,
+                    default=10,
+                    help="Number of teams, 0 disables teams, with --submissions"),
 
     def handle(self, *args, **options):
         for count in range(1, options['number'] + 1):
@@ -49,6 +72,20 @@ class Command(BaseCommand):
                 u.save()
                 print("Pasword for user is: testing")
             competition_name = "%s %d" % (options['name'], count)
+            if options['submissions']:
+                c = create_synthetic_competition(
+                    u,
+                    title=competition_name,
+                    phases=options['phases'],
+                    score_columns=options['score_columns'],
+                    participants=options['participant_count'],
+                    teams=options['teams'],
+                    submissions=options['submissions'],
+                    password='testing',
+                )
+                print("Created competition %s (pk=%d), participants are synthetic_%d_<number> with password "
+                      "testing" % (competition_name, c.pk, c.pk))
+                continue
             c = Competition.objects.create(title=competition_name,
                                            description="This is the description for competition %s" % options[
                                                'name'],
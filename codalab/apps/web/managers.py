@@ -0,0 +1,120 @@
+import threading
+import time
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+
+# Status tables are tiny and almost never change, so each process keeps their rows for at most STATUS_CACHE_TTL
+# seconds. Saving or deleting a status bumps the version of its table in the shared cache once the transaction
+# commits, which makes every process drop its copy on the next read, like the cached customizer Configuration.
+STATUS_CACHE_TTL = 60
+
+_lock = threading.Lock()
+_cached_statuses = {}
+# Status tables changed by the open transaction of this thread, their rows are not cached until it commits
+_uncommitted = threading.local()
+
+
+def _version_cache_key(model):
+    return 'status_cache_version:{}'.format(model._meta.label_lower)
+
+
+def invalidate_cached_statuses(model):
+    """Drops this process' cached rows of the status `model` and tells the other processes to drop theirs."""
+    with _lock:
+        _cached_statuses.pop(model._meta.label_lower, None)
+    cache.set(_version_cache_key(model), time.time(), None)
+
+
+def clear_cached_statuses():
+    """Drops the cached rows of every status table in this process, for tests which roll their rows back."""
+    with _lock:
+        _cached_statuses.clear()
+    _uncommitted.tables = set()
+
+
+def _get_uncommitted_tables():
+    tables = getattr(_uncommitted, 'tables', None)
+    if tables is None:
+        tables = _uncommitted.tables = set()
+    return tables
+
+
+def _status_changed_handler(sender, **kwargs):
+    # Earlier, a process could cache the rows again before the change is visible, or keep a rolled back one
+    key = sender._meta.label_lower
+    _get_uncommitted_tables().add(key)
+
+    def committed():
+        _get_uncommitted_tables().discard(key)
+        invalidate_cached_statuses(sender)
+    transaction.on_commit(committed)
+
+
+class StatusManager(models.Manager):
+    """
+    Manager of the status lookup tables, like TeamStatus or CompetitionSubmissionStatus, which hands out their
+    rows by codename from a process-local cache instead of querying them every time.
+    """
+
+    def contribute_to_class(self, model, name):
+        super(StatusManager, self).contribute_to_class(model, name)
+        if not model._meta.abstract:
+            dispatch_uid = 'status_cache_{}'.format(model._meta.label_lower)
+            post_save.connect(_status_changed_handler, sender=model, dispatch_uid=dispatch_uid)
+            post_delete.connect(_status_changed_handler, sender=model, dispatch_uid=dispatch_uid)
+
+    def _get_rows(self, refresh=False):
+        key = self.model._meta.label_lower
+        uncommitted = _get_uncommitted_tables()
+        if key in uncommitted:
+            if transaction.get_connection(self.db).in_atomic_block:
+                return dict((row['codename'], row) for row in self.get_queryset().values())
+            # The transaction was rolled back, nothing was cached meanwhile
+            uncommitted.discard(key)
+        version = cache.get(_version_cache_key(self.model))
+        cached = _cached_statuses.get(key)
+        if refresh or cached is None or version != cached['version'] or time.time() > cached['expires_at']:
+            rows = dict((row['codename'], row) for row in self.get_queryset().values())
+            with _lock:
+                _cached_statuses[key] = {
+                    'rows': rows,
+                    'version': version,
+                    'expires_at': time.time() + STATUS_CACHE_TTL,
+                }
+            return rows
+        return cached['rows']
+
+    def get_cached(self, codename):
+        """
+        Returns the status with this codename, like `get(codename=codename)` but without a query most of the
+        time. Every call returns a new object, so it can be changed freely.
+
+        Raises DoesNotExist when there is no such status.
+        """
+        row = self._get_rows().get(codename)
+        if row is None:
+            # It may have been created since this process cached the table
+            row = self._get_rows(refresh=True).get(codename)
+        if row is None:
+            raise self.model.DoesNotExist(
+                "{} matching codename '{}' does not exist.".format(self.model._meta.object_name, codename)
+            )
+        field_names = [field.attname for field in self.model._meta.concrete_fields]
+        return self.model.from_db(self.db, field_names, [row[name] for name in field_names])
+
+    def get_cached_id(self, codename):
+        """:return: The pk of the status with this codename, see `get_cached`."""
+        return self.get_cached(codename).pk
+
+    def get_or_create_cached(self, codename):
+        """Like `get_cached`, but creates the status with only its codename set when it does not exist."""
+        try:
+            return self.get_cached(codename)
+        except self.model.DoesNotExist:
+            status, created = self.get_or_create(codename=codename)
+            if created:
+                # Creating it invalidates the cached rows on commit, cache them again with the new one after that
+                transaction.on_commit(lambda: self._get_rows(refresh=True))
+            return status
@@ -17,14 +17,17 @@ import zipfile
 from apps.chahub.models import ChaHubSaveMixin
 from apps.coopetitions.models import DownloadRecord
 from apps.forums.models import Forum
-from apps.teams.models import Team, get_user_team, TeamMembership
+from apps.teams.models import Team, get_competition_teams_by_user, get_user_team, TeamMembership
+from apps.web.managers import StatusManager
 from apps.web.utils import PublicStorage, BundleStorage, clean_html_script, get_object_base_url, get_submission_size, \
     delete_key_from_storage, get_filefield_size
 from apps.customizer.models import Configuration
+from apps.emails.models import queue_email, queue_mass_email
 from decimal import Decimal
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
+from django.contrib.sites.models import Site
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
 from django.core.files import File
 from django.core.files.base import ContentFile
@@ -33,9 +36,10 @@ from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import IntegrityError
 from django.db import models
 from django.db import transaction
-from django.db.models import Max
+from django.db.models import Case, Count, F, Max, Q, Sum, When
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from django.template.loader import render_to_string
 from django.utils import timezone
 from django.utils.dateparse import parse_datetime
 from django.utils.deconstruct import deconstructible
@@ -52,6 +56,11 @@ from . import exceptions
 User = settings.AUTH_USER_MODEL
 logger = logging.getLogger(__name__)
 
+# Rows inserted, or looked up by secret, per query when copying submissions in bulk
+SUBMISSION_COPY_BATCH_SIZE = 500
+# Participants updated, and notified, per query when moderating participants in bulk
+PARTICIPANT_STATUS_BATCH_SIZE = 500
+
 
 # Competition Content
 class ContentVisibility(models.Model):
@@ -220,6 +229,8 @@ class ParticipantStatus(models.Model):
     codename = models.CharField(max_length=30,unique=True)
     description = models.CharField(max_length=50)
 
+    objects = StatusManager()
+
     def __unicode__(self):
         return self.name
 
@@ -507,43 +518,26 @@ class Competition(ChaHubSaveMixin, models.Model):
         self.save()
 
         try:
-            submissions = []
             leader_board = PhaseLeaderBoard.objects.get(phase=current_phase)
 
-            leader_board_entries = PhaseLeaderBoardEntry.objects.filter(board=leader_board)
-            for submission in leader_board_entries:
-                submissions.append(submission.result)
+            leader_board_entries = PhaseLeaderBoardEntry.objects.filter(
+                board=leader_board,
+                result__is_migrated=False,
+            ).select_related('result').order_by('pk')
 
+            # The last entry of each participant is the one moved over
             participants = {}
+            for entry in leader_board_entries:
+                participants[entry.result.participant_id] = entry.result
+            submissions = list(participants.values())
 
-            for s in submissions:
-                if s.is_migrated is False:
-                    participants[s.participant] = s
-
-            from .tasks import evaluate_submission
-
-            for participant, submission in list(participants.items()):
-                logger.info('Moving submission %s over' % submission)
-
-                file_args = {}
+            from .tasks import dispatch_submission_evaluations
 
-                if settings.USE_AWS:
-                    file_args["s3_file"] = submission.s3_file
-                else:
-                    file_args["file"] = submission.file
-
-                new_submission = CompetitionSubmission(
-                    participant=participant,
-                    phase=next_phase,
-                    docker_image=submission.docker_image,
-                    **file_args
-                )
-                new_submission.save(ignore_submission_limits=True)
-
-                submission.is_migrated = True
-                submission.save()
+            logger.info('Moving %s submissions over for competition pk=%s' % (len(submissions), self.pk))
+            new_submission_ids = copy_submissions_to_phase(submissions, next_phase)
+            CompetitionSubmission.objects.filter(pk__in=[s.pk for s in submissions]).update(is_migrated=True)
 
-                evaluate_submission.apply_async((new_submission.pk, current_phase.is_scoring_only))
+            dispatch_submission_evaluations(new_submission_ids, current_phase.is_scoring_only)
         except PhaseLeaderBoard.DoesNotExist:
             pass
 
@@ -1357,6 +1351,87 @@ class CompetitionParticipant(models.Model):
         return total
 
 
+# Emails sent to the participants, and to the organizer, when participants get one of these statuses in bulk
+PARTICIPANT_STATUS_EMAILS = {
+    'approved': {
+        'subject': 'Accepted into %s!',
+        'template': 'emails/notifications/participation_accepted',
+        'organizer_action': 'accepted into',
+    },
+    'denied': {
+        'subject': 'Permission revoked from %s!',
+        'template': 'emails/notifications/participation_revoked',
+        'organizer_action': 'revoked permission from',
+    },
+}
+
+
+def change_participants_status(competition, participants, status, reason=None):
+    """
+    Gives `status` to many participants of `competition` in one transaction, with one UPDATE per
+    `PARTICIPANT_STATUS_BATCH_SIZE` participants instead of a `save()` each. Participants who already have the
+    status are left alone.
+
+    The participants who want status updates get one email rendered once and queued as BCC, the organizer gets
+    one summary instead of an email per participant.
+
+    :param competition: The Competition.
+    :param participants: Queryset of the CompetitionParticipant to change, only those of `competition` are.
+    :param status: Codename of the ParticipantStatus, raises ParticipantStatus.DoesNotExist when unknown.
+    :param reason: Reason shown to the participants.
+    :return: Dictionary with the number of participants 'updated', 'unchanged' and 'notified'.
+    """
+    participant_status = ParticipantStatus.objects.get_cached(status)
+    emails = PARTICIPANT_STATUS_EMAILS.get(status)
+    if emails:
+        context = {
+            'competition': competition,
+            'reason': reason,
+            'site': Site.objects.get_current(),
+        }
+        text = render_to_string(emails['template'] + '.txt', context)
+        html = render_to_string(emails['template'] + '.html', context)
+
+    summary = {'updated': 0, 'unchanged': 0, 'notified': 0}
+    with transaction.atomic():
+        participants = participants.filter(competition=competition).order_by('pk')
+        to_update = []
+        for participant_id, status_id in participants.select_for_update().values_list('pk', 'status_id'):
+            if status_id == participant_status.pk:
+                summary['unchanged'] += 1
+            else:
+                to_update.append(participant_id)
+
+        for start in range(0, len(to_update), PARTICIPANT_STATUS_BATCH_SIZE):
+            batch = to_update[start:start + PARTICIPANT_STATUS_BATCH_SIZE]
+            summary['updated'] += CompetitionParticipant.objects.filter(pk__in=batch).update(
+                status=participant_status,
+                reason=reason,
+            )
+            if emails:
+                recipients = [email for email in CompetitionParticipant.objects.filter(
+                    pk__in=batch,
+                    user__participation_status_updates=True,
+                ).values_list('user__email', flat=True) if email]
+                queue_mass_email(emails['subject'] % competition, text, recipients, html_body=html)
+                summary['notified'] += len(recipients)
+
+        creator = competition.creator
+        if emails and summary['updated'] and creator.organizer_status_updates:
+            context.update({
+                'user': creator,
+                'count': summary['updated'],
+                'action': emails['organizer_action'],
+            })
+            queue_email(
+                '%s participants %s your competition!' % (summary['updated'], emails['organizer_action']),
+                render_to_string('emails/notifications/organizer_participants_status.txt', context),
+                [creator.email],
+                html_body=render_to_string('emails/notifications/organizer_participants_status.html', context),
+            )
+    return summary
+
+
 # Competition Submission Status
 class CompetitionSubmissionStatus(models.Model):
     """
@@ -1382,6 +1457,8 @@ class CompetitionSubmissionStatus(models.Model):
     name = models.CharField(max_length=20)
     codename = models.SlugField(max_length=20,unique=True)
 
+    objects = StatusManager()
+
     def __unicode__(self):
         return self.name
 
@@ -1518,12 +1595,52 @@ class CompetitionSubmission(ChaHubSaveMixin, models.Model):
             "submitted_at": self.submitted_at.isoformat(),
         }
 
+    def get_submission_limit_counts(self):
+        """
+        Gathers everything the submission limit checks need about this participant in a single aggregate query.
+
+        :return: Dictionary with the highest submission number and the total, failed, today and today failed
+            counts for this phase, plus the participant's stored submission size over all phases.
+        """
+        in_phase = Q(phase=self.phase)
+        failed = Q(status__codename=CompetitionSubmissionStatus.FAILED)
+        today = Q(submitted_at__gte=datetime.date.today())
+        # Submissions in these states have final files but may not have had their size stored yet
+        sizable = Q(sub_size=0, status__codename__in=[
+            CompetitionSubmissionStatus.RUNNING,
+            CompetitionSubmissionStatus.FAILED,
+            CompetitionSubmissionStatus.CANCELLED,
+            CompetitionSubmissionStatus.FINISHED,
+        ])
+        return CompetitionSubmission.objects.filter(participant=self.participant).aggregate(
+            max_submission_number=Max(Case(When(in_phase, then=F('submission_number')))),
+            phase_count=Count(Case(When(in_phase, then=1))),
+            phase_failed_count=Count(Case(When(in_phase & failed, then=1))),
+            today_count=Count(Case(When(in_phase & today, then=1))),
+            today_failed_count=Count(Case(When(in_phase & today & failed, then=1))),
+            stored_size=Sum(Case(
+                When(sub_size__gt=0, then=F('sub_size')),
+                default=0,
+                output_field=models.BigIntegerField()
+            )),
+            unsized_count=Count(Case(When(sizable, then=1))),
+        )
+
     def save(self, ignore_submission_limits=False, *args, **kwargs):
+        if self.pk:
+            return self._save(ignore_submission_limits, *args, **kwargs)
+        with transaction.atomic():
+            # Lock the participant row until the new submission is inserted, so concurrent uploads from the
+            # same participant get distinct submission numbers and can't race past the submission limits.
+            CompetitionParticipant.objects.select_for_update().get(pk=self.participant_id)
+            return self._save(ignore_submission_limits, *args, **kwargs)
+
+    def _save(self, ignore_submission_limits=False, *args, **kwargs):
         logger.info("Saving competition submission.")
         if self.participant.competition != self.phase.competition:
             raise Exception("Competition for phase and participant must be the same")
 
-        config = Configuration.objects.first()
+        config = Configuration.get_cached()
         if config.disable_all_submissions:
             logger.info("Submissions have been disabled by admins. Aborting.")
             raise PermissionDenied("Submissions have been disabled by admins")
@@ -1560,23 +1677,19 @@ class CompetitionSubmission(ChaHubSaveMixin, models.Model):
                 ignore_submission_limits = True
             if not ignore_submission_limits:
                 logger.info("This is a new submission, getting the submission number.")
-                subnum = CompetitionSubmission.objects.filter(phase=self.phase, participant=self.participant).aggregate(Max('submission_number'))['submission_number__max']
+                counts = self.get_submission_limit_counts()
+                subnum = counts['max_submission_number']
                 if subnum is not None:
                     self.submission_number = subnum + 1
                 else:
                     self.submission_number = 1
 
-                failed_count = CompetitionSubmission.objects.filter(phase=self.phase,
-                                                                    participant=self.participant,
-                                                                    status__codename=CompetitionSubmissionStatus.FAILED).count()
-
-                all_count = CompetitionSubmission.objects.filter(phase=self.phase, participant=self.participant).count()
+                failed_count = counts['phase_failed_count']
+                all_count = counts['phase_count']
 
                 logger.info("This is submission number %d, and %d submissions have failed" % (all_count, failed_count))
 
-                submission_count = CompetitionSubmission.objects.filter(phase=self.phase,
-                                                                               participant=self.participant).exclude(
-                    status__codename=CompetitionSubmissionStatus.FAILED).count()
+                submission_count = all_count - failed_count
 
                 if (submission_count >= self.phase.max_submissions):
                     logger.info("Checking to see if the submission_count (%d) is greater than the maximum allowed (%d)" % (submission_count, self.phase.max_submissions))
@@ -1593,11 +1706,7 @@ class CompetitionSubmission(ChaHubSaveMixin, models.Model):
                     logger.info('Checking submissions per day count')
 
                     # All submissions from today without those that failed
-                    submissions_from_today_count = CompetitionSubmission.objects.filter(
-                        participant=self.participant,
-                        phase=self.phase,
-                        submitted_at__gte=datetime.date.today(),
-                    ).exclude(status__codename=CompetitionSubmissionStatus.FAILED).count()
+                    submissions_from_today_count = counts['today_count'] - counts['today_failed_count']
 
                     logger.info('Count is %s and maximum is %s' % (submissions_from_today_count, self.phase.max_submissions_per_day))
 
@@ -1606,9 +1715,14 @@ class CompetitionSubmission(ChaHubSaveMixin, models.Model):
                         logger.info('PERMISSION DENIED')
                         raise PermissionDenied("The maximum number of submissions this day have been reached.")
 
-                sub_size = get_submission_size(self)
-
                 phase_max_bytes = self.phase.max_submission_size * 1000 * 1000
+                phase_max_part_use = self.phase.participant_max_storage_use * 1000 * 1000
+                if phase_max_bytes > 0 or phase_max_part_use > 0:
+                    # Only ask the storage backend for the size when there is a limit to check it against
+                    sub_size = get_submission_size(self)
+                else:
+                    sub_size = 0
+
                 if phase_max_bytes > 0:
                     if sub_size > phase_max_bytes:
                         logger.info('Permission denied on submission upload: Exceeds max size for phase.')
@@ -1618,9 +1732,12 @@ class CompetitionSubmission(ChaHubSaveMixin, models.Model):
                                 float(sub_size) / 1000 / 1000
                             )
                         )
-                phase_max_part_use = self.phase.participant_max_storage_use * 1000 * 1000
                 if phase_max_part_use > 0:
-                    part_storage_use = self.participant.get_storage_use()
+                    if counts['unsized_count']:
+                        # Some older submissions never had their size stored, this computes and stores them
+                        part_storage_use = self.participant.get_storage_use()
+                    else:
+                        part_storage_use = counts['stored_size'] or 0
                     if part_storage_use + sub_size > phase_max_part_use:
                         logger.info("Permission denied on submission upload: Exceeds max participant storage use.")
                         raise PermissionDenied(
@@ -1638,7 +1755,7 @@ class CompetitionSubmission(ChaHubSaveMixin, models.Model):
                 ).exists():
                     self.submission_number += 1
 
-            self.status = CompetitionSubmissionStatus.objects.get_or_create(codename=CompetitionSubmissionStatus.SUBMITTING)[0]
+            self.status = CompetitionSubmissionStatus.objects.get_or_create_cached(CompetitionSubmissionStatus.SUBMITTING)
 
         if not self.secret:
             # Set a compute worker password if one isn't set, the competition organizer
@@ -2379,7 +2496,7 @@ class CompetitionDefBundle(models.Model):
             logger.info("Created asset @ {}".format(public_path))
 
         # Add owner as participant so they can view the competition
-        approved = ParticipantStatus.objects.get(codename=ParticipantStatus.APPROVED)
+        approved = ParticipantStatus.objects.get_cached(ParticipantStatus.APPROVED)
         resulting_participant, created = CompetitionParticipant.objects.get_or_create(user=self.owner, competition=comp, defaults={'status':approved})
         logger.info("CompetitionDefBundle::unpack added owner as participant (pk=%s)", self.pk)
 
@@ -2664,6 +2781,72 @@ def add_submission_to_leaderboard(submission):
     return lbe, created
 
 
+def copy_submissions_to_phase(submissions, phase):
+    """
+    Creates a new submission to `phase` for each of `submissions`, with the same participant, docker image and
+    file, in a handful of queries instead of one `save()` each. Like `save(ignore_submission_limits=True)`, the
+    limits aren't checked and submission numbers follow the highest one of each participant in `phase`.
+
+    The copies are inserted with `bulk_create`, so nothing is queued for ChaHub until their status changes.
+
+    :param submissions: The CompetitionSubmission to copy, of the same competition as `phase`.
+    :param phase: The CompetitionPhase the copies are submitted to.
+    :return: List of the ids of the new submissions, in the order of `submissions`.
+    """
+    submissions = list(submissions)
+    if not submissions:
+        return []
+    if Configuration.get_cached().disable_all_submissions:
+        logger.info("Submissions have been disabled by admins. Aborting.")
+        raise PermissionDenied("Submissions have been disabled by admins")
+
+    competition = phase.competition
+    file_attr = 's3_file' if settings.USE_AWS else 'file'
+    submitting = CompetitionSubmissionStatus.objects.get_or_create_cached(CompetitionSubmissionStatus.SUBMITTING)
+    teams_by_user = get_competition_teams_by_user(competition) if competition.enable_teams else {}
+    # The base url only depends on the storage, not on the submission
+    file_url_base = get_object_base_url(submissions[0], 'file')
+    participant_ids = set(submission.participant_id for submission in submissions)
+
+    with transaction.atomic():
+        # Same lock as save(), so concurrent uploads of these participants get distinct submission numbers
+        user_ids = dict(
+            CompetitionParticipant.objects.select_for_update().filter(pk__in=participant_ids).order_by('pk')
+            .values_list('pk', 'user_id')
+        )
+        submission_numbers = dict(
+            phase.submissions.filter(participant_id__in=participant_ids).order_by()
+            .values_list('participant_id').annotate(Max('submission_number'))
+        )
+
+        new_submissions = []
+        for submission in submissions:
+            submission_number = (submission_numbers.get(submission.participant_id) or 0) + 1
+            submission_numbers[submission.participant_id] = submission_number
+            new_submissions.append(CompetitionSubmission(
+                participant_id=submission.participant_id,
+                phase=phase,
+                docker_image=submission.docker_image,
+                readable_filename=submission.readable_filename,
+                file_url_base=file_url_base,
+                status=submitting,
+                submission_number=submission_number,
+                secret=str(uuid.uuid4()),
+                team=teams_by_user.get(user_ids[submission.participant_id]),
+                **{file_attr: getattr(submission, file_attr)}
+            ))
+        CompetitionSubmission.objects.bulk_create(new_submissions, batch_size=SUBMISSION_COPY_BATCH_SIZE)
+
+        # bulk_create doesn't set the ids on every database, find them back from the unique secrets
+        ids_by_secret = {}
+        secrets = [new_submission.secret for new_submission in new_submissions]
+        for start in range(0, len(secrets), SUBMISSION_COPY_BATCH_SIZE):
+            ids_by_secret.update(phase.submissions.filter(
+                secret__in=secrets[start:start + SUBMISSION_COPY_BATCH_SIZE],
+            ).values_list('secret', 'pk'))
+    return [ids_by_secret[secret] for secret in secrets]
+
+
 def get_current_phase(competition):
     all_phases = competition.phases.all().order_by('start_date')
     phase_iterator = iter(all_phases)
@@ -553,6 +553,8 @@ var Competition;
                     btn.on('click', function() {
                         Competition.updateSubmissionStatus($('#competitionId').val(), nTr.id, this);
                     });
+                    // Follow the status changes while the details are open
+                    Competition.updateSubmissionStatus($('#competitionId').val(), nTr.id, btn[0]);
                 }
                 if (status === 'Failed' || status === 'Cancelled') {
                     elem.find('a').removeClass('hide');
@@ -562,15 +564,33 @@ var Competition;
         }
     };
 
-    Competition.updateSubmissionStatus = function(competitionId, submissionId, obj) {
-        $(obj).parents('.submission_details').find('.preloader-handler').append("<div class='competitionPreloader'></div>").children().css({ 'top': '25px', 'display': 'block' });
-        var url = '/api/competition/' + competitionId + '/submission/' + submissionId;
+    Competition.updateSubmissionStatus = function(competitionId, submissionId, obj, since) {
+        if (since === undefined) {
+            if ($(obj).data('watching')) {
+                // Status changes are already pushed to this row
+                return;
+            }
+            $(obj).data('watching', true);
+            $(obj).parents('.submission_details').find('.preloader-handler').append("<div class='competitionPreloader'></div>").children().css({ 'top': '25px', 'display': 'block' });
+        }
+        var url = '/api/competition/' + competitionId + '/submission/' + submissionId + '/status';
+        var params = {};
+        if (since !== undefined) {
+            // Held by the server until the status changes
+            params.since = since;
+        }
         $.ajax({
             type: 'GET',
             url: url,
             cache: false,
+            data: params,
             success: function(data) {
                 $('#user_results #' + submissionId).find('.statusName').html(Competition.getSubmissionStatus(data.status));
+                if (data.status === 'submitting' || data.status === 'submitted' || data.status === 'running') {
+                    Competition.updateSubmissionStatus(competitionId, submissionId, obj, data.version);
+                } else {
+                    $(obj).data('watching', false);
+                }
                 if (data.status === 'finished') {
                     $('#user_results #' + submissionId + 'input:hidden').val('1');
                     var phasestate = $('#phasestate').val();
@@ -617,7 +637,8 @@ var Competition;
                 $('.competitionPreloader').hide();
             },
             error: function(xhr, status, err) {
-
+                $(obj).data('watching', false);
+                $('.competitionPreloader').hide();
             }
         });
     };
@@ -330,12 +330,18 @@ var CodaLab;
                         cache: false,
                         data: { 'id': trackingId, 'name': file.name, 'type': file.type, 'size': file.size }
                     }).done(function(data) {
-                        var wait_for_competition = function() {
+                        var token = data.token;
+                        var wait_for_competition = function(since) {
+                            var params = { 'csrfmiddlewaretoken': $("input[name='csrfmiddlewaretoken']").val() };
+                            if (since !== undefined) {
+                                // Held by the server until the status changes
+                                params.since = since;
+                            }
                             $.ajax({
-                                url: '/api/competition/create/' + data.token,
+                                url: '/api/competition/create/' + token,
                                 type: 'get',
                                 cache: false,
-                                data: { 'csrfmiddlewaretoken': $("input[name='csrfmiddlewaretoken']").val() }
+                                data: params
                             }).done(function(data) {
                                 if (data.status == 'finished') {
                                     $('#details').html('Congratulations! ' +
@@ -347,7 +353,7 @@ var CodaLab;
                                     $('#details').html('<div class="alert alert-error">Oops! There was a problem creating the competition: <br><pre>' + data.error + '</pre></div>');
                                     $('#uploadButton').removeClass('disabled');
                                 } else {
-                                    setTimeout(wait_for_competition, 1000);
+                                    wait_for_competition(data.version);
                                 }
                             }).fail(function() {
                                 $('#details').html('<div class="alert alert-error">An unexpected error occurred.</div>');
@@ -0,0 +1,244 @@
+"""
+Generates competitions at realistic scale, with leaderboards, teams and scored submissions, for the benchmark
+suite in `benchmarks/` and the `random_competitions` management command.
+
+Rows are inserted with `bulk_create`, so model `save()` side effects (quota checks, ChaHub updates, storage
+lookups) are skipped on purpose.
+"""
+import datetime
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.db.models import AutoField
+from django.utils import timezone
+
+from apps.teams.models import Team, TeamMembership, TeamMembershipStatus, TeamStatus
+from apps.web.models import Competition, CompetitionParticipant, CompetitionPhase, CompetitionSubmission, \
+    CompetitionSubmissionStatus, ParticipantStatus, PhaseLeaderBoard, PhaseLeaderBoardEntry, \
+    SubmissionComputedScore, SubmissionComputedScoreField, SubmissionResultGroup, SubmissionResultGroupPhase, \
+    SubmissionScore, SubmissionScoreDef, SubmissionScoreDefGroup, SubmissionScoreSet
+
+User = get_user_model()
+
+# Rows inserted per query, lowered to what the database accepts (e.g. 999 parameters on SQLite)
+BULK_BATCH_SIZE = 1000
+
+
+def _bulk_create(model, objects):
+    fields = [field for field in model._meta.concrete_fields if not isinstance(field, AutoField)]
+    batch_size = min(BULK_BATCH_SIZE, connection.ops.bulk_batch_size(fields, objects))
+    model.objects.bulk_create(objects, batch_size=max(batch_size, 1))
+
+
+def create_score_columns(competition, phases, score_columns=3, computed_columns=('Avg', 'MRR')):
+    """
+    Creates one leaderboard shared by `phases` with `score_columns` scored columns, followed by one computed
+    column per operation of `computed_columns` over all of them. The first computed column is the default
+    sort column when there is one.
+
+    :return: List of the non computed `SubmissionScoreDef`.
+    """
+    group = SubmissionResultGroup.objects.create(competition=competition, key='results', label='Results')
+    for phase in phases:
+        SubmissionResultGroupPhase.objects.create(group=group, phase=phase)
+
+    scoredefs = []
+    for number in range(1, score_columns + 1):
+        scoredef = SubmissionScoreDef.objects.create(
+            competition=competition,
+            key='score_{}'.format(number),
+            label='Score {}'.format(number),
+            sorting='desc' if number % 2 else 'asc',
+            numeric_format='4',
+            show_rank=True,
+            selection_default=0 if computed_columns else int(number == 1),
+            ordering=number,
+        )
+        scoredefs.append(scoredef)
+
+    computed_scoredefs = []
+    for number, operation in enumerate(computed_columns, start=score_columns + 1):
+        scoredef = SubmissionScoreDef.objects.create(
+            competition=competition,
+            key=operation.lower(),
+            label=operation,
+            sorting='asc' if operation == 'Avg' else 'desc',
+            numeric_format='2',
+            show_rank=True,
+            selection_default=int(not computed_scoredefs),
+            computed=True,
+            ordering=number,
+        )
+        computed = SubmissionComputedScore.objects.create(scoredef=scoredef, operation=operation)
+        _bulk_create(SubmissionComputedScoreField, [
+            SubmissionComputedScoreField(computed=computed, scoredef=field) for field in scoredefs
+        ])
+        computed_scoredefs.append(scoredef)
+
+    for scoredef in scoredefs + computed_scoredefs:
+        SubmissionScoreDefGroup.objects.create(scoredef=scoredef, group=group)
+        SubmissionScoreSet.objects.create(
+            competition=competition,
+            key=scoredef.key,
+            label=scoredef.label,
+            scoredef=scoredef,
+            ordering=scoredef.ordering,
+        )
+    return scoredefs
+
+
+def create_participants(competition, count, prefix, password=None, status=ParticipantStatus.APPROVED):
+    """
+    Creates `count` users named `<prefix>_<number>` and approves them in `competition`, or gives them another
+    `status` codename. They can only log in when a `password` is given.
+
+    :return: List of the `CompetitionParticipant`, with their user selected.
+    """
+    usernames = ['{}_{}'.format(prefix, number) for number in range(count)]
+    # Hashing is slow on purpose, every user shares the same hash
+    password_hash = make_password(password)
+    _bulk_create(User, [
+        User(username=username, email='{}@example.com'.format(username), password=password_hash)
+        for username in usernames
+    ])
+    participant_status = ParticipantStatus.objects.get_or_create(
+        codename=status,
+        defaults={'name': status.capitalize()},
+    )[0]
+    users = User.objects.filter(username__in=usernames).order_by('pk')
+    _bulk_create(CompetitionParticipant, [
+        CompetitionParticipant(user=user, competition=competition, status=participant_status) for user in users
+    ])
+    return list(competition.participants.filter(user__username__in=usernames).select_related('user').order_by('pk'))
+
+
+def create_teams(competition, participants, count):
+    """Splits `participants` in `count` approved teams, created by their first member."""
+    team_status = TeamStatus.objects.get_or_create(
+        codename=TeamStatus.APPROVED,
+        defaults={'name': 'Approved', 'description': 'Approved'},
+    )[0]
+    membership_status = TeamMembershipStatus.objects.get_or_create(
+        codename=TeamMembershipStatus.APPROVED,
+        defaults={'name': 'Approved', 'description': 'Approved'},
+    )[0]
+    members = [participants[number::count] for number in range(count)]
+    members = [team_members for team_members in members if team_members]
+    _bulk_create(Team, [
+        Team(
+            name='Team {}'.format(number),
+            competition=competition,
+            creator=team_members[0].user,
+            status=team_status,
+            image_url_base='',
+        )
+        for number, team_members in enumerate(members)
+    ])
+    teams = Team.objects.filter(competition=competition).order_by('pk')
+    start_date = timezone.now() - datetime.timedelta(days=1)
+    _bulk_create(TeamMembership, [
+        TeamMembership(
+            user=participant.user,
+            team=team,
+            is_request=True,
+            start_date=start_date,
+            status=membership_status,
+        )
+        for team, team_members in zip(teams, members)
+        for participant in team_members[1:]
+    ])
+
+
+def create_scored_submissions(phase, participants, scoredefs, count, rng):
+    """
+    Creates `count` finished submissions to `phase` spread over `participants`, with a random score for each of
+    `scoredefs`, and puts the latest submission of each participant on the leaderboard.
+    """
+    finished = CompetitionSubmissionStatus.objects.get_or_create(
+        codename=CompetitionSubmissionStatus.FINISHED,
+        defaults={'name': 'Finished'},
+    )[0]
+    submission_numbers = {}
+    submissions = []
+    for number in range(count):
+        participant = participants[number % len(participants)]
+        submission_numbers[participant.pk] = submission_numbers.get(participant.pk, 0) + 1
+        submissions.append(CompetitionSubmission(
+            participant=participant,
+            phase=phase,
+            status=finished,
+            submission_number=submission_numbers[participant.pk],
+            file='synthetic/{}/{}.zip'.format(phase.pk, number),
+            readable_filename='{}.zip'.format(number),
+            secret='synthetic',
+        ))
+    _bulk_create(CompetitionSubmission, submissions)
+
+    submission_ids = list(phase.submissions.order_by('pk').values_list('pk', flat=True))
+    scores = [
+        SubmissionScore(result_id=submission_id, scoredef=scoredef, value=round(rng.uniform(0, 1), 6))
+        for submission_id in submission_ids
+        for scoredef in scoredefs
+    ]
+    _bulk_create(SubmissionScore, scores)
+
+    board = PhaseLeaderBoard.objects.get_or_create(phase=phase)[0]
+    latest_ids = {}
+    for participant_id, submission_id in phase.submissions.order_by('pk').values_list('participant_id', 'pk'):
+        latest_ids[participant_id] = submission_id
+    _bulk_create(PhaseLeaderBoardEntry, [
+        PhaseLeaderBoardEntry(board=board, result_id=submission_id) for submission_id in latest_ids.values()
+    ])
+    return submission_ids
+
+
+def create_synthetic_competition(creator, title='Synthetic competition', phases=1, score_columns=3,
+                                 computed_columns=('Avg', 'MRR'), participants=100, teams=10, submissions=1000,
+                                 seed=None, password=None):
+    """
+    Creates a published competition with `phases` phases, all started, sharing one leaderboard. Every phase
+    gets `submissions` finished and scored submissions from `participants` approved participants, grouped in
+    `teams` teams (teams are disabled when 0).
+
+    :param seed: Seed of the random scores, to generate the same leaderboard twice.
+    :param password: Password of the participants, named `synthetic_<competition pk>_<number>`.
+    :return: The Competition.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    competition = Competition.objects.create(
+        title=title,
+        description='Synthetic competition with {} submissions per phase'.format(submissions),
+        creator=creator,
+        modified_by=creator,
+        published=True,
+        enable_teams=teams > 0,
+    )
+    competition_phases = [
+        CompetitionPhase.objects.create(
+            competition=competition,
+            phasenumber=number,
+            label='Phase {}'.format(number),
+            start_date=now - datetime.timedelta(days=10 * (phases - number + 1)),
+            max_submissions=submissions + 1000,
+            max_submissions_per_day=submissions + 1000,
+        )
+        for number in range(1, phases + 1)
+    ]
+    # Takes its start date from the first phase
+    competition.save()
+    scoredefs = create_score_columns(competition, competition_phases, score_columns, computed_columns)
+
+    competition_participants = create_participants(
+        competition,
+        participants,
+        prefix='synthetic_{}'.format(competition.pk),
+        password=password,
+    )
+    if teams:
+        create_teams(competition, competition_participants, teams)
+    for phase in competition_phases:
+        create_scored_submissions(phase, competition_participants, scoredefs, submissions, rng)
+    return competition
@@ -11,11 +11,16 @@ import traceback
 import yaml
 import zipfile
 import datetime
+from apps.analytics.models import get_analytics_snapshot
 from apps.authenz.models import ClUser
-from apps.chahub.models import ChaHubSaveMixin
+from apps.chahub.models import ChaHubSaveMixin, ChaHubOutboxEntry
+from apps.chahub.tasks import deliver_chahub_outbox
 from apps.chahub.utils import send_to_chahub
 from apps.coopetitions.models import DownloadRecord
+from apps.emails.models import queue_email, queue_mass_email
 from apps.health.models import (CompetitionStorageDataPoint,
+                                SubmissionLifecycleEvent,
+                                record_submission_event,
                                 UserStorageDataPoint,
                                 StorageSnapshot,
                                 StorageUsageHistory)
@@ -23,9 +28,11 @@ from apps.jobs.models import (Job,
                               run_job_task,
                               JobTaskResult,
                               update_job_status_task)
+from apps.jobs.notifications import publish_status_on_commit, submission_channel
 from apps.web import models
 from apps.web.models import CompetitionDump
 from apps.web.models import (add_submission_to_leaderboard,
+                             copy_submissions_to_phase,
                              Competition,
                              CompetitionSubmission,
                              CompetitionDefBundle,
@@ -34,7 +41,7 @@ from apps.web.models import (add_submission_to_leaderboard,
                              SubmissionScore,
                              SubmissionScoreDef,
                              CompetitionSubmissionMetadata, BundleStorage, SubmissionResultGroup,
-                             SubmissionScoreDefGroup, OrganizerDataSet, CompetitionParticipant, ParticipantStatus)
+                             SubmissionScoreDefGroup)
 from apps.web.utils import inheritors, push_submission_to_leaderboard_if_best, s3_key_from_url, \
     get_competition_size_data, delete_submissions_except_best_and_or_last, storage_recursive_find
 from botocore.exceptions import ClientError
@@ -47,9 +54,8 @@ from datetime import timedelta
 from django.conf import settings
 from django.contrib.sites.models import Site
 from django.core.files.base import ContentFile
-from django.core.mail import EmailMultiAlternatives, send_mail
 from django.db import transaction
-from django.db.models import Count
+from django.db.models import Count, Min
 from django.template.loader import render_to_string
 from django.utils import timezone
 from zipfile import ZipFile
@@ -129,13 +135,17 @@ def _set_submission_status(submission_id, status_codename):
     submission_id: PK of CompetitionSubmission object.
     status_codename: New status codename.
     """
-    status = CompetitionSubmissionStatus.objects.get(codename=status_codename)
+    status = CompetitionSubmissionStatus.objects.get_cached(status_codename)
     with transaction.atomic():
         submission = CompetitionSubmission.objects.select_for_update().get(pk=submission_id)
         old_status_codename = submission.status.codename
         if old_status_codename not in _FINAL_STATES:
             submission.status = status
             submission.save()
+            publish_status_on_commit(submission_channel(submission_id), {
+                'status': status_codename,
+                'exception_details': submission.exception_details,
+            })
             logger.info("Changed submission status from %s to %s (id=%s).",
                         old_status_codename, status_codename, submission_id)
         else:
@@ -525,6 +535,7 @@ def score(submission, job_id):
     submission.save()
     # Submit the request to the computation service
     _prepare_compute_worker_run(job_id, submission, is_prediction=False)
+    record_submission_event(submission, SubmissionLifecycleEvent.SCORING_DISPATCHED)
 
     if has_generated_predictions == False:
         _set_submission_status(submission.id, CompetitionSubmissionStatus.SUBMITTED)
@@ -579,6 +590,10 @@ def update_submission(job_id, args, secret):
 
         if status == 'running':
             _set_submission_status(submission.id, CompetitionSubmissionStatus.RUNNING)
+            record_submission_event(
+                submission,
+                SubmissionLifecycleEvent.SCORING_PICKED_UP if 'score' in state else SubmissionLifecycleEvent.PICKED_UP
+            )
             return Job.RUNNING
 
         if status == 'finished':
@@ -611,6 +626,7 @@ def update_submission(job_id, args, secret):
                             logger.info("Score %s does not exist (submission_id=%s)", label, submission.id)
                 logger.info("Done processing scores... (submission_id=%s)", submission.id)
                 _set_submission_status(submission.id, CompetitionSubmissionStatus.FINISHED)
+                record_submission_event(submission, SubmissionLifecycleEvent.SCORES_INGESTED)
 
                 if submission.phase.delete_submissions_except_best_and_last:
                     delete_submissions_except_best_and_or_last(submission)
@@ -627,18 +643,20 @@ def update_submission(job_id, args, secret):
 
                 if submission.phase.force_best_submission_to_leaderboard:
                     push_submission_to_leaderboard_if_best(submission)
+
+                if submission.phase.force_best_submission_to_leaderboard or \
+                        submission.phase.competition.force_submission_to_leaderboard or submission.phase.is_blind:
+                    record_submission_event(submission, SubmissionLifecycleEvent.LEADERBOARD_UPDATED)
                 result = Job.FINISHED
 
                 if submission.participant.user.email_on_submission_finished_successfully:
                     email = submission.participant.user.email
                     site_url = "https://%s%s" % (Site.objects.get_current().domain, submission.phase.competition.get_absolute_url())
-                    send_mail(
+                    queue_email(
                         'Submission has finished successfully!',
                         'Your submission to the competition "%s" has finished successfully! View it here: %s' %
                         (submission.phase.competition.title, site_url),
-                        settings.DEFAULT_FROM_EMAIL,
                         [email],
-                        fail_silently=False
                     )
             else:
                 logger.debug("update_submission_task entering scoring phase (pk=%s)", submission.pk)
@@ -647,6 +665,7 @@ def update_submission(job_id, args, secret):
                 # submission.prediction_stderr_file.name = pathname2url(predict_submission_stdout_filename(submission))
                 # submission.prediction_stdout_file.name = pathname2url(predict_submission_stderr_filename(submission))
                 # submission.save()
+                record_submission_event(submission, SubmissionLifecycleEvent.PREDICT_FINISHED)
                 try:
                     score(submission, job_id)
                     result = Job.RUNNING
@@ -722,36 +741,41 @@ def update_submission(job_id, args, secret):
 
 @task(queue='site-worker', soft_time_limit=60 * 60 * 1)
 def re_run_all_submissions_in_phase(phase_pk):
-    phase = CompetitionPhase.objects.get(id=phase_pk)
+    phase = CompetitionPhase.objects.select_related('competition').get(id=phase_pk)
 
-    # Remove duplicate submissions this ugly way because MySQL distinct doesn't work...
-    submissions_with_duplicates = CompetitionSubmission.objects.filter(phase=phase)
-    submissions_without_duplicates = []
-    file_names_seen = []
+    # Only the first submission of each file is re-ran, grouped in SQL because MySQL has no DISTINCT ON
+    file_attr = 's3_file' if settings.USE_AWS else 'file'
+    first_submission_ids = phase.submissions.order_by().values(file_attr).annotate(
+        first_id=Min('pk'),
+    ).values_list('first_id', flat=True)
+    submissions = phase.submissions.filter(pk__in=first_submission_ids).order_by('pk')
 
-    for submission in submissions_with_duplicates:
-        if submission.file.name not in file_names_seen:
-            if settings.USE_AWS:
-                file_names_seen.append(submission.s3_file)
-            else:
-                file_names_seen.append(submission.file.name)
-            submissions_without_duplicates.append(submission)
+    new_submission_ids = copy_submissions_to_phase(submissions, phase)
+    logger.info("Re-running %s submissions of phase pk=%s", len(new_submission_ids), phase_pk)
+    dispatch_submission_evaluations(new_submission_ids, phase.is_scoring_only)
 
-    for submission in submissions_without_duplicates:
-        if settings.USE_AWS:
-            file_kwarg = {'s3_file': submission.s3_file}
-        else:
-            file_kwarg = {'file': submission.file}
 
-        new_submission = CompetitionSubmission(
-            participant=submission.participant,
-            phase=submission.phase,
-            docker_image=submission.docker_image,
-            **file_kwarg
+def dispatch_submission_evaluations(submission_ids, is_scoring_only):
+    """
+    Sends the evaluation of many submissions to the compute workers, `SUBMISSION_DISPATCH_CHUNK_SIZE` at a time
+    every `SUBMISSION_DISPATCH_INTERVAL` seconds, so re-running a whole phase doesn't flood the broker. The first
+    chunk is sent right away.
+    """
+    chunk_size = settings.SUBMISSION_DISPATCH_CHUNK_SIZE
+    for submission_id in submission_ids[:chunk_size]:
+        evaluate_submission.apply_async((submission_id, is_scoring_only))
+
+    remaining_ids = submission_ids[chunk_size:]
+    if remaining_ids:
+        dispatch_submission_evaluations_task.apply_async(
+            (remaining_ids, is_scoring_only),
+            countdown=settings.SUBMISSION_DISPATCH_INTERVAL,
         )
-        new_submission.save(ignore_submission_limits=True)
 
-        evaluate_submission.apply_async((new_submission.pk, submission.phase.is_scoring_only))
+
+@task(queue='site-worker')
+def dispatch_submission_evaluations_task(submission_ids, is_scoring_only):
+    dispatch_submission_evaluations(submission_ids, is_scoring_only)
 
 
 @task(queue='site-worker')
@@ -778,12 +802,14 @@ def evaluate_submission(submission_id, is_scoring_only):
         submission = CompetitionSubmission.objects.get(pk=submission_id)
     except CompetitionSubmission.DoesNotExist:
         return
+    record_submission_event(submission, SubmissionLifecycleEvent.SUBMITTED, timestamp=submission.submitted_at)
 
     task_name, task_func = ('prediction', predict) if predict_and_score else ('scoring', score)
     try:
         logger.debug("evaluate_submission dispatching %s task (submission_id=%s, job_id=%s)",
                     task_name, submission_id, job_id)
         task_func(submission, job_id)
+        record_submission_event(submission, SubmissionLifecycleEvent.DISPATCHED)
         logger.debug("evaluate_submission dispatched %s task (submission_id=%s, job_id=%s)",
                     task_name, submission_id, job_id)
     except Exception:
@@ -805,11 +831,9 @@ def send_mass_email(competition_pk, body=None, subject=None, from_email=None, to
     text = render_to_string("emails/notifications/participation_organizer_direct_email.txt", context)
     html = render_to_string("emails/notifications/participation_organizer_direct_email.html", context)
 
-    message = EmailMultiAlternatives(subject, text, from_email, to=None, bcc=to_emails)
-    message.attach_alternative(html, 'text/html')
-    message.send()
+    queue_mass_email(subject, text, to_emails, html_body=html, from_email=from_email)
 
-    logger.info("Finished sending emails.")
+    logger.info("Finished queueing emails.")
 
 
 @task(queue='site-worker')
@@ -826,7 +850,11 @@ def do_chahub_retries(limit=None):
         # This base exception works for HTTP errors, Connection errors, etc.
         return
 
-    logger.info("ChaHub is online, checking for objects needing to be re-sent to ChaHub")
+    logger.info("ChaHub is online, retrying the ChaHub outbox")
+    # Entries waiting for their next attempt are retried right away
+    ChaHubOutboxEntry.objects.filter(sent_at__isnull=True, attempts__gt=0).update(next_attempt_at=timezone.now())
+
+    # Objects whose entries ran out of attempts are queued again
     chahub_models = inheritors(ChaHubSaveMixin)
     for model in chahub_models:
         # Special case for competition model manager, with deleted competitions
@@ -838,29 +866,21 @@ def do_chahub_retries(limit=None):
         if limit:
             needs_retry = needs_retry[:limit]
         for instance in needs_retry:
-            # Saving forces chahub update
-            instance.save(force_to_chahub=True)
+            instance.queue_chahub_update(force_to_chahub=True)
+
+    deliver_chahub_outbox.apply_async()
 
 
 @task(queue='site-worker')
 def send_chahub_general_stats():
-    if settings.DATABASES.get('default').get('ENGINE') == 'django.db.backends.postgresql_psycopg2':
-        # Only Postgres supports 'distinct', so if we can use the database, if not use some Python Set magic
-        # Order by creator because "SELECT DISTINCT ON expressions must match initial ORDER BY expressions"
-        organizer_count = Competition.objects.order_by('creator').distinct('creator').count()
-    else:
-        users_with_competitions = list(ClUser.objects.filter(competitioninfo_creator__isnull=False))
-        user_set = set(users_with_competitions)
-        # Only unique users that have competitions
-        organizer_count = len(user_set)
-    approved_status = ParticipantStatus.objects.get(codename=ParticipantStatus.APPROVED)
+    snapshot = get_analytics_snapshot()
     data = {
-        'competition_count': Competition.objects.filter(published=True).count(),
-        'dataset_count': OrganizerDataSet.objects.count(),
-        'participant_count': CompetitionParticipant.objects.filter(status=approved_status).count(),
-        'submission_count': CompetitionSubmission.objects.count(),
-        'user_count': ClUser.objects.count(),
-        'organizer_count': organizer_count
+        'competition_count': snapshot.competitions_published_count,
+        'dataset_count': snapshot.dataset_count,
+        'participant_count': snapshot.approved_participant_count,
+        'submission_count': snapshot.submission_count,
+        'user_count': snapshot.user_count,
+        'organizer_count': snapshot.organizer_count
     }
 
     try:
@@ -874,9 +894,9 @@ def send_chahub_general_stats():
 def send_chahub_updates():
     competitions = Competition.objects.filter(published=True).annotate(participant_count=Count('participants'))
     for comp in competitions:
-        # saving generates new participant_count -- will be sent if it is different from
-        # what was sent last time.
-        comp.save()
+        # queues the new participant_count -- only if it is different from
+        # what was queued last time.
+        comp.queue_chahub_update()
 
 
 @task(queue='site-worker', soft_time_limit=60*60*12) # 12 hours
@@ -9,6 +9,7 @@ from django.contrib.auth import get_user_model
 from apps.web.models import (Competition,
                              CompetitionParticipant,
                              ParticipantStatus,)
+from apps.emails.models import send_queued_emails
 from apps.web import tasks
 
 User = get_user_model()
@@ -225,6 +226,7 @@ class SendMassEmailTests(TestCase):
             "to_emails": [u.email for u in self.users]
         }
         tasks.send_mass_email(**task_args)
+        send_queued_emails()
 
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(len(mail.outbox[0].to), 0)  # make sure we're only sending BCC!!
@@ -240,6 +242,7 @@ class SendMassEmailTests(TestCase):
             "to_emails": [self.users[0].email]
         }
         tasks.send_mass_email(**task_args)
+        send_queued_emails()
 
         m = mail.outbox[0]
         self.assertIn("http://example.com/my/settings", m.body)
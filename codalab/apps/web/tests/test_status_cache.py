@@ -0,0 +1,85 @@
+import mock
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError, transaction
+from django.test import TestCase
+
+from apps.teams.models import Team, TeamStatus, get_competition_teams
+from apps.web.models import Competition, CompetitionSubmissionStatus
+
+User = get_user_model()
+
+
+class StatusCacheTests(TestCase):
+    def setUp(self):
+        # The test transaction never commits, invalidate the cached statuses right away instead
+        on_commit_patcher = mock.patch('apps.web.managers.transaction.on_commit',
+                                       side_effect=lambda func: func())
+        on_commit_patcher.start()
+        self.addCleanup(on_commit_patcher.stop)
+        self.finished = CompetitionSubmissionStatus.objects.create(name="Finished", codename="finished")
+
+    def test_statuses_are_cached_by_codename(self):
+        assert CompetitionSubmissionStatus.objects.get_cached("finished") == self.finished
+        with self.assertNumQueries(0):
+            status = CompetitionSubmissionStatus.objects.get_cached("finished")
+            assert CompetitionSubmissionStatus.objects.get_cached_id("finished") == self.finished.pk
+        assert status.name == "Finished"
+        assert status is not CompetitionSubmissionStatus.objects.get_cached("finished")
+
+    def test_unknown_codename_raises_does_not_exist(self):
+        with self.assertRaises(CompetitionSubmissionStatus.DoesNotExist):
+            CompetitionSubmissionStatus.objects.get_cached("unknown")
+
+    def test_saving_a_status_invalidates_the_cache(self):
+        CompetitionSubmissionStatus.objects.get_cached("finished")
+        self.finished.codename = "done"
+        self.finished.save()
+
+        assert CompetitionSubmissionStatus.objects.get_cached("done") == self.finished
+        with self.assertRaises(CompetitionSubmissionStatus.DoesNotExist):
+            CompetitionSubmissionStatus.objects.get_cached("finished")
+
+    def test_get_or_create_cached(self):
+        submitting = CompetitionSubmissionStatus.objects.get_or_create_cached(CompetitionSubmissionStatus.SUBMITTING)
+
+        assert submitting.pk is not None
+        with self.assertNumQueries(0):
+            assert CompetitionSubmissionStatus.objects.get_or_create_cached(
+                CompetitionSubmissionStatus.SUBMITTING
+            ) == submitting
+
+    def test_team_helpers_do_not_query_statuses(self):
+        user = User.objects.create_user(username="creator", password="pass")
+        competition = Competition.objects.create(creator=user, modified_by=user)
+        approved = TeamStatus.objects.create(name="Approved", codename=TeamStatus.APPROVED, description="Approved")
+        Team.objects.create(name="Team", competition=competition, creator=user, status=approved)
+        TeamStatus.objects.get_cached(TeamStatus.APPROVED)
+
+        with self.assertNumQueries(1):
+            assert len(get_competition_teams(competition)) == 1
+
+    def test_the_cache_is_invalidated_when_the_transaction_commits(self):
+        CompetitionSubmissionStatus.objects.get_cached("finished")
+
+        with mock.patch('apps.web.managers.transaction.on_commit') as on_commit:
+            self.finished.name = "Done"
+            self.finished.save()
+            # The uncommitted row is read again every time, never cached
+            with self.assertNumQueries(1):
+                assert CompetitionSubmissionStatus.objects.get_cached("finished").name == "Done"
+
+            on_commit.call_args[0][0]()
+        CompetitionSubmissionStatus.objects.get_cached("finished")
+        with self.assertNumQueries(0):
+            assert CompetitionSubmissionStatus.objects.get_cached("finished").name == "Done"
+
+    def test_rolled_back_statuses_are_not_cached(self):
+        with mock.patch('apps.web.managers.transaction.on_commit'):
+            with self.assertRaises(DatabaseError):
+                with transaction.atomic():
+                    CompetitionSubmissionStatus.objects.get_or_create_cached("phantom")
+                    CompetitionSubmissionStatus.objects.get_cached("phantom")
+                    raise DatabaseError
+
+            with self.assertRaises(CompetitionSubmissionStatus.DoesNotExist):
+                CompetitionSubmissionStatus.objects.get_cached("phantom")
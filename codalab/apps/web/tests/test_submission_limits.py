@@ -0,0 +1,89 @@
+import datetime
+
+import pytest
+from django.core.exceptions import PermissionDenied
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from apps.customizer.models import Configuration
+from apps.web.models import (Competition,
+                             CompetitionParticipant,
+                             ParticipantStatus,
+                             CompetitionSubmission,
+                             CompetitionPhase,
+                             CompetitionSubmissionStatus)
+
+User = get_user_model()
+
+
+class CompetitionSubmissionLimitTests(TestCase):
+
+    def setUp(self):
+        self.customizer_configuration = Configuration.objects.create(disable_all_submissions=False)
+        self.organizer_user = User.objects.create_user(username="organizer", password="pass")
+        self.participant_user = User.objects.create_user(username="participant", password="pass")
+        self.competition = Competition.objects.create(
+            title="Test Competition",
+            creator=self.organizer_user,
+            modified_by=self.organizer_user,
+            published=True
+        )
+        self.participant_1 = CompetitionParticipant.objects.create(
+            user=self.participant_user,
+            competition=self.competition,
+            status=ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        )
+        self.phase_1 = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+            max_submissions=5,
+            max_submissions_per_day=2,
+            max_submission_size=0,
+        )
+        self.phase_2 = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=2,
+            start_date=datetime.datetime.now() + datetime.timedelta(days=30),
+            max_submission_size=0,
+        )
+        self.failed = CompetitionSubmissionStatus.objects.create(name="failed", codename="failed")
+
+    def _submit(self, phase):
+        return CompetitionSubmission.objects.create(participant=self.participant_1, phase=phase)
+
+    def test_submission_limit_counts_are_gathered_per_phase(self):
+        self._submit(self.phase_1)
+        failed_submission = self._submit(self.phase_1)
+        CompetitionSubmission.objects.filter(pk=failed_submission.pk).update(status=self.failed, sub_size=500)
+        self._submit(self.phase_2)
+
+        counts = CompetitionSubmission(participant=self.participant_1, phase=self.phase_1).get_submission_limit_counts()
+
+        assert counts['max_submission_number'] == 2
+        assert counts['phase_count'] == 2
+        assert counts['phase_failed_count'] == 1
+        assert counts['today_count'] == 2
+        assert counts['today_failed_count'] == 1
+        assert counts['stored_size'] == 500
+        assert counts['unsized_count'] == 0
+
+    def test_submission_numbers_increment_per_phase(self):
+        assert self._submit(self.phase_1).submission_number == 1
+        assert self._submit(self.phase_1).submission_number == 2
+        assert self._submit(self.phase_2).submission_number == 1
+
+    def test_failed_submissions_do_not_count_towards_daily_limit(self):
+        first = self._submit(self.phase_1)
+        CompetitionSubmission.objects.filter(pk=first.pk).update(status=self.failed)
+        self._submit(self.phase_1)
+        self._submit(self.phase_1)
+
+        with pytest.raises(PermissionDenied):
+            self._submit(self.phase_1)
+
+    def test_new_submission_limit_checks_use_a_single_aggregate_query(self):
+        self._submit(self.phase_1)
+        submission = CompetitionSubmission(participant=self.participant_1, phase=self.phase_1)
+        with self.assertNumQueries(1):
+            submission.get_submission_limit_counts()
@@ -3,6 +3,7 @@ import mock
 
 from django.core.urlresolvers import reverse
 from django.test import TestCase
+from django.test.utils import override_settings
 from django.test.client import Client
 from django.contrib.auth import get_user_model
 
@@ -16,6 +17,7 @@ from apps.web.models import (Competition,
                              PhaseLeaderBoard,
                              PhaseLeaderBoardEntry,
                              add_submission_to_leaderboard)
+from apps.web.tasks import re_run_all_submissions_in_phase
 
 User = get_user_model()
 
@@ -72,3 +74,79 @@ class SubmissionReRunTests(TestCase):
             resp = self.client.post(self.url)
             self.assertEqual(resp.status_code, 200)
         self.assertTrue(evaluate_mock.called)
+
+
+class PhaseReRunTests(TestCase):
+    def setUp(self):
+        Configuration.objects.create(disable_all_submissions=False)
+        self.organizer = User.objects.create_user(username="organizer", password="pass")
+        self.competition = Competition.objects.create(creator=self.organizer, modified_by=self.organizer, published=True)
+        approved = ParticipantStatus.objects.get_or_create(name='approved', codename=ParticipantStatus.APPROVED)[0]
+        self.participant_1 = CompetitionParticipant.objects.create(
+            user=User.objects.create_user(username="participant_1", password="pass"),
+            competition=self.competition,
+            status=approved,
+        )
+        self.participant_2 = CompetitionParticipant.objects.create(
+            user=User.objects.create_user(username="participant_2", password="pass"),
+            competition=self.competition,
+            status=approved,
+        )
+        self.phase = CompetitionPhase.objects.create(
+            competition=self.competition,
+            phasenumber=1,
+            start_date=datetime.datetime.now() - datetime.timedelta(days=30),
+        )
+        self.finished = CompetitionSubmissionStatus.objects.create(name="finished", codename="finished")
+
+    def make_submission(self, participant, **file_kwargs):
+        return CompetitionSubmission.objects.create(
+            participant=participant,
+            phase=self.phase,
+            status=self.finished,
+            **file_kwargs
+        )
+
+    def re_run(self):
+        # save() gives every new submission the submitting status, so the copies are told apart by their pk
+        original_ids = list(self.phase.submissions.values_list('pk', flat=True))
+        with mock.patch('apps.web.tasks.evaluate_submission.apply_async') as evaluate_mock, \
+                mock.patch('apps.web.tasks.dispatch_submission_evaluations_task.apply_async') as dispatch_mock:
+            re_run_all_submissions_in_phase(self.phase.pk)
+        new_submissions = list(self.phase.submissions.exclude(pk__in=original_ids).order_by('pk'))
+        return new_submissions, evaluate_mock, dispatch_mock
+
+    def test_re_run_copies_each_file_once_with_the_next_submission_numbers(self):
+        first = self.make_submission(self.participant_1, file='submissions/a.zip')
+        self.make_submission(self.participant_1, file='submissions/a.zip')
+        second = self.make_submission(self.participant_2, file='submissions/b.zip')
+
+        new_submissions, evaluate_mock, dispatch_mock = self.re_run()
+
+        assert [s.file.name for s in new_submissions] == [first.file.name, second.file.name]
+        assert [s.participant_id for s in new_submissions] == [self.participant_1.pk, self.participant_2.pk]
+        assert [s.submission_number for s in new_submissions] == [3, 2]
+        assert len(set(s.secret for s in new_submissions)) == 2
+        assert evaluate_mock.call_count == 2
+        assert not dispatch_mock.called
+
+    @override_settings(USE_AWS=True)
+    def test_re_run_dedups_on_the_s3_file_on_aws(self):
+        self.make_submission(self.participant_1, s3_file='submissions/a.zip')
+        self.make_submission(self.participant_1, s3_file='submissions/a.zip')
+        self.make_submission(self.participant_2, s3_file='submissions/b.zip')
+
+        new_submissions, evaluate_mock, dispatch_mock = self.re_run()
+
+        assert [s.s3_file for s in new_submissions] == ['submissions/a.zip', 'submissions/b.zip']
+
+    @override_settings(SUBMISSION_DISPATCH_CHUNK_SIZE=2, SUBMISSION_DISPATCH_INTERVAL=5)
+    def test_re_run_dispatches_evaluations_in_chunks(self):
+        for number in range(5):
+            self.make_submission(self.participant_1, file='submissions/{}.zip'.format(number))
+
+        new_submissions, evaluate_mock, dispatch_mock = self.re_run()
+
+        new_ids = [s.pk for s in new_submissions]
+        assert [call[0][0] for call in evaluate_mock.call_args_list] == [(new_ids[0], True), (new_ids[1], True)]
+        dispatch_mock.assert_called_once_with((new_ids[2:], True), countdown=5)
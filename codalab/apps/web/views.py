@@ -16,11 +16,12 @@ from apps.common.competition_utils import get_most_popular_competitions, get_fea
 from apps.coopetitions.models import Like, Dislike
 from apps.customizer.models import Configuration
 from apps.forums.models import Forum
-from apps.health.models import HealthSettings
+from apps.analytics.models import get_analytics_snapshot
+from apps.health.models import HealthSettings, get_job_metrics
 from apps.jobs.models import Job
 from apps.teams.forms import OrganizerTeamsCSVForm
-from apps.teams.models import Team, get_user_team, get_competition_pending_teams, get_last_team_submissions, \
-    get_user_requests, get_team_pending_membership
+from apps.teams.models import Team, TeamMembership, get_user_team, get_competition_pending_teams, \
+    get_last_team_submissions, get_user_requests, get_team_pending_membership, get_competition_teams_by_user
 from apps.web import forms
 from apps.web import models
 from apps.web import tasks
@@ -41,7 +42,7 @@ from django.core.exceptions import PermissionDenied
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.urlresolvers import reverse
 from django.db import connection
-from django.db.models import Q, Max, Min, Count, Case, When
+from django.db.models import Q, Max, Min, Count
 from django.http import Http404, HttpResponseForbidden
 from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import render_to_response, render, get_object_or_404, redirect
@@ -132,7 +133,7 @@ class HomePageView(TemplateView):
             popular_competitions_to_filter=popular_competitions
         )
 
-        config, _ = Configuration.objects.get_or_create(pk=1)
+        config = Configuration.get_cached()
         context["front_page_message"] = mark_safe(config.front_page_message)
         return context
 
@@ -142,18 +143,13 @@ class Highlights(TemplateView):
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
         
-        data = Competition.objects.aggregate(
-            count=Count('*'),
-            published_comps=Count(Case(When(published=True, then=1))),
-            unpublished_comps=Count(Case(When(published=False, then=1)))
-        )
-                    
-        total_competitions = data['count']
-        public_competitions = data['published_comps']
-        private_competitions = data['unpublished_comps']
-        users = User.objects.all().count() # from authenz_cluser
-        competition_participants = models.CompetitionParticipant.objects.all().count()
-        submissions = models.CompetitionSubmission.objects.all().count()
+        snapshot = get_analytics_snapshot()
+        total_competitions = snapshot.competition_count
+        public_competitions = snapshot.competitions_published_count
+        private_competitions = snapshot.competition_count - snapshot.competitions_published_count
+        users = snapshot.user_count
+        competition_participants = snapshot.participant_count
+        submissions = snapshot.submission_count
 
         context['general_stats'] = [
             {'label': "Total Competitions", 'count': total_competitions},
@@ -236,7 +232,7 @@ def my_index(request):
         - User needs to be authenticated.
     """
     try:
-        denied = models.ParticipantStatus.objects.get(codename=models.ParticipantStatus.DENIED)
+        denied = models.ParticipantStatus.objects.get_cached(models.ParticipantStatus.DENIED)
     except:
         denied = -1
 
@@ -363,7 +359,7 @@ class CompetitionEdit(LoginRequiredMixin, NamedFormsetsMixin, UpdateWithInlinesV
             phase_form.instance.save()
 
         # Look for admins that are not participants yet
-        approved_status = models.ParticipantStatus.objects.get(codename=models.ParticipantStatus.APPROVED)
+        approved_status = models.ParticipantStatus.objects.get_cached(models.ParticipantStatus.APPROVED)
 
         for admin in form.instance.admins.all():
             try:
@@ -494,7 +490,7 @@ def competition_message_participants(request, competition_id):
 
     participants = models.CompetitionParticipant.objects.filter(
         competition=competition,
-        status=models.ParticipantStatus.objects.get(codename="approved"),
+        status=models.ParticipantStatus.objects.get_cached("approved"),
         user__organizer_direct_message_updates=True,
     )
     emails = [p.user.email for p in participants]
@@ -784,12 +780,7 @@ class CompetitionSubmissionsPage(LoginRequiredMixin, TemplateView):
         except ObjectDoesNotExist:
             pass
 
-        jobs_today = Job.objects.filter(
-            created__year=datetime.today().year,
-            created__day=datetime.today().day,
-            created__month=datetime.today().month)
-        
-        jobs_today_pending = len(jobs_today.filter(status=Job.PENDING))
+        jobs_today_pending = get_job_metrics().today_pending_count
 
         health_settings = HealthSettings.objects.get_or_create(pk=1)[0]
         submission_pending_threshold = health_settings.congestion_threshold
@@ -1032,6 +1023,10 @@ class MyCompetitionParticipantView(LoginRequiredMixin, ListView):
     """View that returns all participants from a competition."""
     queryset = models.CompetitionParticipant.objects.all()
     template_name = 'web/my/participants.html'
+    participants_per_page = 100
+
+    def get_queryset(self):
+        return self.queryset.filter(competition_id=self.kwargs.get('competition_id'))
 
     def get_context_data(self, **kwargs):
         context = super(MyCompetitionParticipantView, self).get_context_data(**kwargs)
@@ -1105,40 +1100,67 @@ class MyCompetitionParticipantView(LoginRequiredMixin, ListView):
         if competition.creator != self.request.user and self.request.user not in competition.admins.all():
             raise Http404()
 
-        comp_participants = self.queryset.filter(competition=competition).select_related('user', 'status').prefetch_related('submissions').order_by('pk')
+        comp_participants = self.queryset.filter(competition=competition).select_related('user', 'status').order_by('pk')
 
         # All submissions
-        comp_submissions = CompetitionSubmission.objects.filter(participant__competition=competition).select_related('team')
+        comp_submissions = CompetitionSubmission.objects.filter(participant__competition=competition)
+
+        # Teams of every participant and their submission counts, resolved in bulk rather than per participant
+        teams_by_user = get_competition_teams_by_user(competition)
+        participant_rows = comp_participants.annotate(entries=Count('submissions')).values_list(
+            'pk', 'user_id', 'user__username', 'user__email', 'status__codename', 'entries'
+        )
 
         participant_list = []
 
-        for number, participant in enumerate(comp_participants):
-            team = get_user_team(participant, competition)
+        for number, (pk, user_pk, username, email, status, entries) in enumerate(participant_rows):
+            team = teams_by_user.get(user_pk)
             if team is not None:
                 team_name = team.name
             else:
                 team_name = ''
 
             participant_entry = {
-                'pk': participant.pk,
-                'name': participant.user.username,
-                'email': participant.user.email,
-                'user_pk': participant.user.pk,
-                'status': participant.status.codename,
+                'pk': pk,
+                'name': username,
+                'email': email,
+                'user_pk': user_pk,
+                'status': status,
                 'number': number + 1,
-                'entries': participant.submissions.count(),
+                'entries': entries,
                 'team_name': team_name,
                 'team': team
             }
             participant_list.append(participant_entry)
         sort_data_table(self.request, context, participant_list)
+
+        paginator = Paginator(participant_list, self.participants_per_page)
+        page = self.request.GET.get('page')
+        if page is None:
+            # If we don't get page back in the request dict, default to 1st page.
+            page = 1
+
+        try:
+            participant_list = paginator.page(page)
+        except (EmptyPage, PageNotAnInteger):
+            raise Http404()
         context['participant_list'] = participant_list
         context['competition_id'] = self.kwargs.get('competition_id')
         context['pending_participants'] = comp_participants.filter(status__codename='pending')
         context['has_chagrade_bot'] = competition.has_chagrade_bot()
 
         if competition.enable_teams or competition.allow_organizer_teams:
-            comp_teams = Team.objects.filter(competition=competition).order_by('pk').select_related('creator', 'status').prefetch_related('members').order_by('pk')
+            comp_teams = Team.objects.filter(competition=competition).select_related('creator', 'status').order_by('pk')
+            team_member_counts = dict(
+                TeamMembership.objects.filter(team__competition=competition).values('team').annotate(
+                    count=Count('pk')
+                ).values_list('team', 'count')
+            )
+            team_entry_counts = dict(
+                comp_submissions.filter(team__isnull=False).values('team').annotate(
+                    count=Count('pk')
+                ).values_list('team', 'count')
+            )
             pending_teams = comp_teams.filter(status__codename='pending')
             if competition.enable_teams:
                 context['teams_enabled'] = True
@@ -1154,11 +1176,11 @@ class MyCompetitionParticipantView(LoginRequiredMixin, ListView):
                     'name': team.name,
                     'creator': team.creator.username,
                     'creator_pk': team.creator.pk,
-                    'num_members': team.members.count(),
+                    'num_members': team_member_counts.get(team.pk, 0),
                     'num_pending': 0,
                     'status': team.status.codename,
                     'number': number + 1,
-                    'entries': comp_submissions.filter(team=team).count()
+                    'entries': team_entry_counts.get(team.pk, 0)
                 }
                 teams_list.append(team_entry)
             context['team_list'] = teams_list
@@ -1936,7 +1958,7 @@ def submission_mark_as_failed(request, submission_pk):
             competition = submission.phase.competition
             if request.user.id != competition.creator_id and request.user not in competition.admins.all():
                 raise Http404()
-            submission.status = models.CompetitionSubmissionStatus.objects.get(codename="failed")
+            submission.status = models.CompetitionSubmissionStatus.objects.get_cached("failed")
             submission.save()
             return HttpResponse()
         except models.CompetitionSubmission.DoesNotExist:
@@ -0,0 +1,94 @@
+"""
+Fixtures of the benchmark suite, see benchmarks/README.md.
+
+The synthetic competition is generated once per run, outside of the per test transactions, at the scale given by
+the BENCHMARK_* environment variables.
+"""
+import os
+
+import pytest
+from django.contrib.auth import get_user_model
+
+from apps.customizer.models import Configuration
+from apps.teams.models import TeamMembershipStatus
+from apps.web.synthetic_data import create_synthetic_competition
+
+BENCHMARK_PHASES = int(os.environ.get('BENCHMARK_PHASES', 2))
+BENCHMARK_SCORE_COLUMNS = int(os.environ.get('BENCHMARK_SCORE_COLUMNS', 5))
+BENCHMARK_PARTICIPANTS = int(os.environ.get('BENCHMARK_PARTICIPANTS', 200))
+BENCHMARK_TEAMS = int(os.environ.get('BENCHMARK_TEAMS', 20))
+BENCHMARK_SUBMISSIONS = int(os.environ.get('BENCHMARK_SUBMISSIONS', 1000))
+# Timed runs of each benchmark, the larger scales take seconds per run
+BENCHMARK_ROUNDS = int(os.environ.get('BENCHMARK_ROUNDS', 5))
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_configure(config):
+    # Keep every run next to the suite, so `--benchmark-compare` can compare a release with the previous ones
+    args = ' '.join(config.invocation_params.args)
+    if '--benchmark-storage' not in args:
+        config.option.benchmark_storage = 'file://{}'.format(RESULTS_DIR)
+    if '--benchmark-disable' not in args:
+        config.option.benchmark_autosave = True
+
+
+@pytest.fixture(scope='session')
+def synthetic_competition(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        Configuration.objects.get_or_create(pk=1, defaults={'disable_all_submissions': False})
+        creator = get_user_model().objects.create_user(username='benchmark_organizer', password='pass')
+        return create_synthetic_competition(
+            creator,
+            title='Benchmark competition',
+            phases=BENCHMARK_PHASES,
+            score_columns=BENCHMARK_SCORE_COLUMNS,
+            participants=BENCHMARK_PARTICIPANTS,
+            teams=BENCHMARK_TEAMS,
+            submissions=BENCHMARK_SUBMISSIONS,
+            seed=0,
+        )
+
+
+@pytest.fixture
+def competition(synthetic_competition, db):
+    return synthetic_competition
+
+
+@pytest.fixture
+def phase(competition):
+    return competition.phases.order_by('phasenumber').last()
+
+
+@pytest.fixture
+def leaderboard_size(phase):
+    return phase.board.entries.count()
+
+
+def _team_member_filter(competition, prefix):
+    # Users with an approved membership, as opposed to the team creators, whose team is looked up separately
+    return {
+        '{}__team_memberships__status__codename'.format(prefix): TeamMembershipStatus.APPROVED,
+        '{}__team_memberships__team__competition'.format(prefix): competition,
+    }
+
+
+@pytest.fixture
+def team_member_entries(competition, phase):
+    """Leaderboard entries of the phase submitted by a team member."""
+    return phase.board.entries.filter(**_team_member_filter(competition, 'result__participant__user')).count()
+
+
+@pytest.fixture
+def team_member_submissions(competition, phase):
+    """Submissions to the phase by a team member."""
+    return phase.submissions.filter(**_team_member_filter(competition, 'participant__user')).count()
+
+
+@pytest.fixture
+def run_benchmark(benchmark):
+    """Times `function(*args, **kwargs)` over `BENCHMARK_ROUNDS` runs and returns its result."""
+    def run(function, *args, **kwargs):
+        return benchmark.pedantic(function, args=args, kwargs=kwargs, rounds=BENCHMARK_ROUNDS, iterations=1)
+    return run
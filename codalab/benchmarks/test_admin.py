@@ -0,0 +1,73 @@
+"""
+Benchmarks of the admin competitions manager over many competitions.
+"""
+import datetime
+import json
+import os
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+
+from apps.customizer.models import Configuration
+from apps.web.models import Competition, CompetitionPhase
+
+BENCHMARK_ADMIN_COMPETITIONS = int(os.environ.get('BENCHMARK_ADMIN_COMPETITIONS', 10000))
+
+# Session, user, the threshold validation and the UPDATE, whatever the number of competitions
+APPLY_UPPER_BOUND_LIMITS_QUERIES = 5
+ADMIN_LIST_PAGE_QUERIES = 6
+
+
+@pytest.fixture(scope='module')
+def admin_competitions(django_db_setup, django_db_blocker):
+    """Competitions with two phases each, one of them over the default upper bound."""
+    with django_db_blocker.unblock():
+        creator = get_user_model().objects.create_user(username='benchmark_admin_organizer', password='pass')
+        titles = ['Admin competition {}'.format(number) for number in range(BENCHMARK_ADMIN_COMPETITIONS)]
+        Competition.objects.bulk_create([
+            Competition(title=title, creator=creator, modified_by=creator) for title in titles
+        ])
+        start_date = timezone.now() - datetime.timedelta(days=20)
+        CompetitionPhase.objects.bulk_create([
+            CompetitionPhase(
+                competition_id=competition_id,
+                phasenumber=phasenumber,
+                label='Phase {}'.format(phasenumber),
+                start_date=start_date + datetime.timedelta(days=10 * phasenumber),
+                max_submission_size=max_submission_size,
+            )
+            for competition_id in Competition.objects.filter(creator=creator).values_list('pk', flat=True)
+            for phasenumber, max_submission_size in ((1, 100), (2, 1000))
+        ])
+        return BENCHMARK_ADMIN_COMPETITIONS
+
+
+@pytest.fixture
+def admin_client(client, db):
+    client.force_login(get_user_model().objects.create_user(username='benchmark_admin', is_staff=True))
+    # The first request of the process would also read and create the site configuration
+    Configuration.get_cached()
+    return client
+
+
+def test_apply_upper_bound_limits(admin_client, admin_competitions, run_benchmark, django_assert_max_num_queries):
+    url = reverse('apply_upper_bound_limits')
+    data = json.dumps({'threshold': 500})
+
+    with django_assert_max_num_queries(APPLY_UPPER_BOUND_LIMITS_QUERIES):
+        response = admin_client.patch(url, data, content_type='application/json')
+    assert response.json()['phases_updated'] >= admin_competitions
+
+    run_benchmark(admin_client.patch, url, data, content_type='application/json')
+
+
+def test_admin_competition_list_page(admin_client, admin_competitions, run_benchmark, django_assert_max_num_queries):
+    url = reverse('competitions')
+
+    with django_assert_max_num_queries(ADMIN_LIST_PAGE_QUERIES):
+        response = admin_client.get(url, {'page_size': 1000})
+    assert len(response.json()['results']) == min(admin_competitions, 1000)
+
+    run_benchmark(admin_client.get, url, {'page_size': 1000})
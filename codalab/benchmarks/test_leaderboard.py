@@ -0,0 +1,83 @@
+"""
+Benchmarks of the leaderboard computation.
+
+The query budgets follow the current implementation, which resolves the participant, user and team of each
+leaderboard entry separately, and the team membership of each submission. They only catch new per submission
+queries, tighten them when those go away.
+"""
+from django.core.urlresolvers import reverse
+
+from benchmarks.conftest import BENCHMARK_PHASES, BENCHMARK_SUBMISSIONS
+
+# The team of an approved membership, only team members have one
+QUERIES_PER_TEAM_MEMBER = 1
+# The submission, participant, user and team membership of a leaderboard entry
+SCORES_QUERIES_PER_ENTRY = 4
+# The team membership of a submission, the others are selected with the submissions
+SCORES_QUERIES_PER_SUBMISSION = 1
+SCORES_QUERIES = 10
+RESULTS_PAGE_QUERIES_PER_ENTRY = SCORES_QUERIES_PER_ENTRY + 4
+RESULTS_PAGE_QUERIES = 20
+
+
+def get_scores_queries(leaderboard_size, team_member_entries):
+    return SCORES_QUERIES_PER_ENTRY * leaderboard_size + QUERIES_PER_TEAM_MEMBER * team_member_entries + \
+        SCORES_QUERIES
+
+
+def get_all_scores_queries(team_member_submissions):
+    return SCORES_QUERIES_PER_SUBMISSION * BENCHMARK_SUBMISSIONS + QUERIES_PER_TEAM_MEMBER * team_member_submissions + \
+        SCORES_QUERIES
+
+
+def test_scores(phase, leaderboard_size, team_member_entries, run_benchmark, django_assert_max_num_queries):
+    with django_assert_max_num_queries(get_scores_queries(leaderboard_size, team_member_entries)):
+        groups = phase.scores()
+    assert len(groups[0]['scores']) == leaderboard_size
+
+    run_benchmark(phase.scores)
+
+
+def test_scores_of_all_submissions(phase, team_member_submissions, run_benchmark, django_assert_max_num_queries):
+    with django_assert_max_num_queries(get_all_scores_queries(team_member_submissions)):
+        groups = phase.scores(include_scores_not_on_leaderboard=True)
+    assert len(groups[0]['scores']) == BENCHMARK_SUBMISSIONS
+
+    run_benchmark(phase.scores, include_scores_not_on_leaderboard=True)
+
+
+def test_results_csv(competition, phase, leaderboard_size, team_member_entries, run_benchmark,
+                     django_assert_max_num_queries):
+    with django_assert_max_num_queries(get_scores_queries(leaderboard_size, team_member_entries) + 2):
+        csv = competition.get_results_csv(phase.pk)
+    # A header row and a row per entry
+    assert len(csv.splitlines()) == leaderboard_size + 1
+
+    run_benchmark(competition.get_results_csv, phase.pk)
+
+
+def test_complete_results_csv(competition, phase, team_member_submissions, run_benchmark,
+                              django_assert_max_num_queries):
+    with django_assert_max_num_queries(get_all_scores_queries(team_member_submissions) + 2):
+        csv = competition.get_results_csv(phase.pk, include_scores_not_on_leaderboard=True)
+    assert len(csv.splitlines()) == BENCHMARK_SUBMISSIONS + 1
+
+    run_benchmark(competition.get_results_csv, phase.pk, include_scores_not_on_leaderboard=True)
+
+
+def test_results_page(client, competition, phase, leaderboard_size, team_member_entries, run_benchmark,
+                      django_assert_max_num_queries):
+    url = reverse('competitions:competition_results_page', kwargs={'id': competition.pk, 'phase': phase.pk})
+    budget = RESULTS_PAGE_QUERIES_PER_ENTRY * leaderboard_size + QUERIES_PER_TEAM_MEMBER * team_member_entries + \
+        RESULTS_PAGE_QUERIES
+
+    with django_assert_max_num_queries(budget):
+        response = client.get(url)
+    assert response.status_code == 200
+    assert 'error' not in response.context
+
+    run_benchmark(client.get, url)
+
+
+def test_every_phase_has_a_leaderboard(competition):
+    assert competition.phases.filter(board__isnull=False).count() == BENCHMARK_PHASES
@@ -0,0 +1,86 @@
+"""
+Benchmarks of participant moderation in competitions which require approval.
+"""
+import os
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.urlresolvers import reverse
+
+from apps.web.models import Competition, CompetitionParticipant, ParticipantStatus, PARTICIPANT_STATUS_BATCH_SIZE, \
+    change_participants_status
+from apps.web.synthetic_data import create_participants
+
+BENCHMARK_PENDING_PARTICIPANTS = int(os.environ.get('BENCHMARK_PENDING_PARTICIPANTS', 10000))
+
+# The participants update and their emails per batch, plus a constant part
+MODERATION_QUERIES_PER_BATCH = 3
+MODERATION_QUERIES = 10
+
+
+@pytest.fixture(scope='module')
+def moderated_competition(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        organizer = get_user_model().objects.create_user(username='benchmark_moderator', password='pass')
+        # The synthetic competition, which creates the approved status, may not be generated in this run
+        for codename in (ParticipantStatus.APPROVED, ParticipantStatus.DENIED):
+            ParticipantStatus.objects.get_or_create(codename=codename, defaults={'name': codename.capitalize()})
+        competition = Competition.objects.create(
+            title='Moderated competition',
+            creator=organizer,
+            modified_by=organizer,
+            has_registration=True,
+        )
+        create_participants(
+            competition,
+            BENCHMARK_PENDING_PARTICIPANTS,
+            prefix='pending_{}'.format(competition.pk),
+            status=ParticipantStatus.PENDING,
+        )
+        return competition
+
+
+@pytest.fixture
+def pending_competition(moderated_competition, db):
+    CompetitionParticipant.objects.filter(competition=moderated_competition).update(
+        status=ParticipantStatus.objects.get_cached(ParticipantStatus.PENDING),
+    )
+    return moderated_competition
+
+
+def get_moderation_query_budget():
+    batches = -(-BENCHMARK_PENDING_PARTICIPANTS // PARTICIPANT_STATUS_BATCH_SIZE)
+    return MODERATION_QUERIES_PER_BATCH * batches + MODERATION_QUERIES
+
+
+def test_change_participants_status(pending_competition, run_benchmark, django_assert_max_num_queries):
+    participants = CompetitionParticipant.objects.filter(competition=pending_competition)
+    with django_assert_max_num_queries(get_moderation_query_budget()):
+        summary = change_participants_status(pending_competition, participants, ParticipantStatus.APPROVED)
+    assert summary['updated'] == BENCHMARK_PENDING_PARTICIPANTS
+
+    # Every run changes every participant, back and forth
+    statuses = [ParticipantStatus.DENIED, ParticipantStatus.APPROVED]
+
+    def moderate():
+        statuses.reverse()
+        return change_participants_status(pending_competition, participants, statuses[0])
+
+    run_benchmark(moderate)
+
+
+def test_approve_all_pending(client, pending_competition, run_benchmark, django_assert_max_num_queries):
+    client.login(username='benchmark_moderator', password='pass')
+    url = reverse('competition-bulk-participation-status', kwargs={'pk': pending_competition.pk})
+
+    with django_assert_max_num_queries(get_moderation_query_budget() + 10):
+        response = client.post(url, {'status': ParticipantStatus.APPROVED, 'all_pending': True})
+    assert response.json()['updated'] == BENCHMARK_PENDING_PARTICIPANTS
+
+    def approve_all_pending():
+        CompetitionParticipant.objects.filter(competition=pending_competition).update(
+            status=ParticipantStatus.objects.get_cached(ParticipantStatus.PENDING),
+        )
+        return client.post(url, {'status': ParticipantStatus.APPROVED, 'all_pending': True})
+
+    run_benchmark(approve_all_pending)
@@ -0,0 +1,74 @@
+"""
+Benchmarks of the submission paths: the submission limit checks of a new submission, and the ingestion of the
+scores of a finished one.
+"""
+import io
+import itertools
+import json
+import zipfile
+
+from django.core.files.base import ContentFile
+
+from apps.jobs.models import Job
+from apps.web.models import CompetitionSubmission, CompetitionSubmissionStatus, SubmissionScore
+from apps.web.tasks import update_submission
+from benchmarks.conftest import BENCHMARK_PARTICIPANTS, BENCHMARK_ROUNDS, BENCHMARK_SCORE_COLUMNS, \
+    BENCHMARK_SUBMISSIONS
+
+# Neither depends on the amount of submissions of the phase or of the participant
+SUBMISSION_SAVE_QUERIES = 25
+UPDATE_SUBMISSION_QUERIES = 2 * BENCHMARK_SCORE_COLUMNS + 40
+
+_submission_numbers = itertools.count(BENCHMARK_SUBMISSIONS + 1)
+
+
+def _busiest_participant(phase):
+    # Every participant has about BENCHMARK_SUBMISSIONS / BENCHMARK_PARTICIPANTS submissions, the first one the most
+    return phase.competition.participants.order_by('pk').select_related('user').first()
+
+
+def test_submission_limit_checks(phase, run_benchmark, django_assert_max_num_queries):
+    participant = _busiest_participant(phase)
+    assert phase.submissions.filter(participant=participant).count() >= BENCHMARK_SUBMISSIONS // BENCHMARK_PARTICIPANTS
+
+    def submit():
+        submission = CompetitionSubmission(participant=participant, phase=phase)
+        submission.save()
+        return submission
+
+    with django_assert_max_num_queries(SUBMISSION_SAVE_QUERIES):
+        submission = submit()
+    assert submission.submission_number > 1
+
+    run_benchmark(submit)
+
+
+def test_score_ingestion(phase, benchmark, django_assert_max_num_queries):
+    participant = _busiest_participant(phase)
+    scoredefs = phase.competition.submissionscoredef_set.filter(computed=False)
+    output = io.BytesIO()
+    with zipfile.ZipFile(output, 'w') as output_zip:
+        output_zip.writestr('scores.txt', '\n'.join('{}: 0.5'.format(scoredef.key) for scoredef in scoredefs))
+
+    def scored_submission():
+        """Creates a submission waiting for the results of its scoring job, like the compute worker sees it."""
+        submission = CompetitionSubmission(
+            participant=participant,
+            phase=phase,
+            submission_number=next(_submission_numbers),
+        )
+        submission.save(ignore_submission_limits=True)
+        job = Job.objects.create_job('evaluate_submission', {'submission_id': submission.pk})
+        submission.execution_key = json.dumps({'score': job.pk})
+        # Also saves the execution key
+        submission.output_file.save('output.zip', ContentFile(output.getvalue()))
+        return (job.pk, {'status': 'finished'}, str(submission.secret)), {}
+
+    args, _ = scored_submission()
+    with django_assert_max_num_queries(UPDATE_SUBMISSION_QUERIES):
+        update_submission(*args)
+    submission = CompetitionSubmission.objects.get(pk=Job.objects.get(pk=args[0]).get_task_args()['submission_id'])
+    assert submission.status.codename == CompetitionSubmissionStatus.FINISHED
+    assert SubmissionScore.objects.filter(result=submission).count() == scoredefs.count()
+
+    benchmark.pedantic(update_submission, setup=scored_submission, rounds=BENCHMARK_ROUNDS)
@@ -0,0 +1,70 @@
+"""
+Benchmarks of the competition list and of the submissions table of the Participate tab.
+"""
+import datetime
+import os
+
+import pytest
+from django.core.urlresolvers import reverse
+from django.utils import timezone
+
+from apps.web.models import Competition, CompetitionPhase
+
+BENCHMARK_COMPETITIONS = int(os.environ.get('BENCHMARK_COMPETITIONS', 100))
+
+# Queries per listed competition or shown submission, plus a constant part
+COMPETITION_LIST_QUERIES_PER_COMPETITION = 6
+COMPETITION_LIST_QUERIES = 20
+SUBMISSIONS_PAGE_QUERIES_PER_SUBMISSION = 5
+SUBMISSIONS_PAGE_QUERIES = 40
+
+
+@pytest.fixture(scope='module')
+def listed_competitions(synthetic_competition, django_db_blocker):
+    """Published competitions with two phases each, next to the synthetic one."""
+    with django_db_blocker.unblock():
+        creator = synthetic_competition.creator
+        start_date = timezone.now() - datetime.timedelta(days=20)
+        for number in range(BENCHMARK_COMPETITIONS):
+            competition = Competition.objects.create(
+                title='Listed competition {}'.format(number),
+                creator=creator,
+                modified_by=creator,
+                published=True,
+            )
+            for phasenumber in (1, 2):
+                CompetitionPhase.objects.create(
+                    competition=competition,
+                    phasenumber=phasenumber,
+                    label='Phase {}'.format(phasenumber),
+                    start_date=start_date + datetime.timedelta(days=10 * phasenumber),
+                )
+            # Takes its start date from the phases, the list would save it on its first request otherwise
+            competition.save()
+        return Competition.objects.filter(published=True).count()
+
+
+def test_competition_list(client, db, listed_competitions, run_benchmark, django_assert_max_num_queries):
+    url = reverse('competitions:list')
+
+    with django_assert_max_num_queries(
+            COMPETITION_LIST_QUERIES_PER_COMPETITION * listed_competitions + COMPETITION_LIST_QUERIES):
+        response = client.get(url)
+    assert response.status_code == 200
+
+    run_benchmark(client.get, url)
+
+
+def test_submissions_page(client, competition, phase, run_benchmark, django_assert_max_num_queries):
+    participant = competition.participants.order_by('pk').select_related('user').first()
+    submission_count = phase.submissions.filter(participant=participant).count()
+    client.force_login(participant.user)
+    url = reverse('competitions:competition_submissions_page', kwargs={'id': competition.pk, 'phase': phase.pk})
+
+    with django_assert_max_num_queries(
+            SUBMISSIONS_PAGE_QUERIES_PER_SUBMISSION * submission_count + SUBMISSIONS_PAGE_QUERIES):
+        response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.context['submission_info_list']) == submission_count
+
+    run_benchmark(client.get, url)
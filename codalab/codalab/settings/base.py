@@ -156,6 +156,7 @@ class Base(Configuration):
     SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', "a-hidden-secret")
 
     MIDDLEWARE = [
+        'apps.web.middleware.InstrumentationMiddleware',
         'django.middleware.security.SecurityMiddleware',
         "django_switchuser.middleware.SuStateMiddleware",
         'django.middleware.clickjacking.XFrameOptionsMiddleware',
@@ -251,6 +252,7 @@ class Base(Configuration):
         'apps.teams',
         'apps.customizer',
         'apps.newsletter',
+        'apps.emails',
 
         # Authentication app, enables social authentication
         'allauth',
@@ -336,7 +338,8 @@ class Base(Configuration):
     CACHES = {
         'default': {
             # 'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
-            'BACKEND': 'django.core.cache.backends.memcached.PyLibMCCache',
+            # PyLibMCCache counting hits and misses for the request instrumentation
+            'BACKEND': 'apps.health.cache.InstrumentedPyLibMCCache',
             'LOCATION': 'memcached:{}'.format(MEMCACHED_PORT),
         }
     }
@@ -346,6 +349,27 @@ class Base(Configuration):
 
     SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
 
+    # Seconds a status request waiting for a job or submission status change is held before answering
+    STATUS_WAIT_TIMEOUT = int(os.environ.get('STATUS_WAIT_TIMEOUT', 25))
+    # Organizer team CSV files with more teams than this are imported in the background
+    TEAM_CSV_IMPORT_SYNC_ROWS = int(os.environ.get('TEAM_CSV_IMPORT_SYNC_ROWS', 200))
+
+    # =========================================================================
+    # Request instrumentation, see apps.web.middleware.InstrumentationMiddleware
+    # =========================================================================
+    INSTRUMENTATION_ENABLED = _bool_from_env('INSTRUMENTATION_ENABLED', True)
+    # Fraction of the requests which are instrumented
+    INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', 1.0))
+    # Seconds between two writes of the request metrics of a process to the database
+    INSTRUMENTATION_FLUSH_INTERVAL = int(os.environ.get('INSTRUMENTATION_FLUSH_INTERVAL', 60))
+    # Requests slower than this many seconds, or running this many queries, are sampled
+    SLOW_REQUEST_THRESHOLD = float(os.environ.get('SLOW_REQUEST_THRESHOLD', 2.0))
+    SLOW_REQUEST_QUERY_THRESHOLD = int(os.environ.get('SLOW_REQUEST_QUERY_THRESHOLD', 100))
+    # Comma separated names of the celery tasks whose runs are profiled, see apps.health.signals
+    CELERY_PROFILED_TASKS = [name.strip() for name in os.environ.get('CELERY_PROFILED_TASKS', '').split(',') if name.strip()]
+    # Bearer token letting Prometheus scrape the task metrics without a staff session
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
 
     # =========================================================================
     # Email
@@ -357,6 +381,10 @@ class Base(Configuration):
     EMAIL_PORT = os.environ.get('EMAIL_PORT', 587)
     EMAIL_USE_TLS = _bool_from_env('EMAIL_USE_TLS', True)
     DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'CodaLab <noreply@codalab.org>')
+    # Emails queued with apps.emails are sent at most this fast
+    EMAIL_OUTBOX_MAX_PER_MINUTE = int(os.environ.get('EMAIL_OUTBOX_MAX_PER_MINUTE', 600))
+    # Seconds during which further posts in a forum thread are gathered in one digest instead of one email each
+    FORUM_NOTIFICATION_DIGEST_INTERVAL = int(os.environ.get('FORUM_NOTIFICATION_DIGEST_INTERVAL', 10 * 60))
     SERVER_EMAIL = os.environ.get('SERVER_EMAIL', 'noreply@codalab.org')
 
     MAILCHIMP_API_KEY = os.environ.get('MAILCHIMP_API_KEY')
@@ -367,6 +395,7 @@ class Base(Configuration):
     MAILCHIMP_API_URL = 'https://{}.api.mailchimp.com/3.0'.format(MAILCHIMP_DATA_CENTER) if MAILCHIMP_DATA_CENTER else None
     MAILCHIMP_MEMBERS_ENDPOINT_ALL = '{}/lists/{}/members'.format(MAILCHIMP_API_URL, MAILCHIMP_EMAIL_LIST_ID_ALL) if all([MAILCHIMP_API_URL, MAILCHIMP_EMAIL_LIST_ID_ALL]) else None
     MAILCHIMP_MEMBERS_ENDPOINT_NEWSLETTER = '{}/lists/{}/members'.format(MAILCHIMP_API_URL, MAILCHIMP_EMAIL_LIST_ID_NEWSLETTER) if all([MAILCHIMP_API_URL, MAILCHIMP_EMAIL_LIST_ID_NEWSLETTER]) else None
+    MAILCHIMP_BATCHES_ENDPOINT = '{}/batches'.format(MAILCHIMP_API_URL) if MAILCHIMP_API_URL else None
 
 
     # =========================================================================
@@ -471,6 +500,9 @@ class Base(Configuration):
     CELERYD_USER = "workeruser"
     CELERYD_GROUP = "workeruser"
     CELERYD_MAX_TASKS_PER_CHILD = 100  # Make celery restart every N tasks to stop leaks
+    # Re-runs and phase migrations send this many submissions to the compute workers every interval (seconds)
+    SUBMISSION_DISPATCH_CHUNK_SIZE = int(os.environ.get('SUBMISSION_DISPATCH_CHUNK_SIZE', 100))
+    SUBMISSION_DISPATCH_INTERVAL = int(os.environ.get('SUBMISSION_DISPATCH_INTERVAL', 10))
     CELERYBEAT_SCHEDULE = {
         'phase_migrations': {
             'task': 'apps.web.tasks.do_phase_migrations',
@@ -480,22 +512,46 @@ class Base(Configuration):
             'task': 'apps.web.tasks.do_chahub_retries',
             'schedule': timedelta(seconds=60 * 10),
         },
+        'chahub_outbox': {
+            'task': 'apps.chahub.tasks.deliver_chahub_outbox',
+            'schedule': timedelta(seconds=60),
+        },
         'chahub_competition_updates': {
-            'task': 'apps.web.tasks.send_chahub_competition_updates',
+            'task': 'apps.web.tasks.send_chahub_updates',
             'schedule': timedelta(seconds=60 * 60 * 24),
         },
         'chahub_general_statistics': {
             'task': 'apps.web.tasks.send_chahub_general_stats',
             'schedule': timedelta(seconds=60 * 60 * 24),
         },
-        'retry_mailing_list': {
-            'task': 'apps.newsletter.tasks.retry_mailing_list',
-            'schedule': timedelta(seconds=(60 * 60))
+        'sync_mailing_list': {
+            'task': 'apps.newsletter.tasks.sync_mailing_list',
+            'schedule': timedelta(seconds=(60 * 5))
         },
         'create_storage_analytics_snapshot': {
             'task': 'apps.web.tasks.create_storage_analytics_snapshot',
             'schedule': crontab(hour=2, minute=0, day_of_week='sun') # Every Sunday at 02:00
         },
+        'rollup_analytics': {
+            'task': 'apps.analytics.tasks.rollup_analytics_task',
+            'schedule': crontab(hour=1, minute=0)  # Every night at 01:00
+        },
+        'send_queued_emails': {
+            'task': 'apps.emails.tasks.send_queued_emails_task',
+            'schedule': timedelta(seconds=60),
+        },
+        'rollup_job_metrics': {
+            'task': 'apps.health.tasks.rollup_job_metrics_task',
+            'schedule': timedelta(seconds=60),
+        },
+        'delete_old_request_metrics': {
+            'task': 'apps.health.tasks.delete_old_request_metrics_task',
+            'schedule': crontab(hour=3, minute=30)  # Every night at 03:30
+        },
+        'delete_old_submission_events': {
+            'task': 'apps.health.tasks.delete_old_submission_events_task',
+            'schedule': crontab(hour=3, minute=0)  # Every night at 03:00
+        },
     }
     CELERY_TIMEZONE = 'UTC'
 
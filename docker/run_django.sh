@@ -30,6 +30,7 @@ python scripts/initialize_from_fixture.py
 python manage.py loaddata initial_data.json initialize_site.json initial_team_data.json
 
 # start development server on public ip interface, on port 8000
+# Threaded workers, status requests are held open while waiting for job and submission updates
 PYTHONUNBUFFERED=TRUE gunicorn codalab.wsgi \
     --bind django:$DJANGO_PORT \
     --access-logfile=/var/log/django/access.log \
@@ -37,4 +38,6 @@ PYTHONUNBUFFERED=TRUE gunicorn codalab.wsgi \
     --log-level $DJANGO_LOG_LEVEL \
     --reload \
     --timeout 4096 \
+    --worker-class gthread \
+    --threads ${DJANGO_THREADS:-16} \
     --enable-stdio-inheritance
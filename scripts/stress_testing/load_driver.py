@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+Submits submissions concurrently through the REST API, the same way the submission form does, waits for each
+of them to finish and reports the throughput and latency percentiles. Run it against a competition with a real
+scoring program, with fake_compute_worker.py in place of the compute workers to only measure the site.
+
+    ./load_driver.py http://localhost submission.zip -c 1 -p 2 --users 'participant{}' --user-count 50 \\
+        --password testing -n 500 --concurrency 50
+"""
+import argparse
+import csv
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+FINAL_STATUSES = ('finished', 'failed', 'cancelled')
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, rank):
+    """Nearest-rank percentile of `values`, None when empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(int(round(rank / 100.0 * len(values))) - 1, 0)
+    return values[min(index, len(values) - 1)]
+
+
+class LoadDriver(object):
+    def __init__(self, args):
+        self.args = args
+        with open(args.submission_zip, 'rb') as submission_zip:
+            self.submission_data = submission_zip.read()
+        self.credentials = [
+            (args.users.format(number), args.password)
+            for number in range(args.user_offset, args.user_offset + args.user_count)
+        ]
+        self.lock = threading.Lock()
+        self.results = []
+
+    def api_url(self, path):
+        return '{}/api/competition/{}/{}'.format(self.args.url.rstrip('/'), self.args.competition, path)
+
+    def submit(self, number):
+        """Uploads and creates one submission, then waits for it to finish, :return: its result dictionary."""
+        session = requests.Session()
+        session.auth = self.credentials[number % len(self.credentials)]
+        result = {'number': number, 'user': session.auth[0], 'id': None, 'status': 'error', 'error': ''}
+        start = time.time()
+        try:
+            response = session.post(self.api_url('submission/sas'))
+            response.raise_for_status()
+            upload = response.json()
+
+            response = requests.put(upload['url'], data=self.submission_data, headers={
+                # Only for Azure but AWS ignores this fine
+                'x-ms-blob-type': 'BlockBlob',
+            })
+            response.raise_for_status()
+
+            response = session.post(
+                self.api_url('submission'),
+                params={'phase_id': self.args.phase, 'description': 'Load test {}'.format(number)},
+                data={'id': upload['id']},
+            )
+            response.raise_for_status()
+            result['id'] = response.json()['id']
+            result['create_time'] = time.time() - start
+
+            result['status'] = self.wait_for_submission(session, result['id'], start)
+            result['total_time'] = time.time() - start
+        except Exception as e:
+            result['error'] = str(e)
+        result['done_at'] = time.time()
+        with self.lock:
+            self.results.append(result)
+            if len(self.results) % 10 == 0:
+                print("{} / {} submissions done".format(len(self.results), self.args.number))
+        return result
+
+    def wait_for_submission(self, session, submission_id, start):
+        """Long polls the status of the submission until it is final or the timeout passes."""
+        url = self.api_url('submission/{}/status'.format(submission_id))
+        status = session.get(url).json()
+        while status['status'] not in FINAL_STATUSES:
+            if time.time() - start > self.args.timeout:
+                return 'timeout'
+            response = session.get(url, params={'since': status['version']})
+            response.raise_for_status()
+            status = response.json()
+        return status['status']
+
+    def run(self):
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as executor:
+            list(executor.map(self.submit, range(self.args.number)))
+        return time.time() - start
+
+    def report(self, duration):
+        created = [result for result in self.results if result['id'] is not None]
+        finished = [result for result in self.results if result['status'] == 'finished']
+        counts = {}
+        for result in self.results:
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+
+        print("")
+        print("{} submissions in {:.1f}s with a concurrency of {}".format(
+            len(self.results), duration, self.args.concurrency))
+        print("Statuses: {}".format(', '.join('{}={}'.format(*item) for item in sorted(counts.items()))))
+        print("Throughput: {:.2f} created/s, {:.2f} finished/s".format(
+            len(created) / duration, len(finished) / duration))
+        for label, key, results in (('Create', 'create_time', created), ('End to end', 'total_time', finished)):
+            values = [result[key] for result in results]
+            if not values:
+                continue
+            print("{} latency: {}, max={:.2f}s".format(label, ', '.join(
+                'p{}={:.2f}s'.format(rank, percentile(values, rank)) for rank in PERCENTILES
+            ), max(values)))
+        errors = [result['error'] for result in self.results if result['error']]
+        if errors:
+            print("{} errors, first: {}".format(len(errors), errors[0]))
+
+        if self.args.report:
+            with open(self.args.report, 'w') as report_file:
+                writer = csv.DictWriter(report_file, fieldnames=[
+                    'number', 'user', 'id', 'status', 'create_time', 'total_time', 'done_at', 'error',
+                ])
+                writer.writeheader()
+                for result in sorted(self.results, key=lambda result: result['number']):
+                    writer.writerow(result)
+            print("Wrote {}".format(self.args.report))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("url", help="Base URL of the site, like http://localhost")
+    parser.add_argument("submission_zip", help="Submission zip file to submit")
+    parser.add_argument("-c", "--competition", type=int, required=True, help="Competition ID")
+    parser.add_argument("-p", "--phase", type=int, required=True, help="Phase ID, the phase must be active")
+    parser.add_argument("--users", required=True,
+                        help="Username pattern of the approved participants to submit as, like 'participant{}'")
+    parser.add_argument("--user-offset", type=int, default=0, help="First number of the usernames")
+    parser.add_argument("--user-count", type=int, default=1, help="Number of participants, used in turn")
+    parser.add_argument("--password", required=True, help="Password of the participants")
+    parser.add_argument("-n", "--number", type=int, default=100, help="Number of submissions")
+    parser.add_argument("--concurrency", type=int, default=10, help="Submissions in flight at the same time")
+    parser.add_argument("--timeout", type=float, default=30 * 60,
+                        help="Seconds after which a submission which did not finish is reported as timeout")
+    parser.add_argument("--report", help="CSV file to write the result of every submission to")
+    args = parser.parse_args()
+
+    if not args.submission_zip.endswith(".zip"):
+        raise Exception("Received non zip file: {}".format(args.submission_zip))
+
+    driver = LoadDriver(args)
+    driver.report(driver.run())